@@ -1,7 +1,19 @@
 import axios from 'axios';
+import { randomUUID } from 'crypto';
 
 const PYTHON_SERVICE_URL = process.env.PYTHON_SERVICE_URL || 'http://localhost:50004';
 
+// Headers for calls to the Python service: the trace ID is propagated (or started here)
+// so both services' logs line up, and an opt-in X-Trace asks Python for a stage breakdown
+const pythonHeaders = (req) => {
+  const headers = {
+    'Content-Type': 'application/json',
+    'X-Trace-Id': req.get('X-Trace-Id') || randomUUID()
+  };
+  if (req.get('X-Trace')) headers['X-Trace'] = req.get('X-Trace');
+  return headers;
+};
+
 // Convert frontend form data to integer array format expected by the ML model
 const convertToModelInput = (data) => {
   const duration_map = {"<=3m": 0, "3-6m": 1, "6-12m": 2, "12-24m": 3, ">24m": 4};
@@ -82,7 +94,9 @@ export const calculateRisk = async (req, res) => {
     
     // Map data to format expected by Python service (use predict endpoint)
     const pythonData = {
-      user_data: convertToModelInput(req.body)
+      user_data: convertToModelInput(req.body),
+      session_id: req.body.sessionId || null,
+      project_id: req.body.projectId || null
     };
     
     console.log('Sending to Python service:', pythonData);
@@ -91,9 +105,7 @@ export const calculateRisk = async (req, res) => {
     try {
       const response = await axios.post(`${PYTHON_SERVICE_URL}/predict`, pythonData, {
         timeout: 30000, // 30 second timeout
-        headers: {
-          'Content-Type': 'application/json'
-        }
+        headers: pythonHeaders(req)
       });
       
       console.log('Python service response:', response.data);
@@ -286,9 +298,7 @@ export const generateMitigationStrategy = async (req, res) => {
     try {
       const response = await axios.post(`${PYTHON_SERVICE_URL}/mitigation-strategy`, pythonPayload, {
         timeout: 30000, // 30 second timeout
-        headers: {
-          'Content-Type': 'application/json'
-        }
+        headers: pythonHeaders(req)
       });
       
       console.log('Python mitigation service response:', response.data);
@@ -341,9 +351,7 @@ export const calculateRecommendationRiskReduction = async (req, res) => {
     try {
       const response = await axios.post(`${PYTHON_SERVICE_URL}/recommendation-risk-reduction`, pythonPayload, {
         timeout: 30000, // 30 second timeout
-        headers: {
-          'Content-Type': 'application/json'
-        }
+        headers: pythonHeaders(req)
       });
       
       console.log('Python recommendation service response:', response.data);
@@ -376,6 +384,50 @@ export const calculateRecommendationRiskReduction = async (req, res) => {
   }
 }; 
 
+
+export const calculateBatchRecommendationRiskReduction = async (req, res) => {
+  try {
+    console.log('Received batch recommendation risk reduction request:', req.body);
+    
+    const pythonPayload = {
+      user_data: req.body.user_data,
+      changes: req.body.changes || [],
+      current_risk: req.body.current_risk || null
+    };
+    
+    try {
+      const response = await axios.post(`${PYTHON_SERVICE_URL}/recommendation-risk-reduction/batch`, pythonPayload, {
+        timeout: 30000, // 30 second timeout
+        headers: pythonHeaders(req)
+      });
+      
+      res.json(response.data);
+      
+    } catch (pythonError) {
+      console.error('Python batch recommendation service error:', pythonError.response?.data || pythonError.message);
+      
+      if (pythonError.code === 'ECONNREFUSED') {
+        return res.status(503).json({
+          error: 'Recommendation analysis service is unavailable',
+          message: 'The AI model service is currently offline. Please try again later.'
+        });
+      }
+      
+      return res.status(pythonError.response?.status === 400 ? 400 : 500).json({
+        error: 'Batch recommendation risk reduction calculation failed',
+        message: pythonError.response?.data?.detail || 'Internal server error'
+      });
+    }
+    
+  } catch (error) {
+    console.error('Batch recommendation risk reduction error:', error);
+    res.status(500).json({
+      error: 'Internal server error',
+      message: error.message
+    });
+  }
+};
+
 export const streamRiskProbabilities = async (req, res) => {
   try {
     console.log('Starting risk probability stream...');
@@ -389,8 +441,23 @@ export const streamRiskProbabilities = async (req, res) => {
       'Access-Control-Allow-Headers': 'Cache-Control'
     });
     
-    // Forward SSE from Python service
-    const pythonResponse = await fetch(`${PYTHON_SERVICE_URL}/stream`);
+    // Stop relaying when the client goes away (res 'close' before the end means a disconnect)
+    const streamController = new AbortController();
+    res.on('close', () => {
+      if (!res.writableEnded) {
+        console.log('Client disconnected from stream');
+        streamController.abort();
+      }
+    });
+    
+    // Forward SSE from Python service for this session/project only
+    const streamParams = new URLSearchParams();
+    if (req.query.sessionId) streamParams.set('session_id', req.query.sessionId);
+    if (req.query.projectId) streamParams.set('project_id', req.query.projectId);
+    const pythonResponse = await fetch(`${PYTHON_SERVICE_URL}/stream?${streamParams.toString()}`, {
+      headers: { 'X-Trace-Id': req.get('X-Trace-Id') || randomUUID() },
+      signal: streamController.signal
+    });
     
     if (!pythonResponse.ok) {
       throw new Error(`Python service stream failed: ${pythonResponse.status}`);
@@ -401,24 +468,91 @@ export const streamRiskProbabilities = async (req, res) => {
       new WritableStream({
         write(chunk) {
           res.write(chunk);
+        },
+        close() {
+          res.end();
         }
       })
     ).catch(error => {
-      console.error('Stream error:', error);
+      if (error.name !== 'AbortError') {
+        console.error('Stream error:', error);
+      }
       res.end();
     });
     
-    // Handle client disconnect
-    req.on('close', () => {
-      console.log('Client disconnected from stream');
+  } catch (error) {
+    if (error.name === 'AbortError') {
+      return res.end();
+    }
+    console.error('Stream setup error:', error);
+    // The 200 SSE headers are already out, so report the failure as an SSE error event
+    res.write(`event: error\ndata: ${JSON.stringify({ error: 'Stream unavailable', message: error.message })}\n\n`);
+    res.end();
+  }
+};
+
+export const streamMitigationStrategy = async (req, res) => {
+  try {
+    console.log('Starting mitigation strategy stream:', req.body);
+    
+    const pythonPayload = {
+      user_data: convertToUserDataArray(req.body),
+      current_risk: req.body.current_risk || null
+    };
+    
+    // Abort the Python computation stream if the client goes away. The request's
+    // 'close' fires as soon as the POST body is read, so listen on the response and
+    // only treat a close before the response has ended as a disconnect.
+    const streamController = new AbortController();
+    res.on('close', () => {
+      if (!res.writableEnded) {
+        streamController.abort();
+      }
+    });
+    
+    const pythonResponse = await fetch(`${PYTHON_SERVICE_URL}/mitigation-strategy/stream`, {
+      method: 'POST',
+      headers: pythonHeaders(req),
+      body: JSON.stringify(pythonPayload),
+      signal: streamController.signal
+    });
+    
+    if (!pythonResponse.ok) {
+      throw new Error(`Python mitigation stream failed: ${pythonResponse.status}`);
+    }
+    
+    res.writeHead(200, {
+      'Content-Type': 'text/event-stream',
+      'Cache-Control': 'no-cache',
+      'Connection': 'keep-alive',
+      'X-Accel-Buffering': 'no'
+    });
+    
+    // Relay each round event as soon as it arrives
+    pythonResponse.body.pipeTo(
+      new WritableStream({
+        write(chunk) {
+          res.write(chunk);
+        },
+        close() {
+          res.end();
+        }
+      })
+    ).catch(error => {
+      if (error.name !== 'AbortError') {
+        console.error('Mitigation stream error:', error);
+      }
       res.end();
     });
     
   } catch (error) {
-    console.error('Stream setup error:', error);
+    console.error('Mitigation stream setup error:', error);
+    if (res.headersSent) {
+      return res.end();
+    }
     res.status(500).json({
-      error: 'Stream unavailable',
+      error: 'Mitigation strategy stream unavailable',
       message: error.message
     });
   }
-}; 
\ No newline at end of file
+};
@@ -1,22 +1,77 @@
-from fastapi import FastAPI, HTTPException, Response
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, Response, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 import torch
 import numpy as np
 import pandas as pd
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 import os
+import re
+import copy
+import hmac
 import json
+import time
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
 import asyncio
 from sse_starlette.sse import EventSourceResponse
+from starlette.background import BackgroundTask
 import logging
-from risk_mitigation_strategy_new import RiskMitigationAnalyzer
+from risk_mitigation_strategy_new import RiskMitigationAnalyzer, RISK_TYPES
+from risk_cache import PersistentCache, TieredCache, model_fingerprint
+from risk_single_flight import SingleFlight
+from risk_scheduler import PriorityScheduler, SchedulerLane, SchedulerOverloadedError
+from risk_cancellation import CancellationToken
+from risk_cache_warmer import AssessmentLog, CacheWarmer
+from risk_readiness import ReadinessProbe, WarmupPass
+from risk_model_registry import ModelBundle, ModelRegistry, ModelRegistryBusyError, validate_bundle
+from risk_model_pool import ModelPool, PredictionBatcher
+from risk_metrics import REGISTRY as METRICS, SERIALIZATION_SECONDS
+from risk_tracing import TraceLog, TraceMiddleware, record_span, span
+from risk_logging import LogSamplingMiddleware, configure_logging
+from risk_profiling import (MemoryProfiler, ModelCallProfiler, ProfilerBusyError, ProfilerGuard,
+                            ProfilerRateLimitedError, collapsed_text, flamegraph_svg, sample_stacks)
+from risk_job_store import JobStore, JobWorkerPool, JobDeferred, TERMINAL_STATES
+from risk_plan_search import MitigationPlanSearch, DEFAULT_LOCKED_FEATURES
+from risk_relaxation_planner import RelaxedMitigationPlanner
+from risk_marginalizer import AnswerMarginalizer
+from risk_session_manager import QuestionnaireSessionManager, SessionCapacityError
+from risk_stream_hub import RiskStreamHub, StreamCapacityError, resolve_stream_channel
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+# Set up logging: JSON records written by a background thread; at LOG_LEVEL=DEBUG only a
+# LOG_DEBUG_SAMPLE_RATE share of requests (and every traced request) logs its debug output
+log_listener = configure_logging(
+    level=os.environ.get("LOG_LEVEL", "INFO"),
+    json_format=os.environ.get("LOG_FORMAT", "json") == "json",
+    queue_size=int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+SERIALIZE_JSON = SERIALIZATION_SECONDS.labels("json")
+SERIALIZE_SSE = SERIALIZATION_SECONDS.labels("sse")
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that records how long rendering its body took"""
+    
+    def render(self, content) -> bytes:
+        started = time.perf_counter()
+        body = super().render(content)
+        ended = time.perf_counter()
+        SERIALIZE_JSON.observe(ended - started)
+        record_span("serialize", started, ended, bytes=len(body))
+        return body
+
+def dumps_event(payload) -> str:
+    """Serialize one stream event, recording the time taken"""
+    started = time.perf_counter()
+    data = json.dumps(payload)
+    ended = time.perf_counter()
+    SERIALIZE_SSE.observe(ended - started)
+    record_span("serialize", started, ended, bytes=len(data))
+    return data
+
+app = FastAPI(default_response_class=TimedJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -35,34 +90,108 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store latest risk probabilities
-latest_probabilities = None
+# Opt-in request tracing: send "X-Trace: 1" (and optionally X-Trace-Id) to get a span tree,
+# returned as Server-Timing, logged to TRACE_LOG_PATH and kept for GET /traces/{trace_id}
+trace_log = TraceLog(os.environ.get(
+    "TRACE_LOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "traces.jsonl")
+))
+app.add_middleware(TraceMiddleware, sink=trace_log.append)
+app.add_middleware(LogSamplingMiddleware, sample_rate=float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "0.01")))
+
+# Concurrent identical heavy requests share one computation
+single_flight = SingleFlight("analysis")
+
+# Admission control: interactive scoring keeps most of the capacity while heavy
+# analyses are capped, queued behind it and shed with 429 once their queue is full
+scheduler = PriorityScheduler([
+    SchedulerLane("interactive", priority=0, max_concurrency=16, max_queue=256, max_wait=5.0),
+    SchedulerLane("analysis", priority=1, max_concurrency=2, max_queue=32, max_wait=60.0),
+    SchedulerLane("background", priority=2, max_concurrency=1, max_queue=4)
+], total_concurrency=16)
+
+# Per-session broadcast hub for streamed risk probabilities
+stream_hub = RiskStreamHub()
+STREAM_HEARTBEAT_SECONDS = 15
 
 class RiskInput(BaseModel):
     user_data: List[int]
-    current_risk: Optional[float] = None  # Override for consistent risk calculation
+    current_risk: Optional[float] = None  # Override for consistent risk calculation; combined objective only (400 otherwise)
+    session_id: Optional[str] = None  # Stream channel for /stream subscribers
+    project_id: Optional[str] = None
+    locked_features: Optional[List[str]] = None  # Mitigation answers that cannot change
+    objective: Optional[Union[str, Dict[str, float]]] = None  # "combined", a risk type, or {riskType: weight}
+    latency_budget_ms: Optional[float] = None  # Best strategy achievable within this time, counted from arrival
 
+class PredictInput(RiskInput):
+    user_data: List[Optional[int]]  # None marks an unanswered question
+    answer_distributions: Optional[Dict[str, List[float]]] = None  # feature code -> probability per answer value
+
+# Blank or unrecognised fields are treated as unanswered
 class SimpleRiskInput(BaseModel):
-    project_duration: str
-    project_type: str
-    has_cyber_legal_team: str
-    company_scale: str
-    project_phase: str
-    layer1_teams: str
-    layer2_teams: str
-    layer3_teams: str
-    team_overlap: str
-    has_it_team: str
-    devices_with_firewall: str
-    network_type: str
-    phishing_fail_rate: str
-    governance_level: str
-    allow_password_reuse: str
-    uses_mfa: str
+    project_duration: Optional[str] = None
+    project_type: Optional[str] = None
+    has_cyber_legal_team: Optional[str] = None
+    company_scale: Optional[str] = None
+    project_phase: Optional[str] = None
+    layer1_teams: Optional[str] = None
+    layer2_teams: Optional[str] = None
+    layer3_teams: Optional[str] = None
+    team_overlap: Optional[str] = None
+    has_it_team: Optional[str] = None
+    devices_with_firewall: Optional[str] = None
+    network_type: Optional[str] = None
+    phishing_fail_rate: Optional[str] = None
+    governance_level: Optional[str] = None
+    allow_password_reuse: Optional[str] = None
+    uses_mfa: Optional[str] = None
+
+class PredictionUncertainty(BaseModel):
+    std: List[float]  # spread of each risk probability over the unknown answers
+    combinedRisk: float
+    combinedRiskStd: float
+    method: str  # "exact" enumeration or "monte_carlo" sampling
+    expansions: int
+    uncertainFeatures: Dict[str, Dict[str, float]]  # feature code -> answer value -> probability used
 
 class RiskOutput(BaseModel):
     probabilities: List[float]
     risk_types: List[str] = ["ransomware", "phishing", "dataBreach", "insiderAttack", "supplyChain"]
+    uncertainty: Optional[PredictionUncertainty] = None  # set when answers were missing or uncertain
+    modelVersion: Optional[str] = None
+
+class SensitivityFeature(BaseModel):
+    featureGroup: str
+    featureName: str
+    currentOptionIndex: Optional[int]
+    options: List[str]
+    deltas: List[List[float]]  # one row per option: 5 risk-type deltas + combined delta
+
+class SensitivityMatrix(BaseModel):
+    riskTypes: List[str]
+    baseline: List[float]
+    alternativesScored: int
+    features: List[SensitivityFeature]
+    modelVersion: Optional[str] = None
+
+class FeatureInteraction(BaseModel):
+    features: List[str]
+    featureNames: List[str]
+    maxSurplus: float
+    minSurplus: float
+    maxAbsSurplusByRiskType: List[float]
+    bestJointOptions: List[str]
+    bestJointReduction: float
+    independentOptions: List[Optional[str]]  # None keeps the current answer
+    independentReduction: float
+    missedReduction: float
+
+class FeatureInteractionAnalysis(BaseModel):
+    baselineRisk: float
+    riskTypes: List[str]
+    pairsEvaluated: int
+    rowsScored: int
+    pairs: List[FeatureInteraction]
+    modelVersion: Optional[str] = None
 
 class MitigationRecommendation(BaseModel):
     featureGroup: str
@@ -80,6 +209,7 @@ class RecommendationRiskReduction(BaseModel):
     recommendedOption: str
     riskReduction: float
     riskReductionPercentage: float
+    modelVersion: Optional[str] = None
 
 class MitigationRound(BaseModel):
     roundNumber: int
@@ -90,6 +220,44 @@ class MitigationRound(BaseModel):
     reductionPercentage: float
     recommendations: List[MitigationRecommendation]
 
+class OptimalPlanRequest(BaseModel):
+    user_data: List[int]
+    mode: str = "best_k"  # "best_k", "budget" or "fewest_changes"
+    solver: str = "exact"  # "exact" branch-and-bound or "relaxed" gradient planner (best_k and budget only, large plans)
+    max_changes: Optional[int] = None  # required for best_k, optional cap for fewest_changes
+    budget: Optional[float] = None  # required for budget
+    change_costs: Optional[Dict[str, Union[float, List[Optional[float]]]]] = None  # budget mode: per-feature or per-option costs (default 1, null = not allowed)
+    locked_features: Optional[List[str]] = None  # defaults to duration, type and phase; [] unlocks everything
+    objective: Optional[Union[str, Dict[str, float]]] = None  # "combined" (default), a risk type, or {riskType: weight}
+    target_risk: Optional[float] = None  # required for fewest_changes
+    target_mode: str = "combined"  # "combined" score or "all" five probabilities below target
+
+class PlanChange(MitigationRecommendation):
+    cost: float = 1.0
+
+class OptimalMitigationPlan(BaseModel):
+    mode: str
+    solver: str = "exact"
+    objective: str = "combined"
+    maxChanges: Optional[int] = None
+    budget: Optional[float] = None
+    target: Optional[float] = None
+    targetMode: Optional[str] = None
+    initialRisk: float
+    finalRisk: float
+    probabilities: List[float]
+    totalReduction: float
+    numChanges: int
+    totalCost: float
+    changes: List[PlanChange]
+    lockedFeatures: List[str]
+    feasible: bool
+    optimal: bool
+    nodesExpanded: int
+    rowsScored: int
+    elapsedMs: float
+    modelVersion: Optional[str] = None
+
 class MitigationStrategy(BaseModel):
     initialRisk: float
     finalRisk: float
@@ -97,6 +265,45 @@ class MitigationStrategy(BaseModel):
     totalReductionPercentage: float
     rounds: List[MitigationRound]
     implementationPriority: str
+    partial: bool = False  # Rounds were cut short by the latency budget
+    degraded: bool = False  # A cheaper ranking than SHAP was used
+    degradationReasons: List[str] = []
+    modelVersion: Optional[str] = None
+
+class ObjectiveStrategyRequest(BaseModel):
+    user_data: List[int]
+    objectives: Optional[List[Union[str, Dict[str, float]]]] = None  # defaults to combined plus every risk type
+    locked_features: Optional[List[str]] = None
+    latency_budget_ms: Optional[float] = None
+
+class ObjectiveMitigationStrategy(MitigationStrategy):
+    objective: str
+    objectiveWeights: Optional[Dict[str, float]] = None
+    rankingSource: str
+
+class ObjectiveMitigationStrategies(BaseModel):
+    plans: List[ObjectiveMitigationStrategy]
+    candidateRows: int  # candidate rows requested across all objectives
+    rowsScored: int  # distinct rows actually run through the model
+    modelVersion: Optional[str] = None
+
+class JobStatus(BaseModel):
+    jobId: str
+    kind: str
+    status: str  # queued, running, succeeded or failed
+    attempts: int
+    modelVersion: Optional[str] = None
+    createdAt: float
+    startedAt: Optional[float] = None
+    finishedAt: Optional[float] = None
+    error: Optional[str] = None
+    errorStatus: Optional[int] = None
+
+class JobSubmission(JobStatus):
+    deduplicated: bool  # an identical job was already queued, running or finished
+
+class ModelLoadRequest(BaseModel):
+    bundle: Optional[str] = None  # directory name under models/bundles; None reloads models/
 
 def set_seed(seed):
     import random
@@ -109,38 +316,35 @@ def set_seed(seed):
     torch.backends.cudnn.deterministic = True
     torch.backends.cudnn.benchmark = False
 
-def load_model_and_data():
-    """Load the PyTorch model and preprocessing data"""
+def load_model_and_data(data_dir: str):
+    """Load the PyTorch model and preprocessing data from a model bundle directory"""
     try:
         logger.debug("Starting model and data loading...")
-        
-        # Get the directory containing the model files
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        # Model files are in the backend python_service directory
-        data_dir = os.path.join(current_dir, "models")
-        logger.debug(f"Data directory: {data_dir}")
+        logger.debug("Data directory: %s", data_dir)
         
         # Load reference data for preprocessing
         df_path = os.path.join(data_dir, "new_data.csv")
-        logger.debug(f"Loading reference data from: {df_path}")
+        logger.debug("Loading reference data from: %s", df_path)
         df = pd.read_csv(df_path)
-        logger.debug(f"Reference data loaded. Shape: {df.shape}")
+        logger.debug("Reference data loaded. Shape: %s", df.shape)
         
         # Load group info
         group_info_path = os.path.join(data_dir, "group_info_2.pth")
-        logger.debug(f"Loading group info from: {group_info_path}")
+        logger.debug("Loading group info from: %s", group_info_path)
         group_info_2 = torch.load(group_info_path, map_location=torch.device('cpu'))
         logger.debug("Group info loaded successfully")
         
         # Import model definition
         model_def_path = os.path.join(data_dir, "mixture_of_experts_model_definition.py")
-        logger.debug(f"Loading model definition from: {model_def_path}")
+        logger.debug("Loading model definition from: %s", model_def_path)
+        # Each bundle gets its own namespace, so loading one never redefines another's classes
+        model_namespace = {"__name__": "mixture_of_experts_model_definition"}
         with open(model_def_path) as f:
-            exec(f.read(), globals())
+            exec(f.read(), model_namespace)
         logger.debug("Model definition loaded successfully")
         
         # Initialize model with exact same parameters as script.py
-        model = MixtureOfExperts(
+        model = model_namespace["MixtureOfExperts"](
             group_info_2,
             hidden_dim=64,
             output_dim=5,
@@ -163,7 +367,7 @@ def load_model_and_data():
         # Create synthetic X_train for SHAP analysis
         logger.debug("Creating synthetic X_train for SHAP analysis...")
         X_train = create_synthetic_training_data(df, group_info_2)
-        logger.debug(f"Synthetic X_train created. Shape: {X_train.shape}")
+        logger.debug("Synthetic X_train created. Shape: %s", X_train.shape)
         
         return model, df, group_info_2, X_train
     except Exception as e:
@@ -214,7 +418,7 @@ def create_synthetic_training_data(df: pd.DataFrame, group_info: dict) -> torch.
         # Convert to tensor
         X_train = torch.tensor(synthetic_hot.values.astype(int), dtype=torch.float)
         
-        logger.debug(f"Created synthetic X_train with {len(synthetic_samples)} samples")
+        logger.debug("Created synthetic X_train with %s samples", len(synthetic_samples))
         return X_train
         
     except Exception as e:
@@ -225,23 +429,138 @@ def create_synthetic_training_data(df: pd.DataFrame, group_info: dict) -> torch.
         num_features = sum(len(cols) for cols in group_info.values())
         return torch.randint(0, 2, (num_samples, num_features), dtype=torch.float)
 
-# Load model and data at startup
-logger.info("Loading model and data...")
-model, df, group_info_2, X_train = load_model_and_data()
-logger.info("Model and data loading completed")
+# Model bundles: the shipped models/ directory, or named bundles under models/bundles/
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+BUNDLES_DIR = os.path.join(MODELS_DIR, "bundles")
+BUNDLE_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
 
-# Initialize risk mitigation analyzer
-mitigation_analyzer = None
-if model is not None and df is not None and group_info_2 is not None:
+# Per-tenant fine-tuned checkpoints (models/tenants/<model id>/best_model_ft.pth), selected
+# with the X-Model-Id header and loaded on first use into a memory-bounded pool
+TENANT_MODELS_DIR = os.path.join(MODELS_DIR, "tenants")
+TENANT_CACHE_SCALE = 0.125  # tenants get smaller memory-tier caches; the disk tier is shared
+PREDICT_BATCH_SIZE = int(os.environ.get("PREDICT_BATCH_SIZE", "32"))
+PREDICT_BATCH_DELAY_MS = float(os.environ.get("PREDICT_BATCH_DELAY_MS", "2"))
+# solver="relaxed" only runs the gradient planner when at least this many answers can change;
+# smaller plans use the exact search, which is faster there and proves optimality
+RELAXED_SOLVER_MIN_CHANGES = int(os.environ.get("RELAXED_SOLVER_MIN_CHANGES", "6"))
+
+# Per-assessment result caches: an in-process LRU in front of a SQLite file shared by
+# every worker on the host and kept across restarts, keyed by model version
+RESULT_CACHE_PATH = os.environ.get(
+    "RESULT_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "results.sqlite3")
+)
+persistent_cache = None
+try:
+    persistent_cache = PersistentCache(
+        RESULT_CACHE_PATH, max_bytes=int(os.environ.get("RESULT_CACHE_MAX_MB", "256")) * 1024 * 1024
+    )
+except Exception as e:
+    logger.error(f"Failed to open persistent cache at {RESULT_CACHE_PATH}, using memory only: {str(e)}")
+
+def build_model_bundle(source: str) -> ModelBundle:
+    """Load a bundle directory and build its analyzers and version-scoped caches"""
+    model, df, group_info, X_train = load_model_and_data(source)
+    if model is None or df is None or group_info is None:
+        raise ValueError(f"Could not load a model bundle from {source}")
+    version = model_fingerprint(model, json.dumps(group_info, sort_keys=True, default=str), df.to_csv(index=False))
+    return assemble_model_bundle(version, source, model, df, group_info, X_train)
+
+def assemble_model_bundle(version: str, source: str, model, df, group_info, X_train,
+                          cache_scale: float = 1.0) -> ModelBundle:
+    """Build a loaded model's analyzers, version-scoped caches and prediction batcher"""
+    def cache(namespace: str, maxsize: int) -> TieredCache:
+        return TieredCache(namespace, version, persistent_cache, maxsize=max(16, int(maxsize * cache_scale)))
+    
+    caches = {
+        "predict": cache("predict", 4096),
+        "sensitivity": cache("sensitivity", 512),
+        "interactions": cache("interactions", 128),
+        "ranking": cache("ranking", 1024),
+        "strategy": cache("strategy", 512)
+    }
+    bundle = ModelBundle(version, source, model, df, group_info, X_train, caches=caches)
+    
+    # Initialize risk mitigation analyzer
     try:
-        mitigation_analyzer = RiskMitigationAnalyzer(model, df, group_info_2, X_train)
+        bundle.analyzer = RiskMitigationAnalyzer(model, df, group_info, X_train, ranking_cache=caches["ranking"])
         logger.info("Risk mitigation analyzer initialized successfully with SHAP support")
     except Exception as e:
         logger.error(f"Failed to initialize risk mitigation analyzer: {str(e)}")
-        mitigation_analyzer = None
+        return bundle
+    
+    # Exact branch-and-bound plan search over the same analyzer
+    try:
+        bundle.plan_search = MitigationPlanSearch(bundle.analyzer, time_limit=5.0, tolerance=1e-4)
+        bundle.relaxed_planner = RelaxedMitigationPlanner(bundle.plan_search, min_changes=RELAXED_SOLVER_MIN_CHANGES)
+        logger.info("Mitigation plan search initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize mitigation plan search: {str(e)}")
+    bundle.marginalizer = AnswerMarginalizer(bundle.analyzer)
+    bundle.batcher = PredictionBatcher(bundle.analyzer.score_encoded, max_batch=PREDICT_BATCH_SIZE,
+                                       max_delay=PREDICT_BATCH_DELAY_MS / 1000)
+    return bundle
 
-def convert_simple_input_to_integers(input_data: SimpleRiskInput) -> List[int]:
-    """Convert SimpleRiskInput to integer array format expected by the model"""
+def build_tenant_bundle(model_id: str) -> ModelBundle:
+    """Load a tenant's fine-tuned checkpoint onto the architecture and encoder of the active bundle"""
+    checkpoint_path = os.path.join(TENANT_MODELS_DIR, model_id, "best_model_ft.pth")
+    if not os.path.exists(checkpoint_path):
+        raise FileNotFoundError(f"Unknown model: {model_id}")
+    base = model_registry.active()
+    if base is None:
+        raise ValueError("No base model bundle is active")
+    
+    model = copy.deepcopy(base.model)
+    checkpoint = torch.load(checkpoint_path, map_location=torch.device('cpu'))
+    model.load_state_dict(checkpoint['model_state_dict'])
+    model.eval()
+    
+    # The base version covers the shared encoder data, so a base swap re-versions every tenant
+    version = model_fingerprint(model, base.version)
+    bundle = assemble_model_bundle(version, os.path.dirname(checkpoint_path), model, base.df, base.group_info,
+                                   base.X_train, cache_scale=TENANT_CACHE_SCALE)
+    bundle.validation = validate_bundle(bundle, forward_pass)
+    return bundle
+
+def forward_pass(bundle: ModelBundle, user_data: List[int]) -> List[float]:
+    """Uncached preprocessing and model forward pass of one bundle"""
+    with torch.no_grad():
+        return torch.sigmoid(bundle.model(preprocess_input(user_data, bundle.df))).squeeze().tolist()
+
+def smoke_test_bundle(bundle: ModelBundle, user_data: List[int]) -> None:
+    """A bundle must be able to produce a full mitigation strategy before it serves traffic"""
+    if bundle.analyzer is None or bundle.plan_search is None:
+        raise ValueError("mitigation analyzer or plan search failed to initialize")
+    bundle.analyzer.generate_mitigation_strategy(user_data)
+
+def validate_model_bundle(bundle: ModelBundle, active: Optional[ModelBundle]) -> Dict:
+    return validate_bundle(bundle, forward_pass, smoke_test_bundle, reference=active)
+
+def rebind_sessions(bundle: ModelBundle, previous: Optional[ModelBundle]) -> None:
+    """Move live questionnaire sessions onto the newly active bundle"""
+    global session_manager
+    if bundle.analyzer is None:
+        return
+    if session_manager is None:
+        session_manager = QuestionnaireSessionManager(bundle.analyzer, bundle.marginalizer)
+    else:
+        session_manager.rebind(bundle.analyzer, bundle.marginalizer)
+
+SESSION_SWEEP_SECONDS = 30
+
+# Durable job queue for long-running analyses; results outlive worker restarts
+JOB_STORE_PATH = os.environ.get(
+    "JOB_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "jobs.sqlite3")
+)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+job_store = None
+try:
+    job_store = JobStore(JOB_STORE_PATH)
+except Exception as e:
+    logger.error(f"Failed to open job store at {JOB_STORE_PATH}: {str(e)}")
+job_workers = None
+
+def convert_simple_input_to_integers(input_data: SimpleRiskInput) -> List[Optional[int]]:
+    """Convert SimpleRiskInput to integer array format expected by the model; None marks an unanswered field"""
     
     # Define the mapping for each field based on the model training
     mappings = {
@@ -262,11 +581,13 @@ def convert_simple_input_to_integers(input_data: SimpleRiskInput) -> List[int]:
     }
     
     def safe_index(mapping_list, value, field_name):
+        if value is None or not value.strip():
+            return None
         try:
             return mapping_list.index(value)
         except ValueError:
-            logger.warning(f"Unknown value '{value}' for field '{field_name}', using 0")
-            return 0
+            logger.warning(f"Unknown value '{value}' for field '{field_name}', treating it as unanswered")
+            return None
     
     # Convert to integer array - order must match model training
     result = [
@@ -288,13 +609,74 @@ def convert_simple_input_to_integers(input_data: SimpleRiskInput) -> List[int]:
         safe_index(mappings['uses_mfa'], input_data.uses_mfa, 'uses_mfa')
     ]
     
-    logger.debug(f"Converted input to integers: {result}")
+    logger.debug("Converted input to integers: %s", result)
     return result
 
+def single_flight_key(bundle: ModelBundle, endpoint: str, user_data: List[int], *params) -> tuple:
+    """Dedup key: endpoint, model version, encoded answers and every parameter that shapes the result"""
+    encoded = bundle.analyzer.encode_user_data(user_data).tobytes()
+    return (endpoint, bundle.version, encoded, json.dumps(params, sort_keys=True, default=str))
+
+async def run_cancellable(func, *args):
+    """Run blocking work in the threadpool under a cancellation token.
+    
+    If the awaiting task is cancelled the token is cancelled too, so the analyzer
+    stops at its next checkpoint; the caller waits for the thread to actually exit.
+    """
+    token = CancellationToken()
+    work = asyncio.ensure_future(run_in_threadpool(token.run, func, *args))
+    try:
+        return await asyncio.shield(work)
+    except asyncio.CancelledError:
+        token.cancel("request abandoned")
+        await asyncio.wait({work})
+        work.exception()  # retrieve the thread's AnalysisCancelled, superseded by our cancellation
+        logger.debug("Cancelled analysis work stopped: %s", getattr(func, '__name__', func))
+        raise
+
+async def run_in_lane(lane: str, func, *args):
+    """Run blocking work in the threadpool once the scheduler admits it to the lane"""
+    async with scheduler.slot(lane):
+        return await run_cancellable(func, *args)
+
+async def cancel_on_disconnect(http_request: Optional[Request], awaitable):
+    """Await the work, cancelling it as soon as the client disconnects (no request: just await it)"""
+    if http_request is None:
+        return await awaitable
+    work = asyncio.ensure_future(awaitable)
+    
+    async def wait_for_disconnect():
+        while (await http_request.receive())["type"] != "http.disconnect":
+            pass
+    
+    watcher = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+    if not work.done():
+        work.cancel()
+        logger.info(f"Client disconnected from {http_request.url.path}; cancelling its analysis")
+        raise HTTPException(status_code=499, detail="Client closed request")
+    return work.result()
+
+def latency_deadline(latency_budget_ms: Optional[float]) -> Optional[float]:
+    """Monotonic deadline for a request's latency budget; queueing time counts against it"""
+    if latency_budget_ms is None:
+        return None
+    if latency_budget_ms <= 0:
+        raise ValueError("latency_budget_ms must be positive")
+    return time.monotonic() + latency_budget_ms / 1000.0
+
+def overloaded_error(e: SchedulerOverloadedError) -> HTTPException:
+    """429 with a Retry-After estimate for a request shed by the scheduler"""
+    logger.warning(f"Shedding request: {str(e)}")
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
 def preprocess_input(user_data: List[int], df: pd.DataFrame) -> torch.Tensor:
     """Preprocess input data exactly as in script.py"""
     try:
-        logger.debug(f"Preprocessing input data: {user_data}")
+        logger.debug("Preprocessing input data: %s", user_data)
         
         # Ensure user_data has exactly 16 elements
         if len(user_data) != 16:
@@ -302,7 +684,7 @@ def preprocess_input(user_data: List[int], df: pd.DataFrame) -> torch.Tensor:
         
         # Get feature columns (all except last 5 columns)
         feature_cols = df.columns[:-5]
-        logger.debug(f"Feature columns: {feature_cols.tolist()}")
+        logger.debug("Feature columns: %s", feature_cols.tolist())
         
         # Create sample features DataFrame
         sample_feat = pd.DataFrame([user_data], columns=feature_cols).astype(str)
@@ -311,86 +693,238 @@ def preprocess_input(user_data: List[int], df: pd.DataFrame) -> torch.Tensor:
         # Get all features except last 5 columns and convert to string
         all_feat = df.iloc[:, :-5].astype(str)
         combined = pd.concat([all_feat, sample_feat], ignore_index=True)
-        logger.debug(f"Combined data shape: {combined.shape}")
+        logger.debug("Combined data shape: %s", combined.shape)
         
         # Create one-hot encoding exactly as in script.py
         df_hot = pd.get_dummies(combined)
         df_hot["1.5_4"] = False
         df_hot = df_hot.reindex(sorted(df_hot.columns), axis=1)
-        logger.debug(f"One-hot encoded shape: {df_hot.shape}")
+        logger.debug("One-hot encoded shape: %s", df_hot.shape)
         
         # Get only the last row (our input data)
         sample_tensor = torch.tensor(df_hot.tail(1).values.astype(int), dtype=torch.float)
-        logger.debug(f"Final tensor shape: {sample_tensor.shape}")
+        logger.debug("Final tensor shape: %s", sample_tensor.shape)
         
         return sample_tensor
     except Exception as e:
         logger.error(f"Error in preprocessing: {str(e)}", exc_info=True)
         raise
 
+async def predict_probabilities_batched(bundle: ModelBundle, user_data: List[int]) -> List[float]:
+    """predict_probabilities with cache misses coalesced into the bundle's batched forward passes"""
+    cache_key = tuple(user_data)
+    with span("cache_lookup", cache="predict") as lookup:
+        probs = bundle.caches["predict"].get(cache_key)
+        lookup.set(hit=probs is not None)
+    if probs is None:
+        if bundle.batcher is None:
+            return await run_in_threadpool(predict_probabilities, bundle, user_data)
+        encoded = bundle.analyzer.encode_user_data(user_data)
+        with span("forward_batch"):
+            probs = [float(p) for p in await bundle.batcher.predict(encoded)]
+        bundle.caches["predict"].set(cache_key, probs)
+    return probs
+
+def predict_probabilities(bundle: ModelBundle, user_data: List[int]) -> List[float]:
+    """Risk probabilities for a complete answer vector, through the bundle's prediction cache"""
+    cache_key = tuple(user_data)
+    probs = bundle.caches["predict"].get(cache_key)
+    if probs is None:
+        # Preprocess input data
+        input_tensor = preprocess_input(user_data, bundle.df)
+        logger.debug("Input tensor prepared: %s", input_tensor.shape)
+    
+        # Get predictions exactly as in script.py
+        with torch.no_grad():
+            logits = bundle.model(input_tensor)
+            probs = torch.sigmoid(logits).squeeze().tolist()
+            logger.debug("Predictions generated: %s", probs)
+        bundle.caches["predict"].set(cache_key, probs)
+    return probs
+
+def strategy_cache_key(analyzer: RiskMitigationAnalyzer, user_data: List[int], current_risk: Optional[float] = None,
+                       locked_features: Optional[List[str]] = None,
+                       objective: Optional[Union[str, Dict[str, float]]] = None) -> tuple:
+    """Hashable strategy cache key; the objective enters in canonical form (name plus normalized
+    weights), so weight mixes are hashable and equivalent spellings share an entry"""
+    resolved = analyzer.resolve_objective(objective)
+    return (tuple(user_data), current_risk, tuple(locked_features or ()),
+            resolved['name'], json.dumps(resolved['weights'], sort_keys=True))
+
+def on_model_swap(bundle: ModelBundle, previous: Optional[ModelBundle]) -> None:
+    """Rebind sessions to the new base bundle; tenant models built on the old one are dropped"""
+    rebind_sessions(bundle, previous)
+    model_pool.clear()
+
+model_pool = ModelPool(
+    build_tenant_bundle,
+    max_bytes=int(float(os.environ.get("MODEL_POOL_MAX_MB", "256")) * 1024 * 1024),
+    bundle_overhead_bytes=int(float(os.environ.get("MODEL_POOL_BUNDLE_OVERHEAD_MB", "8")) * 1024 * 1024)
+)
+
+# Live questionnaire sessions held per worker for the /ws/questionnaire WebSocket,
+# rebound to each newly active bundle
+model_registry = ModelRegistry(on_swap=on_model_swap)
+session_manager = None
+
+# Load and validate the shipped bundle at startup
+logger.info("Loading model and data...")
+try:
+    initial_bundle = build_model_bundle(MODELS_DIR)
+    initial_bundle.validation = validate_model_bundle(initial_bundle, None)
+    model_registry.activate(initial_bundle)
+except Exception as e:
+    logger.error(f"Failed to load the model bundle from {MODELS_DIR}: {str(e)}", exc_info=True)
+logger.info("Model and data loading completed")
+
+async def resolve_model(model_id: Optional[str]) -> Optional[ModelBundle]:
+    """The tenant bundle for model_id, loading it if needed; None selects the active base bundle"""
+    if model_id is None:
+        return None
+    if not BUNDLE_NAME_PATTERN.match(model_id):
+        raise HTTPException(status_code=400, detail=f"Invalid model ID: {model_id}")
+    try:
+        return await model_pool.get(model_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to load model {model_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=503, detail=f"Model {model_id} unavailable: {str(e)}")
+
+async def model_bundle(x_model_id: Optional[str] = Header(None)):
+    """Dependency: lease the requested (X-Model-Id) or active model bundle for the whole request,
+    so a swap or pool eviction drains it"""
+    bundle = await resolve_model(x_model_id)
+    with model_registry.lease(bundle) as leased:
+        yield leased
+
+def require_analyzer(bundle: Optional[ModelBundle]) -> None:
+    if bundle is None or bundle.analyzer is None:
+        logger.error("Mitigation analyzer not initialized")
+        raise HTTPException(status_code=500, detail="Mitigation analyzer not initialized")
+
+# Recent assessments, replayed after startup to warm the caches at low priority
+assessment_log = AssessmentLog(os.environ.get(
+    "ASSESSMENT_LOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "assessments.jsonl")
+))
+cache_warmer = CacheWarmer(
+    assessment_log,
+    model_registry.active().df.iloc[:, :-5].astype(int).values.tolist() if model_registry.active() is not None else [],
+    budget_seconds=float(os.environ.get("CACHE_WARMUP_BUDGET_SECONDS", "120"))
+)
+
+# Readiness: warm-up forward, SHAP and mitigation passes over reference rows must all
+# come in under their latency limits before the service reports ready
+def warm_up_pass(func):
+    """Run a warm-up pass against the bundle active at that moment"""
+    def run(user_data: List[int]):
+        with model_registry.lease() as bundle:
+            return func(bundle, user_data)
+    return run
+
+readiness = ReadinessProbe(
+    [
+        WarmupPass("forward", warm_up_pass(forward_pass), float(os.environ.get("READY_FORWARD_MS", "100"))),
+        WarmupPass("shap", warm_up_pass(lambda bundle, user_data: bundle.analyzer._generate_dynamic_feature_lists(user_data)),
+                   float(os.environ.get("READY_SHAP_MS", "1500"))),
+        WarmupPass("mitigation", warm_up_pass(lambda bundle, user_data: bundle.analyzer.generate_mitigation_strategy(user_data)),
+                   float(os.environ.get("READY_MITIGATION_MS", "3000")))
+    ],
+    model_registry.active().df.iloc[:3, :-5].astype(int).values.tolist() if model_registry.active() is not None else [],
+    missing_components=[] if model_registry.active() is not None else ["validated model bundle"]
+)
+
 @app.get("/health")
 async def health_check():
     """Check if the service is healthy and model is loaded"""
+    bundle = model_registry.active()
     status = {
-        "status": "healthy",
-        "model_loaded": model is not None and df is not None,
-        "model_type": str(type(model)) if model else None,
-        "data_shape": df.shape if df is not None else None,
-        "mitigation_analyzer_loaded": mitigation_analyzer is not None
+        "status": "healthy" if readiness.ready else readiness.state,
+        "ready": readiness.ready,
+        "model_loaded": bundle is not None,
+        "model_version": bundle.version if bundle is not None else None,
+        "model_type": str(type(bundle.model)) if bundle is not None else None,
+        "data_shape": bundle.df.shape if bundle is not None else None,
+        "mitigation_analyzer_loaded": bundle is not None and bundle.analyzer is not None
     }
-    logger.debug(f"Health check: {status}")
-    return status
+    logger.debug("Health check: %s", status)
+    return JSONResponse(jsonable_encoder(status), status_code=503 if readiness.missing_components else 200)
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness: the process is up and its event loop is serving requests"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: 200 once every warm-up pass has run within its latency limit, 503 until then"""
+    status = readiness.stats()
+    return JSONResponse(status, status_code=200 if readiness.ready else 503)
 
 @app.post("/predict")
-async def predict_risks(input_data: RiskInput) -> RiskOutput:
-    """Predict risk probabilities from input data"""
-    global latest_probabilities
+async def predict_risks(input_data: PredictInput, bundle: ModelBundle = Depends(model_bundle)) -> RiskOutput:
+    """Predict risk probabilities from input data, marginalizing over missing or uncertain answers"""
+    logger.debug("Received prediction request with data: %s", input_data.user_data)
     
-    logger.debug(f"Received prediction request with data: {input_data.user_data}")
-    
-    if model is None or df is None:
+    if bundle is None:
         logger.error("Model or data not loaded")
         raise HTTPException(status_code=500, detail="Model or data not loaded")
     
+    partial = any(value is None for value in input_data.user_data) or bool(input_data.answer_distributions)
+    if partial and bundle.marginalizer is None:
+        raise HTTPException(status_code=500, detail="Answer marginalizer not initialized")
+    
     try:
-        # Preprocess input data
-        input_tensor = preprocess_input(input_data.user_data, df)
-        logger.debug(f"Input tensor prepared: {input_tensor.shape}")
+        async with scheduler.slot("interactive"):
+            uncertainty = None
+            if partial:
+                # Expected probabilities over every completion of the unknown answers
+                result = await run_cancellable(
+                    bundle.marginalizer.marginalize, input_data.user_data, input_data.answer_distributions
+                )
+                probs = result.pop('probabilities')
+                uncertainty = PredictionUncertainty(**result)
+                logger.debug("Marginalized predictions over %s expansions (%s): %s", result['expansions'], result['method'], probs)
+            else:
+                probs = await predict_probabilities_batched(bundle, input_data.user_data)
+                await run_in_threadpool(assessment_log.append, "predict", input_data.user_data)
         
-        # Get predictions exactly as in script.py
-        with torch.no_grad():
-            logits = model(input_tensor)
-            probs = torch.sigmoid(logits).squeeze().tolist()
-            logger.debug(f"Predictions generated: {probs}")
-        
-        # Update latest probabilities
-        latest_probabilities = {
-            "ransomware": probs[0],
-            "phishing": probs[1],
-            "dataBreach": probs[2],
-            "insiderAttack": probs[3],
-            "supplyChain": probs[4]
-        }
-        logger.debug(f"Latest probabilities updated: {latest_probabilities}")
-        
-        return RiskOutput(probabilities=probs)
+            # Push the new prediction to this session's stream subscribers only
+            channel = resolve_stream_channel(input_data.session_id, input_data.project_id)
+            if channel is not None:
+                delivered = stream_hub.publish(channel, {
+                    "ransomware": probs[0],
+                    "phishing": probs[1],
+                    "dataBreach": probs[2],
+                    "insiderAttack": probs[3],
+                    "supplyChain": probs[4]
+                })
+                logger.debug("Published probabilities to '%s' (%s subscribers)", channel, delivered)
+        
+            return RiskOutput(probabilities=probs, uncertainty=uncertainty, modelVersion=bundle.version)
+    except SchedulerOverloadedError as e:
+        raise overloaded_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
 @app.post("/predict-simple")
-async def predict_risks_simple(input_data: SimpleRiskInput) -> RiskOutput:
+async def predict_risks_simple(input_data: SimpleRiskInput, bundle: ModelBundle = Depends(model_bundle)) -> RiskOutput:
     """Predict risk probabilities from field-based input data"""
-    logger.debug(f"Received simple prediction request with data: {input_data}")
+    logger.debug("Received simple prediction request with data: %s", input_data)
     
     try:
         # Convert simple input to integer array
         user_data = convert_simple_input_to_integers(input_data)
         
-        # Create RiskInput object and call the main predict function
-        risk_input = RiskInput(user_data=user_data)
+        # Create PredictInput object and call the main predict function
+        risk_input = PredictInput(user_data=user_data)
         
-        return await predict_risks(risk_input)
+        return await predict_risks(risk_input, bundle)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Simple prediction error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Simple prediction error: {str(e)}")
@@ -404,101 +938,959 @@ class RecommendationRiskReductionRequest(BaseModel):
     current_risk: Optional[float] = None  # Override for consistent risk calculation
 
 @app.post("/recommendation-risk-reduction")
-async def calculate_recommendation_risk_reduction(request: RecommendationRiskReductionRequest) -> RecommendationRiskReduction:
+async def calculate_recommendation_risk_reduction(request: RecommendationRiskReductionRequest,
+                                                  bundle: ModelBundle = Depends(model_bundle)) -> RecommendationRiskReduction:
     """Calculate risk reduction for a specific recommendation"""
-    logger.debug(f"Received recommendation risk reduction request: {request}")
+    logger.debug("Received recommendation risk reduction request: %s", request)
     
-    if mitigation_analyzer is None:
-        logger.error("Mitigation analyzer not initialized")
-        raise HTTPException(status_code=500, detail="Mitigation analyzer not initialized")
+    require_analyzer(bundle)
     
     try:
-        # Calculate risk reduction for the specific recommendation
-        risk_reduction_data = mitigation_analyzer.calculate_single_recommendation_risk_reduction(
-            request.user_data,
-            request.featureGroup,
-            request.featureName,
-            request.currentOption,
-            request.recommendedOption,
-            current_risk_override=request.current_risk
-        )
+        async with scheduler.slot("interactive"):
+            # Calculate risk reduction for the specific recommendation
+            risk_reduction_data = await run_cancellable(
+                bundle.analyzer.calculate_single_recommendation_risk_reduction,
+                request.user_data,
+                request.featureGroup,
+                request.featureName,
+                request.currentOption,
+                request.recommendedOption,
+                request.current_risk
+            )
         
-        return RecommendationRiskReduction(
-            featureGroup=request.featureGroup,
-            featureName=request.featureName,
-            currentOption=request.currentOption,
-            recommendedOption=request.recommendedOption,
-            riskReduction=risk_reduction_data['riskReduction'],
-            riskReductionPercentage=risk_reduction_data['riskReductionPercentage']
-        )
+            return RecommendationRiskReduction(
+                featureGroup=request.featureGroup,
+                featureName=request.featureName,
+                currentOption=request.currentOption,
+                recommendedOption=request.recommendedOption,
+                riskReduction=risk_reduction_data['riskReduction'],
+                riskReductionPercentage=risk_reduction_data['riskReductionPercentage'],
+                modelVersion=bundle.version
+            )
         
+    except SchedulerOverloadedError as e:
+        raise overloaded_error(e)
     except Exception as e:
         logger.error(f"Recommendation risk reduction calculation error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Recommendation risk reduction calculation error: {str(e)}")
 
-@app.post("/mitigation-strategy")
-async def generate_mitigation_strategy(input_data: RiskInput) -> MitigationStrategy:
-    """Generate risk mitigation strategy from input data"""
-    logger.debug(f"Received mitigation strategy request with data: {input_data.user_data}")
+def build_mitigation_round(round_data: Dict) -> MitigationRound:
+    """Convert an analyzer round dictionary to its Pydantic model"""
+    recommendations = [
+        MitigationRecommendation(**rec) for rec in round_data['recommendations']
+    ]
+    return MitigationRound(
+        roundNumber=round_data['roundNumber'],
+        features=round_data['features'],
+        currentRisk=round_data['currentRisk'],
+        projectedRisk=round_data['projectedRisk'],
+        riskReduction=round_data['riskReduction'],
+        reductionPercentage=round_data['reductionPercentage'],
+        recommendations=recommendations
+    )
+
+def build_mitigation_strategy(strategy_data: Dict) -> MitigationStrategy:
+    """Convert an analyzer strategy dictionary to its Pydantic model"""
+    return MitigationStrategy(
+        initialRisk=strategy_data['initialRisk'],
+        finalRisk=strategy_data['finalRisk'],
+        totalReduction=strategy_data['totalReduction'],
+        totalReductionPercentage=strategy_data['totalReductionPercentage'],
+        rounds=[build_mitigation_round(round_data) for round_data in strategy_data['rounds']],
+        implementationPriority=strategy_data['implementationPriority'],
+        partial=strategy_data.get('partial', False),
+        degraded=strategy_data.get('degraded', False),
+        degradationReasons=strategy_data.get('degradationReasons', [])
+    )
+
+class RecommendationChange(BaseModel):
+    featureGroup: str
+    recommendedOption: str
+    featureName: Optional[str] = None
+    currentOption: Optional[str] = None
+
+class BatchRecommendationRiskReductionRequest(BaseModel):
+    user_data: List[int]
+    changes: List[RecommendationChange]
+    current_risk: Optional[float] = None  # Override for consistent risk calculation
+
+class BatchRecommendationRiskReduction(BaseModel):
+    currentRisk: float
+    results: List[RecommendationRiskReduction]
+    modelVersion: Optional[str] = None
+
+@app.post("/recommendation-risk-reduction/batch")
+async def calculate_batch_recommendation_risk_reduction(request: BatchRecommendationRiskReductionRequest,
+                                                        bundle: ModelBundle = Depends(model_bundle)) -> BatchRecommendationRiskReduction:
+    """Calculate risk reductions for a list of recommendations in one forward pass"""
+    logger.debug("Received batch recommendation risk reduction request with %s changes", len(request.changes))
     
-    if mitigation_analyzer is None:
-        logger.error("Mitigation analyzer not initialized")
-        raise HTTPException(status_code=500, detail="Mitigation analyzer not initialized")
+    require_analyzer(bundle)
     
     try:
-        # Generate mitigation strategy with optional current_risk override
-        strategy_data = mitigation_analyzer.generate_mitigation_strategy(
-            input_data.user_data, 
-            current_risk_override=input_data.current_risk
-        )
-        logger.debug(f"Mitigation strategy generated successfully")
+        async with scheduler.slot("interactive"):
+            batch_data = await run_cancellable(
+                bundle.analyzer.calculate_batch_recommendation_risk_reduction,
+                request.user_data,
+                [{'featureGroup': change.featureGroup, 'recommendedOption': change.recommendedOption} for change in request.changes],
+                request.current_risk
+            )
         
-        # Convert to Pydantic models
-        rounds = []
-        for round_data in strategy_data['rounds']:
-            recommendations = [
-                MitigationRecommendation(**rec) for rec in round_data['recommendations']
+            results = [
+                RecommendationRiskReduction(
+                    featureGroup=change.featureGroup,
+                    featureName=change.featureName or bundle.analyzer._get_feature_name(change.featureGroup),
+                    currentOption=change.currentOption or "",
+                    recommendedOption=change.recommendedOption,
+                    riskReduction=result['riskReduction'],
+                    riskReductionPercentage=result['riskReductionPercentage']
+                )
+                for change, result in zip(request.changes, batch_data['results'])
             ]
-            round_obj = MitigationRound(
-                roundNumber=round_data['roundNumber'],
-                features=round_data['features'],
-                currentRisk=round_data['currentRisk'],
-                projectedRisk=round_data['projectedRisk'],
-                riskReduction=round_data['riskReduction'],
-                reductionPercentage=round_data['reductionPercentage'],
-                recommendations=recommendations
+        
+            return BatchRecommendationRiskReduction(currentRisk=batch_data['currentRisk'], results=results,
+                                                    modelVersion=bundle.version)
+        
+    except SchedulerOverloadedError as e:
+        raise overloaded_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Batch recommendation risk reduction calculation error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Batch recommendation risk reduction calculation error: {str(e)}")
+
+@app.post("/sensitivity")
+async def calculate_sensitivity(input_data: RiskInput, bundle: ModelBundle = Depends(model_bundle)) -> SensitivityMatrix:
+    """Return how every single-answer change moves each risk probability and the combined score"""
+    logger.debug("Received sensitivity request with data: %s", input_data.user_data)
+    
+    require_analyzer(bundle)
+    
+    try:
+        async with scheduler.slot("interactive"):
+            cache_key = tuple(input_data.user_data)
+            matrix = bundle.caches["sensitivity"].get(cache_key)
+            if matrix is None:
+                matrix = await run_cancellable(bundle.analyzer.compute_sensitivity_matrix, input_data.user_data)
+                bundle.caches["sensitivity"].set(cache_key, matrix)
+            return SensitivityMatrix(**matrix, modelVersion=bundle.version)
+        
+    except SchedulerOverloadedError as e:
+        raise overloaded_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Sensitivity calculation error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Sensitivity calculation error: {str(e)}")
+
+@app.post("/interactions")
+async def calculate_feature_interactions(input_data: RiskInput, http_request: Request,
+                                        bundle: ModelBundle = Depends(model_bundle)) -> FeatureInteractionAnalysis:
+    """Evaluate all pairwise two-feature changes and report their interaction surplus"""
+    logger.debug("Received interaction analysis request with data: %s", input_data.user_data)
+    
+    require_analyzer(bundle)
+    
+    try:
+        cache_key = tuple(input_data.user_data)
+        analysis = bundle.caches["interactions"].get(cache_key)
+        if analysis is None:
+            analysis = await cancel_on_disconnect(http_request, single_flight.run(
+                single_flight_key(bundle, "interactions", input_data.user_data),
+                lambda: run_in_lane(
+                    "analysis", lambda: jsonable_encoder(FeatureInteractionAnalysis(
+                        **bundle.analyzer.compute_pairwise_interactions(input_data.user_data),
+                        modelVersion=bundle.version
+                    ))
+                )
+            ))
+            bundle.caches["interactions"].set(cache_key, analysis)
+        return FeatureInteractionAnalysis(**analysis)
+        
+    except HTTPException:
+        raise
+    except SchedulerOverloadedError as e:
+        raise overloaded_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Interaction analysis error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Interaction analysis error: {str(e)}")
+
+@app.post("/mitigation-strategy")
+async def generate_mitigation_strategy(input_data: RiskInput, http_request: Request,
+                                       bundle: ModelBundle = Depends(model_bundle)) -> MitigationStrategy:
+    """Generate risk mitigation strategy from input data"""
+    logger.debug("Received mitigation strategy request with data: %s", input_data.user_data)
+    
+    require_analyzer(bundle)
+    
+    if input_data.current_risk is not None and input_data.objective is not None and input_data.objective != "combined":
+        # current_risk is a combined-risk baseline; other objectives report their own initial risk
+        raise HTTPException(status_code=400, detail="current_risk applies to the combined objective only")
+    
+    def compute_strategy() -> MitigationStrategy:
+        if input_data.objective is not None and input_data.objective != "combined":
+            # Risk-type objectives use the shared multi-objective pass with a single plan
+            strategy_data = bundle.analyzer.generate_objective_strategies(
+                input_data.user_data, [input_data.objective],
+                locked_features=input_data.locked_features,
+                deadline=deadline
+            )['plans'][0]
+        else:
+            # Generate mitigation strategy with optional current_risk override
+            strategy_data = bundle.analyzer.generate_mitigation_strategy(
+                input_data.user_data, 
+                current_risk_override=input_data.current_risk,
+                locked_features=input_data.locked_features,
+                deadline=deadline
             )
-            rounds.append(round_obj)
-        
-        strategy = MitigationStrategy(
-            initialRisk=strategy_data['initialRisk'],
-            finalRisk=strategy_data['finalRisk'],
-            totalReduction=strategy_data['totalReduction'],
-            totalReductionPercentage=strategy_data['totalReductionPercentage'],
-            rounds=rounds,
-            implementationPriority=strategy_data['implementationPriority']
+        logger.debug("Mitigation strategy generated successfully")
+        with span("build_response"):
+            strategy = build_mitigation_strategy(strategy_data)
+        strategy.modelVersion = bundle.version
+        return strategy
+    
+    try:
+        deadline = latency_deadline(input_data.latency_budget_ms)
+        # Only unbudgeted strategies are cached: a budgeted one may be partial or degraded
+        cache_key = None
+        if input_data.latency_budget_ms is None:
+            cache_key = strategy_cache_key(bundle.analyzer, input_data.user_data, input_data.current_risk,
+                                           input_data.locked_features, input_data.objective)
+            with span("cache_lookup", cache="strategy") as lookup:
+                cached = bundle.caches["strategy"].get(cache_key)
+                lookup.set(hit=cached is not None)
+            if cached is not None:
+                return MitigationStrategy(**cached)
+        key = single_flight_key(
+            bundle, "mitigation-strategy", input_data.user_data,
+            input_data.current_risk, input_data.locked_features, input_data.objective,
+            input_data.latency_budget_ms
         )
-        
+        strategy = await cancel_on_disconnect(
+            http_request, single_flight.run(key, lambda: run_in_lane("analysis", compute_strategy))
+        )
+        if cache_key is not None and not strategy.partial and not strategy.degraded:
+            bundle.caches["strategy"].set(cache_key, jsonable_encoder(strategy))
+        await run_in_threadpool(assessment_log.append, "mitigation-strategy", input_data.user_data)
         return strategy
         
+    except HTTPException:
+        raise
+    except SchedulerOverloadedError as e:
+        raise overloaded_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Mitigation strategy generation error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Mitigation strategy generation error: {str(e)}")
 
+@app.post("/mitigation-strategy/objectives")
+async def generate_objective_strategies(request: ObjectiveStrategyRequest, http_request: Request,
+                                        bundle: ModelBundle = Depends(model_bundle)) -> ObjectiveMitigationStrategies:
+    """Generate mitigation strategies for several objectives sharing one SHAP pass and batched candidates"""
+    logger.debug("Received objective strategies request: %s", request)
+    
+    require_analyzer(bundle)
+    
+    objectives = request.objectives if request.objectives else ["combined"] + RISK_TYPES
+    try:
+        deadline = latency_deadline(request.latency_budget_ms)
+        key = single_flight_key(bundle, "mitigation-objectives", request.user_data, objectives, request.locked_features,
+                                request.latency_budget_ms)
+        result = await cancel_on_disconnect(http_request, single_flight.run(key, lambda: run_in_lane(
+            "analysis", bundle.analyzer.generate_objective_strategies,
+            request.user_data, objectives, request.locked_features, deadline
+        )))
+        logger.debug("Objective strategies generated: %s plans, %s rows scored for %s candidates",
+                     len(result['plans']), result['rowsScored'], result['candidateRows'])
+        
+        plans = [
+            ObjectiveMitigationStrategy(
+                **build_mitigation_strategy(plan).dict(),
+                objective=plan['objective'],
+                objectiveWeights=plan['objectiveWeights'],
+                rankingSource=plan['rankingSource']
+            )
+            for plan in result['plans']
+        ]
+        return ObjectiveMitigationStrategies(
+            plans=plans,
+            candidateRows=result['candidateRows'],
+            rowsScored=result['rowsScored'],
+            modelVersion=bundle.version
+        )
+        
+    except HTTPException:
+        raise
+    except SchedulerOverloadedError as e:
+        raise overloaded_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Objective strategies error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Objective strategies error: {str(e)}")
+
+@app.post("/mitigation-plan/optimal")
+async def find_optimal_mitigation_plan(request: OptimalPlanRequest, http_request: Request,
+                                       bundle: ModelBundle = Depends(model_bundle)) -> OptimalMitigationPlan:
+    """Find the best plan with at most k changes or within a cost budget, or the fewest changes reaching a target.
+    
+    solver="relaxed" uses the gradient planner only when the plan can change at least
+    RELAXED_SOLVER_MIN_CHANGES answers (default 6): max_changes for best_k, or the number
+    of cheapest changes that fit the budget. Smaller plans run the exact search, and the
+    response's solver field reports which one ran.
+    """
+    logger.debug("Received optimal plan request: %s", request)
+    
+    if bundle is None or bundle.plan_search is None:
+        logger.error("Mitigation plan search not initialized")
+        raise HTTPException(status_code=500, detail="Mitigation plan search not initialized")
+    
+    locked_features = list(DEFAULT_LOCKED_FEATURES) if request.locked_features is None else request.locked_features
+    try:
+        objective = bundle.analyzer.resolve_objective(request.objective)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if request.change_costs is not None and request.mode != "budget":
+        raise HTTPException(status_code=400, detail="change_costs is only supported in budget mode")
+    if request.solver == "exact":
+        planner = bundle.plan_search
+        objective_args = {'risk_fn': lambda probs: bundle.analyzer.objective_risk(probs, objective)}
+    elif request.solver == "relaxed":
+        if request.mode == "fewest_changes":
+            raise HTTPException(status_code=400, detail="fewest_changes mode requires the exact solver")
+        planner = bundle.relaxed_planner
+        objective_args = {'objective': request.objective}
+    else:
+        raise HTTPException(status_code=400, detail="solver must be 'exact' or 'relaxed'")
+    
+    if request.mode == "best_k":
+        if request.max_changes is None or request.max_changes < 0:
+            raise HTTPException(status_code=400, detail="max_changes must be a non-negative integer for best_k mode")
+        search_call = lambda: planner.best_plan_with_k_changes(
+            request.user_data, request.max_changes, locked_features=locked_features, **objective_args
+        )
+    elif request.mode == "budget":
+        if request.budget is None:
+            raise HTTPException(status_code=400, detail="budget is required for budget mode")
+        search_call = lambda: planner.best_plan_within_budget(
+            request.user_data, request.budget,
+            change_costs=request.change_costs, locked_features=locked_features, **objective_args
+        )
+    elif request.mode == "fewest_changes":
+        if request.target_risk is None:
+            raise HTTPException(status_code=400, detail="target_risk is required for fewest_changes mode")
+        search_call = lambda: bundle.plan_search.fewest_changes_to_target(
+            request.user_data, request.target_risk,
+            target_mode=request.target_mode, max_changes=request.max_changes,
+            locked_features=locked_features, **objective_args
+        )
+    else:
+        raise HTTPException(status_code=400, detail="mode must be 'best_k', 'budget' or 'fewest_changes'")
+    
+    try:
+        key = single_flight_key(
+            bundle, "mitigation-plan", request.user_data,
+            request.dict(exclude={'user_data', 'locked_features'}), locked_features
+        )
+        result = await cancel_on_disconnect(
+            http_request, single_flight.run(key, lambda: run_in_lane("analysis", search_call))
+        )
+        return OptimalMitigationPlan(**{**result, 'objective': objective['name'], 'modelVersion': bundle.version})
+    except HTTPException:
+        raise
+    except SchedulerOverloadedError as e:
+        raise overloaded_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Optimal plan search error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Optimal plan search error: {str(e)}")
+
+@app.post("/mitigation-strategy/stream")
+async def stream_mitigation_strategy(input_data: RiskInput, bundle: ModelBundle = Depends(model_bundle)):
+    """Stream the mitigation strategy as Server-Sent Events while it is computed.
+    
+    Emits a 'ranking' event with the SHAP feature lists, one 'round' event per
+    MitigationRound as soon as its search finishes, then a 'summary' event with
+    the full MitigationStrategy (or an 'error' event).
+    """
+    logger.debug("Received streaming mitigation strategy request with data: %s", input_data.user_data)
+    
+    require_analyzer(bundle)
+    
+    if input_data.objective is not None and input_data.objective != "combined":
+        raise HTTPException(status_code=400, detail="Streaming supports the combined objective only; use /mitigation-strategy/objectives")
+    
+    try:
+        deadline = latency_deadline(input_data.latency_budget_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # The analysis slot is held for the whole stream; released by the generator or,
+    # if the client left before it started, by the response's background task
+    try:
+        lane = await scheduler.acquire("analysis")
+    except SchedulerOverloadedError as e:
+        raise overloaded_error(e)
+    released = False
+    
+    def release_slot():
+        nonlocal released
+        if not released:
+            released = True
+            scheduler.release(lane)
+    
+    async def event_generator():
+        events = bundle.analyzer.iter_mitigation_strategy(
+            input_data.user_data,
+            current_risk_override=input_data.current_risk,
+            locked_features=input_data.locked_features,
+            deadline=deadline
+        )
+        try:
+            # The stream outlives the endpoint call, so it keeps its own lease on the bundle
+            with model_registry.lease(bundle):
+                while True:
+                    # Advance the analyzer one stage at a time off the event loop; a client
+                    # disconnect cancels this generator and, through the token, the stage
+                    item = await run_cancellable(next, events, None)
+                    if item is None:
+                        break
+                    
+                    event_type, payload = item
+                    if event_type == 'round':
+                        payload = jsonable_encoder(build_mitigation_round(payload))
+                    elif event_type == 'summary':
+                        strategy = build_mitigation_strategy(payload)
+                        strategy.modelVersion = bundle.version
+                        payload = jsonable_encoder(strategy)
+                    
+                    yield {
+                        "event": event_type,
+                        "data": dumps_event(payload)
+                    }
+        except Exception as e:
+            logger.error(f"Streaming mitigation strategy error: {str(e)}", exc_info=True)
+            yield {
+                "event": "error",
+                "data": json.dumps({"detail": f"Mitigation strategy generation error: {str(e)}"})
+            }
+        finally:
+            events.close()
+            release_slot()
+    
+    return EventSourceResponse(event_generator(), background=BackgroundTask(release_slot))
+
 @app.get("/stream")
-async def stream_risk_probabilities():
-    """Stream risk probabilities using Server-Sent Events"""
+async def stream_risk_probabilities(session_id: Optional[str] = Query(None), project_id: Optional[str] = Query(None)):
+    """Stream risk probabilities for one session or project using Server-Sent Events"""
+    channel = resolve_stream_channel(session_id, project_id)
+    if channel is None:
+        raise HTTPException(status_code=400, detail="session_id or project_id query parameter is required")
+    
+    try:
+        stream_hub.check_capacity()
+    except StreamCapacityError as e:
+        logger.warning(f"Rejecting stream subscription: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    # Events are pushed only when a new prediction is published; sse-starlette sends
+    # heartbeat pings and cancels the generator when the client disconnects
+    return EventSourceResponse(stream_hub.events(channel), ping=STREAM_HEARTBEAT_SECONDS)
+
+# Job kind -> (request model, endpoint); workers call the endpoint function directly
+JOB_KINDS = {
+    "mitigation-strategy": (RiskInput, generate_mitigation_strategy),
+    "mitigation-objectives": (ObjectiveStrategyRequest, generate_objective_strategies),
+    "mitigation-plan": (OptimalPlanRequest, find_optimal_mitigation_plan)
+}
+
+def job_handler(kind: str):
+    """Run a queued job through its endpoint; a request shed by the scheduler is retried later"""
+    request_model, endpoint = JOB_KINDS[kind]
+    
+    async def handle(params: Dict) -> Dict:
+        params = dict(params)
+        try:
+            with model_registry.lease(await resolve_model(params.pop("modelId", None))) as bundle:
+                result = await endpoint(request_model(**params), None, bundle)
+        except HTTPException as e:
+            if e.status_code == 429:
+                raise JobDeferred(float(e.headers["Retry-After"]))
+            raise
+        return jsonable_encoder(result)
+    
+    return handle
+
+def publish_job_status(job_id: str) -> None:
+    """Push a job's current status to its /jobs/{job_id}/events subscribers"""
+    job = job_store.get(job_id)
+    if job is not None:
+        stream_hub.publish(f"job:{job_id}", job)
+
+def require_job_store():
+    if job_store is None or job_workers is None:
+        logger.error("Job store not initialized")
+        raise HTTPException(status_code=500, detail="Job store not initialized")
+
+@app.post("/jobs/{kind}", status_code=202)
+async def submit_job(kind: str, params: Dict, x_model_id: Optional[str] = Header(None),
+                     bundle: ModelBundle = Depends(model_bundle)) -> JobSubmission:
+    """Queue an analysis and return its job ID at once; identical submissions share one job"""
+    require_job_store()
+    if kind not in JOB_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown job kind '{kind}'; expected one of {sorted(JOB_KINDS)}")
+    
+    request_model, _ = JOB_KINDS[kind]
+    try:
+        # Validate now so a malformed submission fails here rather than in a worker
+        params = jsonable_encoder(request_model(**params))
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if x_model_id is not None:
+        params["modelId"] = x_model_id
+    
+    try:
+        job, deduplicated = await run_in_threadpool(
+            job_store.submit, kind, params, bundle.version if bundle is not None else None
+        )
+        if not deduplicated:
+            job_workers.notify()
+        logger.info(f"Job {job['jobId']} ({kind}) {'deduplicated' if deduplicated else 'queued'}")
+        return JobSubmission(**job, deduplicated=deduplicated)
+    except Exception as e:
+        logger.error(f"Job submission error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Job submission error: {str(e)}")
+
+@app.get("/jobs/stats")
+async def job_stats():
+    """Job counts by status and worker pool counters"""
+    require_job_store()
+    return await run_in_threadpool(job_workers.stats)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> JobStatus:
+    """Report a job's status"""
+    require_job_store()
+    job = await run_in_threadpool(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JobStatus(**job)
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Return a finished job's result; 202 with its status while it is still pending"""
+    require_job_store()
+    job = await run_in_threadpool(job_store.get, job_id, True)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=job["errorStatus"] or 500, detail=job["error"])
+    if job["status"] != "succeeded":
+        job.pop("result", None)
+        return Response(content=json.dumps(job), status_code=202, media_type="application/json",
+                        headers={"Retry-After": "2"})
+    return job["result"]
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events: a 'status' event on every state change, ending once the job has finished"""
+    require_job_store()
+    job = await run_in_threadpool(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    
+    try:
+        stream_hub.check_capacity()
+    except StreamCapacityError as e:
+        logger.warning(f"Rejecting job event subscription: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    
     async def event_generator():
+        # Subscribes on first iteration; the hub's replay of the latest payload covers
+        # any change between the lookup above and the subscription
+        events = stream_hub.events(f"job:{job_id}")
+        try:
+            # Current state first, so a job that already finished completes the stream at once
+            last = json.dumps(job)
+            yield {"event": "status", "data": last}
+            if job["status"] in TERMINAL_STATES:
+                return
+            async for event in events:
+                if event["data"] == last:
+                    continue  # the hub replays its latest payload on subscribe
+                last = event["data"]
+                yield {"event": "status", "data": last}
+                if json.loads(last)["status"] in TERMINAL_STATES:
+                    return
+        finally:
+            await events.aclose()
+    
+    return EventSourceResponse(event_generator(), ping=STREAM_HEARTBEAT_SECONDS)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: stage latency histograms, cache outcomes, batch sizes and fallbacks"""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """Span tree of a recent traced request (see TraceMiddleware); the full history is in TRACE_LOG_PATH"""
+    trace = trace_log.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Trace not found: {trace_id}")
+    return trace
+
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    """Per-lane concurrency, queue depth, shed counts and queue-wait percentiles"""
+    return scheduler.stats()
+
+@app.get("/single-flight/stats")
+async def single_flight_stats():
+    """Deduplication counters for the shared heavy computations"""
+    return single_flight.stats()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Per-tier hit counters of the result caches and the size of the shared on-disk cache"""
+    bundle = model_registry.active()
+    return {
+        "modelVersion": bundle.version if bundle is not None else None,
+        "caches": {name: cache.stats() for name, cache in bundle.caches.items()} if bundle is not None else {},
+        "persistent": await run_in_threadpool(persistent_cache.stats) if persistent_cache is not None else None,
+        "warmup": cache_warmer.stats()
+    }
+
+@app.get("/models")
+async def model_registry_stats():
+    """Active model bundle, bundles still draining in-flight requests, recent load history and
+    the per-tenant model pool"""
+    bundle = model_registry.active()
+    return {
+        **model_registry.stats(),
+        "batching": bundle.batcher.stats() if bundle is not None and bundle.batcher is not None else None,
+        "pool": model_pool.stats()
+    }
+
+model_load_task: Optional[asyncio.Task] = None
+
+@app.post("/models/load", status_code=202)
+async def load_model_bundle(load_request: ModelLoadRequest):
+    """Load, validate and swap in a model bundle in the background; poll /models for the outcome"""
+    global model_load_task
+    if load_request.bundle is None:
+        source = MODELS_DIR
+    elif BUNDLE_NAME_PATTERN.match(load_request.bundle):
+        source = os.path.join(BUNDLES_DIR, load_request.bundle)
+    else:
+        raise HTTPException(status_code=400, detail=f"Invalid bundle name: {load_request.bundle}")
+    if not os.path.isdir(source):
+        raise HTTPException(status_code=404, detail=f"Model bundle not found: {load_request.bundle}")
+    if model_registry.stats()["loading"] is not None or (model_load_task is not None and not model_load_task.done()):
+        raise HTTPException(status_code=409, detail="Another model bundle is still loading")
+    
+    async def load():
+        try:
+            await model_registry.load(source, build_model_bundle, validate_model_bundle)
+        except ModelRegistryBusyError as e:
+            logger.warning(f"Model bundle load skipped: {str(e)}")
+        except Exception:
+            pass  # recorded in the registry history and logged by the registry
+    
+    model_load_task = asyncio.create_task(load())
+    return {"status": "loading", "source": os.path.relpath(source, MODELS_DIR)}
+
+# Admin-only profiling of the live worker; disabled unless ADMIN_TOKEN is set
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", "60"))
+profiler_guard = ProfilerGuard(min_interval=float(os.environ.get("PROFILE_MIN_INTERVAL_SECONDS", "30")))
+memory_profiler = MemoryProfiler()
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Reject requests without the admin token; every admin endpoint is off when none is configured"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Token")
+
+def profiler_error(e: Exception) -> HTTPException:
+    """409 while another capture runs, 429 with Retry-After when captures come too often"""
+    if isinstance(e, ProfilerRateLimitedError):
+        return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return HTTPException(status_code=409, detail=str(e))
+
+@app.post("/admin/profile/cpu", dependencies=[Depends(require_admin)])
+async def profile_cpu(seconds: float = Query(10.0), interval_ms: float = Query(5.0),
+                      format: str = Query("collapsed"), include_idle: bool = Query(False)):
+    """Sample every thread's stack for `seconds` and return collapsed stacks, an SVG flame graph or JSON"""
+    try:
+        if not 0 < seconds <= PROFILE_MAX_SECONDS:
+            raise ValueError(f"seconds must be in (0, {PROFILE_MAX_SECONDS:g}]")
+        if not 1 <= interval_ms <= 1000:
+            raise ValueError("interval_ms must be between 1 and 1000")
+        if format not in ("collapsed", "svg", "json"):
+            raise ValueError("format must be one of collapsed, svg, json")
+        with profiler_guard.capture("cpu"):
+            stacks = await run_in_threadpool(sample_stacks, seconds, interval_ms / 1000.0, include_idle)
+        if format == "svg":
+            title = f"CPU profile, {seconds:g}s every {interval_ms:g}ms"
+            return Response(flamegraph_svg(stacks, title), media_type="image/svg+xml")
+        if format == "json":
+            return {"seconds": seconds, "intervalMs": interval_ms, "samples": sum(stacks.values()), "stacks": stacks}
+        return PlainTextResponse(collapsed_text(stacks))
+    except (ProfilerBusyError, ProfilerRateLimitedError) as e:
+        raise profiler_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"CPU profile error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"CPU profile error: {str(e)}")
+
+@app.post("/admin/profile/memory/start", dependencies=[Depends(require_admin)])
+async def start_memory_profile(frames: int = Query(25, ge=1, le=100)):
+    """Start tracemalloc; allocations are slower while it runs, so stop it when done"""
+    return memory_profiler.start(frames)
+
+@app.post("/admin/profile/memory/stop", dependencies=[Depends(require_admin)])
+async def stop_memory_profile():
+    """Stop tracemalloc and drop the baseline snapshot"""
+    return memory_profiler.stop()
+
+@app.get("/admin/profile/memory/snapshot", dependencies=[Depends(require_admin)])
+async def memory_snapshot(key: str = Query("lineno"), limit: int = Query(25, ge=1, le=500)):
+    """Top allocation sites, plus their growth since the previous snapshot"""
+    try:
+        with profiler_guard.capture("memory"):
+            return await run_in_threadpool(memory_profiler.snapshot, key, limit)
+    except (ProfilerBusyError, ProfilerRateLimitedError) as e:
+        raise profiler_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Memory snapshot error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Memory snapshot error: {str(e)}")
+
+@app.post("/admin/profile/model", dependencies=[Depends(require_admin)])
+async def profile_model_calls(calls: int = Query(10, ge=1, le=1000), timeout: float = Query(30.0),
+                              bundle: ModelBundle = Depends(model_bundle)):
+    """Capture the next `calls` forward passes of the model (X-Model-Id selects a tenant model)
+    with the torch autograd profiler and return per-call wall times and the top operators"""
+    try:
+        if not 0 < timeout <= PROFILE_MAX_SECONDS:
+            raise ValueError(f"timeout must be in (0, {PROFILE_MAX_SECONDS:g}]")
+        with profiler_guard.capture("model"):
+            result = await ModelCallProfiler(bundle.model, calls).run(timeout)
+        return {"modelVersion": bundle.version, **result}
+    except (ProfilerBusyError, ProfilerRateLimitedError) as e:
+        raise profiler_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Model profile error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Model profile error: {str(e)}")
+
+@app.get("/admin/profile/stats", dependencies=[Depends(require_admin)])
+async def profile_stats():
+    """Running capture, capture and refusal counts, and tracemalloc status"""
+    return {**profiler_guard.stats(), "memory": memory_profiler.status()}
+
+@app.get("/stream/stats")
+async def stream_stats():
+    """Report stream hub channel and subscriber counts"""
+    return stream_hub.stats()
+
+async def push_session_scores(websocket: WebSocket, session, incremental: bool) -> None:
+    """Send a session's current scores (and top recommendations, if requested) to its client"""
+    if session.is_complete():
+        scores = session_manager.score(session)  # cached expert state: no full forward pass
+    else:
+        scores = await run_in_threadpool(session_manager.score, session)
+    await websocket.send_json({
+        "type": "scores",
+        "version": session.version,
+        "incremental": incremental,
+        **scores
+    })
+    
+    # Keep /stream subscribers of this session in sync with the live form
+    stream_hub.publish(resolve_stream_channel(session.session_id), dict(zip(RISK_TYPES, scores['probabilities'])))
+    
+    if session.recommendations > 0 and session.is_complete():
+        items = await run_in_threadpool(session_manager.top_recommendations, session, session.recommendations)
+        await websocket.send_json({"type": "recommendations", "version": session.version, "items": items})
+
+@app.websocket("/ws/questionnaire")
+async def questionnaire_session(websocket: WebSocket, session_id: Optional[str] = Query(None)):
+    """Live questionnaire editing: field changes are applied to server-side state and re-scored.
+    
+    Client messages: {"type": "answer", "feature": "1.3", "value": 1 | null, "distribution": [...]},
+    {"type": "answers", "user_data": [...]}, {"type": "options", "recommendations": N},
+    {"type": "ping"} and {"type": "close"}. The server replies with "session", "scores",
+    "recommendations", "pong" and "error" messages.
+    """
+    await websocket.accept()
+    if session_manager is None:
+        await websocket.close(code=1011, reason="Mitigation analyzer not initialized")
+        return
+    
+    try:
+        session, resumed = session_manager.open(session_id)
+    except SessionCapacityError as e:
+        logger.warning(f"Rejecting questionnaire session: {str(e)}")
+        await websocket.close(code=1013, reason=str(e))
+        return
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    
+    # One live connection per session: a reconnect takes over from a stale socket
+    previous = session.connection
+    session.connection = websocket
+    if previous is not None:
+        try:
+            await previous.close(code=4000, reason="Session resumed by another connection")
+        except Exception:
+            pass
+    
+    try:
+        await websocket.send_json({
+            "type": "session",
+            "sessionId": session.session_id,
+            "resumed": resumed,
+            "answers": session.answers,
+            "version": session.version
+        })
+        if resumed and any(value is not None for value in session.answers):
+            await push_session_scores(websocket, session, incremental=False)
+        
         while True:
-            if latest_probabilities:
-                yield {
-                    "event": "message",
-                    "data": json.dumps(latest_probabilities)
-                }
-            await asyncio.sleep(1)
+            message = await websocket.receive_text()
+            session_manager.touch(session)
+            if len(message) > session_manager.max_message_bytes:
+                await websocket.send_json({"type": "error", "detail": f"Message exceeds {session_manager.max_message_bytes} bytes"})
+                continue
+            
+            try:
+                data = json.loads(message)
+                message_type = data.get("type")
+                incremental = False
+                if message_type == "ping":
+                    await websocket.send_json({"type": "pong"})
+                    continue
+                elif message_type == "answer":
+                    incremental = session_manager.set_answer(
+                        session, data.get("feature"), data.get("value"), data.get("distribution")
+                    )
+                elif message_type == "answers":
+                    session_manager.set_all_answers(session, data.get("user_data") or [])
+                elif message_type == "options":
+                    session.recommendations = max(0, int(data.get("recommendations", 0)))
+                elif message_type == "close":
+                    session_manager.close(session.session_id)
+                    await websocket.close(code=1000)
+                    return
+                else:
+                    raise ValueError(f"Unknown message type: {message_type}")
+                
+                await push_session_scores(websocket, session, incremental)
+            except (ValueError, TypeError, AttributeError) as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+    
+    except WebSocketDisconnect:
+        logger.debug("Questionnaire session %s disconnected", session.session_id)
+    except Exception as e:
+        logger.error(f"Questionnaire session error: {str(e)}", exc_info=True)
+    finally:
+        if session.connection is websocket:
+            session.connection = None
+
+@app.get("/ws/questionnaire/stats")
+async def questionnaire_session_stats():
+    """Report live questionnaire session counts"""
+    if session_manager is None:
+        raise HTTPException(status_code=500, detail="Mitigation analyzer not initialized")
+    return session_manager.stats()
+
+async def evict_idle_sessions():
+    """Periodically drop idle questionnaire sessions and close their sockets"""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_SECONDS)
+        try:
+            for session in session_manager.evict_idle():
+                if session.connection is not None:
+                    try:
+                        await session.connection.close(code=4408, reason="Session idle timeout")
+                    except Exception:
+                        pass
+        except Exception as e:
+            logger.error(f"Session eviction error: {str(e)}")
+
+@app.on_event("startup")
+async def start_session_sweeper():
+    """Start the idle questionnaire session sweeper"""
+    if session_manager is not None:
+        asyncio.create_task(evict_idle_sessions())
+
+def warm_assessment(user_data: List[int]) -> None:
+    """Precompute the prediction and default mitigation strategy of one assessment"""
+    with model_registry.lease() as bundle:
+        predict_probabilities(bundle, user_data)
+        cache_key = strategy_cache_key(bundle.analyzer, user_data)
+        if bundle.caches["strategy"].get(cache_key) is None:
+            strategy = build_mitigation_strategy(bundle.analyzer.generate_mitigation_strategy(user_data))
+            strategy.modelVersion = bundle.version
+            bundle.caches["strategy"].set(cache_key, jsonable_encoder(strategy))
+
+async def warm_caches():
+    """Replay recent and reference assessments in the background lane, behind live traffic"""
+    try:
+        await cache_warmer.run(lambda user_data: run_in_lane("background", warm_assessment, user_data))
+    except Exception as e:
+        logger.error(f"Cache warm-up error: {str(e)}", exc_info=True)
+
+async def warm_up():
+    """Run the readiness warm-up passes, then warm the result caches behind live traffic"""
+    if await readiness.run() and cache_warmer.budget_seconds > 0:
+        await warm_caches()
+
+warm_up_task = None
+
+@app.on_event("startup")
+async def start_warm_up():
+    """Start warm-up without delaying startup; /health/ready flips once it passes"""
+    global warm_up_task
+    warm_up_task = asyncio.create_task(warm_up())
+
+@app.on_event("shutdown")
+async def stop_warm_up():
+    """Stop a warm-up that is still running, waiting for its current pass to finish"""
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+        await asyncio.gather(warm_up_task, return_exceptions=True)
+
+@app.on_event("startup")
+async def start_job_workers():
+    """Start the job worker pool; jobs left running by a previous process are requeued once their lease lapses"""
+    global job_workers
+    if job_store is not None:
+        job_workers = JobWorkerPool(
+            job_store, {kind: job_handler(kind) for kind in JOB_KINDS},
+            workers=JOB_WORKERS, on_update=publish_job_status
+        )
+        job_workers.start()
 
-    return EventSourceResponse(event_generator())
+@app.on_event("shutdown")
+async def stop_job_workers():
+    """Stop the workers; their unfinished jobs are picked up again after a restart"""
+    if job_workers is not None:
+        await job_workers.stop()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=50004, log_level="debug") 
\ No newline at end of file
+    # log_config=None keeps uvicorn's loggers on the queued pipeline set up above
+    uvicorn.run(app, host="0.0.0.0", port=50004, log_config=None,
+                log_level=os.environ.get("LOG_LEVEL", "INFO").lower()) 
\ No newline at end of file
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the exact branch-and-bound plan search against the greedy SHAP strategy
+on the rows of models/new_data.csv.
+
+For every row the greedy strategy is run once. Its first round is compared with
+the exact best plan using the same number of changed answers, and with the fewest
+changes that reach the same risk. Its full plan is compared with a time-limited
+exact search and with the gradient relaxation planner at the same number of changes.
+
+Run from this directory with:  python benchmark_mitigation_search.py [max_rows]
+"""
+
+import sys
+import time
+import logging
+import numpy as np
+
+logging.disable(logging.WARNING)
+
+import app
+from risk_plan_search import MitigationPlanSearch
+from risk_relaxation_planner import RelaxedMitigationPlanner
+
+def count_changes(analyzer, user_data, rounds):
+    """Replay greedy rounds and count how many answers end up different"""
+    final = {}
+    for round_data in rounds:
+        for rec in round_data['recommendations']:
+            final[rec['featureGroup']] = rec['optionIndex']
+    changed = 0
+    for feature, value in zip(analyzer.feature_cols, user_data):
+        current_index = analyzer.feature_blocks[feature].index(analyzer.column_positions[f"{feature}_{value}"])
+        if final.get(feature, current_index) != current_index:
+            changed += 1
+    return changed
+
+def summarize(label, values):
+    print(f"{label:<34} median {np.median(values):8.1f} ms   p95 {np.percentile(values, 95):8.1f} ms")
+
+def main(max_rows=None):
+    # Pin the active model bundle for the whole run, as the service's requests do
+    with app.model_registry.lease() as bundle:
+        if bundle is None or bundle.analyzer is None:
+            print("Mitigation analyzer failed to load")
+            return
+        run_benchmark(bundle.analyzer, bundle.df, max_rows)
+
+def run_benchmark(analyzer, df, max_rows=None):
+    search = MitigationPlanSearch(analyzer, time_limit=5.0, tolerance=1e-4)
+    relaxed = RelaxedMitigationPlanner(search, min_changes=0)  # always the relaxation, even for small k
+    rows = df.iloc[:, :-5].astype(int).values.tolist()
+    if max_rows:
+        rows = rows[:max_rows]
+
+    header = (f"{'row':>4} | {'k1':>3} {'greedy r1':>10} {'exact':>10} {'ms':>7} {'fewest':>6} {'ms':>7} | "
+              f"{'k':>3} {'greedy':>8} {'exact':>8} {'ms':>7} {'opt':>4} {'relaxed':>8} {'ms':>7} | {'greedy ms':>9}")
+    print(header)
+    print('-' * len(header))
+
+    stats = {'greedy': [], 'exact_r1': [], 'fewest_r1': [], 'exact_full': [],
+             'relaxed_full': [], 'gain_r1': [], 'saved_r1': [], 'gain_full': [], 'relaxed_vs_exact': [],
+             'proved': 0, 'searches': 0}
+    for i, user_data in enumerate(rows):
+        start = time.perf_counter()
+        strategy = analyzer.generate_mitigation_strategy(user_data)
+        greedy_ms = (time.perf_counter() - start) * 1000
+        if not strategy['rounds']:
+            continue
+
+        k1 = count_changes(analyzer, user_data, strategy['rounds'][:1])
+        risk_r1 = strategy['rounds'][0]['projectedRisk']
+        k_full = count_changes(analyzer, user_data, strategy['rounds'])
+
+        exact_r1 = search.best_plan_with_k_changes(user_data, k1)
+        fewest_r1 = search.fewest_changes_to_target(user_data, risk_r1)
+        exact_full = search.best_plan_with_k_changes(user_data, k_full)
+        relaxed_full = relaxed.best_plan_with_k_changes(user_data, k_full)
+
+        stats['greedy'].append(greedy_ms)
+        stats['exact_r1'].append(exact_r1['elapsedMs'])
+        stats['fewest_r1'].append(fewest_r1['elapsedMs'])
+        stats['exact_full'].append(exact_full['elapsedMs'])
+        stats['relaxed_full'].append(relaxed_full['elapsedMs'])
+        stats['gain_r1'].append(risk_r1 - exact_r1['finalRisk'])
+        if fewest_r1['feasible']:
+            stats['saved_r1'].append(k1 - fewest_r1['numChanges'])
+        stats['gain_full'].append(strategy['finalRisk'] - exact_full['finalRisk'])
+        stats['relaxed_vs_exact'].append(relaxed_full['finalRisk'] - exact_full['finalRisk'])
+        stats['proved'] += exact_r1['optimal'] + fewest_r1['optimal'] + exact_full['optimal']
+        stats['searches'] += 3
+
+        fewest_k = str(fewest_r1['numChanges']) if fewest_r1['feasible'] else '-'
+        print(f"{i:>4} | {k1:>3} {risk_r1:>10.5f} {exact_r1['finalRisk']:>10.5f} {exact_r1['elapsedMs']:>7.1f} "
+              f"{fewest_k:>6} {fewest_r1['elapsedMs']:>7.1f} | "
+              f"{k_full:>3} {strategy['finalRisk']:>8.5f} {exact_full['finalRisk']:>8.5f} {exact_full['elapsedMs']:>7.1f} "
+              f"{str(exact_full['optimal'])[0]:>4} {relaxed_full['finalRisk']:>8.5f} {relaxed_full['elapsedMs']:>7.1f} | "
+              f"{greedy_ms:>9.1f}")
+
+    print()
+    print(f"Rows: {len(stats['greedy'])}")
+    summarize("Greedy strategy (SHAP + rounds)", stats['greedy'])
+    summarize("Exact best plan at round-1 k", stats['exact_r1'])
+    summarize("Fewest changes to round-1 risk", stats['fewest_r1'])
+    summarize("Exact best plan at full k", stats['exact_full'])
+    summarize("Relaxed planner at full k", stats['relaxed_full'])
+    print(f"Round-1 risk improvement at equal k: mean {np.mean(stats['gain_r1']):.5f}, max {np.max(stats['gain_r1']):.5f}")
+    if stats['saved_r1']:
+        print(f"Changes saved reaching round-1 risk: mean {np.mean(stats['saved_r1']):.2f}, max {np.max(stats['saved_r1'])}")
+    print(f"Full-plan risk improvement at equal k: mean {np.mean(stats['gain_full']):.5f}, max {np.max(stats['gain_full']):.5f}")
+    print(f"Relaxed minus exact risk at full k: mean {np.mean(stats['relaxed_vs_exact']):.5f}, "
+          f"max {np.max(stats['relaxed_vs_exact']):.5f}")
+    print(f"Searches proved optimal (within {search.tolerance:g}): {stats['proved']}/{stats['searches']}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else None)
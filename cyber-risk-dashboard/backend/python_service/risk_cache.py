@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Cache Module
+In-process and persistent on-disk caches for per-assessment analysis results
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+import logging
+
+from risk_metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+def model_fingerprint(model, *extras: str) -> str:
+    """Short content hash of a model's weights (and any extra inputs such as its encoder
+    data), used as its version in cache and dedup keys"""
+    digest = hashlib.sha256()
+    for name, tensor in sorted(model.state_dict().items()):
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    for extra in extras:
+        digest.update(extra.encode())
+    return digest.hexdigest()[:12]
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with hit/miss counters"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value or None, refreshing its recency"""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries beyond maxsize"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+_PERSISTENT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires_at);
+"""
+
+class PersistentCache:
+    """Size-capped SQLite cache shared by every worker process on a host and kept across restarts.
+
+    Values are stored as JSON. The database runs in WAL mode with one connection per
+    thread, so reads never block and never take a Python lock; concurrent writers
+    (threads or processes) are serialized by SQLite's own short write lock, and a
+    write that cannot get it within busy_timeout is dropped rather than stalling the
+    request. Every sweep_every writes, expired entries are deleted and, above
+    max_bytes, the least recently read entries are evicted down to 90% of the cap.
+    Last-read times are only refreshed every touch_interval seconds, so hot reads stay
+    read-only.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, ttl_seconds: float = 30 * 24 * 3600,
+                 busy_timeout: float = 0.05, sweep_every: int = 256, touch_interval: float = 300.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.busy_timeout = busy_timeout
+        self.sweep_every = sweep_every
+        self.touch_interval = touch_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.dropped_writes = 0
+        conn = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_PERSISTENT_SCHEMA)
+        conn.close()
+        logger.info(f"Persistent cache opened at {path} ({max_bytes // (1024 * 1024)} MB cap)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(namespace: str, version: Optional[str], key: Hashable) -> str:
+        """Stable text key: namespace, model version and a hash of the caller's key"""
+        return f"{namespace}:{version}:{hashlib.sha256(repr(key).encode()).hexdigest()}"
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        try:
+            row = self._conn().execute(
+                "SELECT value, accessed_at FROM entries WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent cache read failed: {str(e)}")
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if now - row[1] > self.touch_interval:
+            self._execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        try:
+            payload = json.dumps(value)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Persistent cache skipped a value that is not JSON-serializable: {str(e)}")
+            return
+        now = time.time()
+        namespace = key.split(":", 1)[0]
+        if not self._execute(
+            "INSERT OR REPLACE INTO entries (key, namespace, value, size, created_at, accessed_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, namespace, payload, len(payload) + len(key), now, now, now + self.ttl_seconds)
+        ):
+            return
+        self._writes += 1
+        if self._writes % self.sweep_every == 0:
+            self.sweep()
+
+    def _execute(self, sql: str, params: tuple) -> bool:
+        """Best-effort write; False if the database stayed locked or failed"""
+        try:
+            self._conn().execute(sql, params)
+            return True
+        except sqlite3.Error as e:
+            self.dropped_writes += 1
+            logger.debug(f"Persistent cache write dropped: {str(e)}")
+            return False
+
+    def sweep(self) -> int:
+        """Delete expired entries, then evict least recently read ones beyond the size cap"""
+        try:
+            conn = self._conn()
+            removed = conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),)).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                removed += conn.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM ("
+                    "SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC) AS kept FROM entries"
+                    ") WHERE kept > ?)",
+                    (int(self.max_bytes * 0.9),)
+                ).rowcount
+            if removed:
+                logger.debug(f"Persistent cache sweep removed {removed} entries")
+            return removed
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent cache sweep failed: {str(e)}")
+            return 0
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        if namespace is None:
+            self._execute("DELETE FROM entries", ())
+        else:
+            self._execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            count, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        except sqlite3.Error:
+            count, size = None, None
+        return {
+            "path": self.path,
+            "entries": count,
+            "bytes": size,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "droppedWrites": self.dropped_writes
+        }
+
+class TieredCache:
+    """LRUCache in front of a shared PersistentCache, with the same get/set interface.
+
+    Keys are scoped by namespace and model version on disk, so a new model never
+    reads results computed by an old one. Values must be JSON-serializable; a value
+    read back from disk has lists where the original had tuples.
+    """
+
+    def __init__(self, namespace: str, version: Optional[str], persistent: Optional[PersistentCache],
+                 maxsize: int = 256):
+        self.namespace = namespace
+        self.version = version
+        self.memory = LRUCache(maxsize)
+        self.persistent = persistent
+        self.disk_hits = 0
+        self._memory_hits = CACHE_REQUESTS.labels(namespace, "memory_hit")
+        self._disk_hits = CACHE_REQUESTS.labels(namespace, "disk_hit")
+        self._misses = CACHE_REQUESTS.labels(namespace, "miss")
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._memory_hits.inc()
+            return value
+        if self.persistent is not None:
+            value = self.persistent.get(PersistentCache.make_key(self.namespace, self.version, key))
+        if value is not None:
+            self.disk_hits += 1
+            self._disk_hits.inc()
+            self.memory.set(key, value)
+        else:
+            self._misses.inc()
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.persistent is not None:
+            self.persistent.set(PersistentCache.make_key(self.namespace, self.version, key), value)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.persistent is not None:
+            self.persistent.clear(self.namespace)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.memory.stats(), "version": self.version, "diskHits": self.disk_hits}
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Cache Warmer Module
+Log of recent assessments and a background pass that precomputes their results
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AssessmentLog:
+    """Append-only JSONL log of recently assessed answer vectors.
+
+    One line per request ({"ts", "endpoint", "user_data"}). When the file grows past
+    max_bytes it is rotated to a single ".1" backup, so the log holds roughly the
+    last max_bytes to 2 * max_bytes of traffic.
+    """
+
+    def __init__(self, path: str, num_features: int = 16, max_bytes: int = 8 * 1024 * 1024):
+        self.path = path
+        self.num_features = num_features
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def append(self, endpoint: str, user_data: List[int]) -> None:
+        """Record one complete assessment; failures are logged and never reach the request"""
+        line = json.dumps({"ts": time.time(), "endpoint": endpoint, "user_data": list(user_data)}) + "\n"
+        try:
+            with self._lock:
+                with open(self.path, "a", encoding="utf-8") as handle:
+                    handle.write(line)
+                    size = handle.tell()
+                if size > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+        except OSError as e:
+            logger.warning(f"Could not append to assessment log {self.path}: {str(e)}")
+
+    def recent(self, limit: int) -> List[List[int]]:
+        """Up to limit distinct valid answer vectors, most recent first"""
+        seen = set()
+        recent = []
+        for path in (self.path, self.path + ".1"):
+            for user_data in reversed(list(self._read(path))):
+                key = tuple(user_data)
+                if key in seen:
+                    continue
+                seen.add(key)
+                recent.append(user_data)
+                if len(recent) >= limit:
+                    return recent
+        return recent
+
+    def _read(self, path: str) -> Iterable[List[int]]:
+        if not os.path.exists(path):
+            return
+        with self._lock, open(path, encoding="utf-8") as handle:
+            lines = handle.readlines()
+        for line in lines:
+            try:
+                user_data = json.loads(line)["user_data"]
+            except (ValueError, KeyError, TypeError):
+                continue  # a torn last line or foreign content
+            if (isinstance(user_data, list) and len(user_data) == self.num_features
+                    and all(isinstance(value, int) for value in user_data)):
+                yield user_data
+
+class CacheWarmer:
+    """Replays recent and reference assessments through a warm function within a time budget.
+
+    Candidates are the most recent distinct entries of the assessment log followed by
+    the reference rows, deduplicated. run() hands them one at a time to run_item (which
+    should admit the work at low priority) and stops when the budget is spent, so a
+    warm-up never delays live traffic for long and never runs unbounded.
+    """
+
+    def __init__(self, log: Optional[AssessmentLog], reference_rows: List[List[int]],
+                 budget_seconds: float = 120.0, max_recent: int = 500):
+        self.log = log
+        self.reference_rows = reference_rows
+        self.budget_seconds = budget_seconds
+        self.max_recent = max_recent
+        self.state = "idle"
+        self.candidates = 0
+        self.warmed = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+    def load_candidates(self) -> List[List[int]]:
+        recent = self.log.recent(self.max_recent) if self.log is not None else []
+        seen = set()
+        candidates = []
+        for user_data in recent + self.reference_rows:
+            key = tuple(user_data)
+            if key not in seen:
+                seen.add(key)
+                candidates.append(list(user_data))
+        return candidates
+
+    async def run(self, run_item: Callable[[List[int]], Awaitable[Any]]) -> Dict[str, Any]:
+        """Warm candidates in order until done or out of budget"""
+        started = time.monotonic()
+        self.state = "running"
+        try:
+            candidates = await asyncio.get_running_loop().run_in_executor(None, self.load_candidates)
+            self.candidates = len(candidates)
+            logger.info(f"Cache warm-up started: {len(candidates)} assessments, {self.budget_seconds:g}s budget")
+            for user_data in candidates:
+                if time.monotonic() - started >= self.budget_seconds:
+                    self.state = "budget_exhausted"
+                    break
+                try:
+                    await run_item(user_data)
+                    self.warmed += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.failed += 1
+                    logger.debug(f"Cache warm-up skipped an assessment: {str(e)}")
+            else:
+                self.state = "completed"
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            raise
+        finally:
+            self.elapsed = time.monotonic() - started
+            logger.info(f"Cache warm-up {self.state}: {self.warmed}/{self.candidates} assessments "
+                        f"in {self.elapsed:.1f}s ({self.failed} failed)")
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "candidates": self.candidates,
+            "warmed": self.warmed,
+            "failed": self.failed,
+            "elapsedSeconds": round(self.elapsed, 3),
+            "budgetSeconds": self.budget_seconds
+        }
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Cancellation Module
+Cooperative cancellation tokens for analysis work running in worker threads
+"""
+
+import contextvars
+import threading
+from typing import Any, Callable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AnalysisCancelled(BaseException):
+    """Raised at a checkpoint once the work's token is cancelled.
+
+    Derives from BaseException, like asyncio.CancelledError, so the analyzer's
+    broad `except Exception` fallbacks (e.g. SHAP failure -> fallback ranking)
+    do not swallow it and carry on computing.
+    """
+    pass
+
+class CancellationToken:
+    """Thread-safe flag shared between the event loop and one piece of worker-thread work"""
+
+    __slots__ = ('_event', 'reason')
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call func with this token as the current one, so checkpoints inside it can see it"""
+        reset = _current_token.set(self)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_token.reset(reset)
+
+_current_token: "contextvars.ContextVar[Optional[CancellationToken]]" = contextvars.ContextVar(
+    "analysis_cancellation_token", default=None
+)
+
+def check_cancelled() -> None:
+    """Checkpoint: raise AnalysisCancelled if the current work has been cancelled"""
+    token = _current_token.get()
+    if token is not None and token.cancelled:
+        raise AnalysisCancelled(token.reason)
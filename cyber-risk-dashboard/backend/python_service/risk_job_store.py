@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Job Store Module
+Durable SQLite job queue and worker pool for long-running mitigation analyses
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import logging
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+TERMINAL_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    dedup_key TEXT NOT NULL,
+    params TEXT NOT NULL,
+    model_version TEXT,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    error_status INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    lease_until REAL,
+    available_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, available_at, created_at);
+"""
+
+def job_dedup_key(kind: str, model_version: Optional[str], params: Dict[str, Any]) -> str:
+    """Content key of a submission: identical kind, model and parameters share one job"""
+    canonical = json.dumps([kind, model_version, params], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class JobStore:
+    """Jobs and their results in one SQLite table, safe to share between threads and processes.
+
+    A submission whose dedup key matches a queued, running or succeeded job returns
+    that job instead of creating a new one; failed jobs can be resubmitted. Workers
+    claim queued jobs atomically under a lease they renew while running. A job whose
+    lease expires (its worker died or was restarted) goes back to the queue, up to
+    max_attempts times, so accepted work is never silently lost.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 30.0, max_attempts: int = 3,
+                 retention_seconds: float = 7 * 24 * 3600):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        logger.info(f"Job store opened at {path}")
+
+    def _transaction(self, statements: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run statements inside one IMMEDIATE transaction, so claims never race across processes"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def submit(self, kind: str, params: Dict[str, Any], model_version: Optional[str]) -> Tuple[Dict[str, Any], bool]:
+        """Queue a job, or return the live/succeeded job with the same content; (job, deduplicated)"""
+        dedup_key = job_dedup_key(kind, model_version, params)
+
+        def statements(conn):
+            existing = conn.execute(
+                "SELECT * FROM jobs WHERE dedup_key = ? AND status IN (?, ?, ?) ORDER BY created_at DESC LIMIT 1",
+                (dedup_key, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED)
+            ).fetchone()
+            if existing is not None:
+                return self._row(existing), True
+            now = time.time()
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, kind, dedup_key, params, model_version, status, available_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, dedup_key, json.dumps(params), model_version, JOB_QUEUED, now, now)
+            )
+            return self._row(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()), False
+
+        return self._transaction(statements)
+
+    def get(self, job_id: str, with_result: bool = False) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row, with_result) if row is not None else None
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Take the oldest runnable job and lease it to the worker; None when the queue is empty"""
+
+        def statements(conn):
+            now = time.time()
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? AND available_at <= ? ORDER BY created_at LIMIT 1",
+                (JOB_QUEUED, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = ?, lease_until = ?, attempts = attempts + 1, "
+                "started_at = ? WHERE id = ?",
+                (JOB_RUNNING, worker_id, now + self.lease_seconds, now, row["id"])
+            )
+            job = self._row(row)
+            job["params"] = json.loads(row["params"])
+            job["status"] = JOB_RUNNING
+            job["attempts"] += 1
+            return job
+
+        return self._transaction(statements)
+
+    def renew(self, job_id: str, worker_id: str) -> bool:
+        """Extend a running job's lease; False if the worker no longer owns it"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker_id = ? AND status = ?",
+                (time.time() + self.lease_seconds, job_id, worker_id, JOB_RUNNING)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, result: Any) -> bool:
+        return self._finish(job_id, worker_id, JOB_SUCCEEDED, result=json.dumps(result))
+
+    def fail(self, job_id: str, worker_id: str, error: str, error_status: int = 500) -> bool:
+        return self._finish(job_id, worker_id, JOB_FAILED, error=error, error_status=error_status)
+
+    def _finish(self, job_id: str, worker_id: str, status: str, result: Optional[str] = None,
+                error: Optional[str] = None, error_status: Optional[int] = None) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, error_status = ?, finished_at = ?, "
+                "worker_id = NULL, lease_until = NULL WHERE id = ? AND worker_id = ? AND status = ?",
+                (status, result, error, error_status, time.time(), job_id, worker_id, JOB_RUNNING)
+            )
+        return cursor.rowcount == 1
+
+    def defer(self, job_id: str, worker_id: str, delay: float) -> bool:
+        """Put a claimed job back in the queue without counting the attempt (e.g. shed by the scheduler)"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = NULL, lease_until = NULL, started_at = NULL, "
+                "attempts = attempts - 1, available_at = ? WHERE id = ? AND worker_id = ? AND status = ?",
+                (JOB_QUEUED, time.time() + delay, job_id, worker_id, JOB_RUNNING)
+            )
+        return cursor.rowcount == 1
+
+    def recover_expired(self) -> List[str]:
+        """Requeue running jobs whose lease lapsed; fail them once max_attempts is used up"""
+
+        def statements(conn):
+            now = time.time()
+            rows = conn.execute(
+                "SELECT id, attempts FROM jobs WHERE status = ? AND lease_until < ?", (JOB_RUNNING, now)
+            ).fetchall()
+            for row in rows:
+                if row["attempts"] >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, error_status = 500, finished_at = ?, "
+                        "worker_id = NULL, lease_until = NULL WHERE id = ?",
+                        (JOB_FAILED, f"Job abandoned by its worker {row['attempts']} times", now, row["id"])
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, worker_id = NULL, lease_until = NULL, started_at = NULL, "
+                        "available_at = ? WHERE id = ?",
+                        (JOB_QUEUED, now, row["id"])
+                    )
+            return [row["id"] for row in rows]
+
+        recovered = self._transaction(statements)
+        if recovered:
+            logger.warning(f"Recovered {len(recovered)} jobs with expired leases")
+        return recovered
+
+    def purge_finished(self) -> int:
+        """Delete finished jobs older than the retention period"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (JOB_SUCCEEDED, JOB_FAILED, time.time() - self.retention_seconds)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_SUCCEEDED: 0, JOB_FAILED: 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row(row: sqlite3.Row, with_result: bool = False) -> Dict[str, Any]:
+        job = {
+            "jobId": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "modelVersion": row["model_version"],
+            "createdAt": row["created_at"],
+            "startedAt": row["started_at"],
+            "finishedAt": row["finished_at"],
+            "error": row["error"],
+            "errorStatus": row["error_status"]
+        }
+        if with_result:
+            job["result"] = json.loads(row["result"]) if row["result"] is not None else None
+        return job
+
+class JobDeferred(Exception):
+    """Raised by a handler to put its job back in the queue for a while without failing it"""
+
+    def __init__(self, delay: float):
+        super().__init__(f"Job deferred for {delay:g}s")
+        self.delay = delay
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+class JobWorkerPool:
+    """Asyncio workers that claim jobs from a JobStore and run them through per-kind handlers.
+
+    Workers sleep until notify() signals a submission, polling every poll_interval
+    as well so jobs queued by other processes or released from expired leases are
+    still picked up. A handler's exception fails the job with the exception's
+    status_code (500 if it has none); on_update is called after every state change
+    so callers can push completion notices.
+    """
+
+    def __init__(self, store: JobStore, handlers: Dict[str, JobHandler], workers: int = 2,
+                 poll_interval: float = 1.0, on_update: Optional[Callable[[str], None]] = None):
+        self.store = store
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.on_update = on_update
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self.completed = 0
+        self.failed = 0
+        self.deferred = 0
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work(f"{self.worker_prefix}:{i}")) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+        logger.info(f"Started {self.workers} job workers ({self.worker_prefix})")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers after a submission"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _work(self, worker_id: str) -> None:
+        while True:
+            try:
+                job = await run_in_threadpool(self.store.claim, worker_id)
+            except Exception as e:
+                logger.error(f"Job claim error: {str(e)}", exc_info=True)
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(worker_id, job)
+
+    async def _run(self, worker_id: str, job: Dict[str, Any]) -> None:
+        job_id = job["jobId"]
+        logger.info(f"Job {job_id} ({job['kind']}) started by {worker_id}, attempt {job['attempts']}")
+        self._updated(job_id)
+        keepalive = asyncio.create_task(self._renew_lease(job_id, worker_id))
+        try:
+            handler = self.handlers.get(job["kind"])
+            if handler is None:
+                raise ValueError(f"No handler for job kind '{job['kind']}'")
+            result = await handler(job["params"])
+            await run_in_threadpool(self.store.complete, job_id, worker_id, result)
+            self.completed += 1
+            logger.info(f"Job {job_id} succeeded")
+        except asyncio.CancelledError:
+            # Shutting down: leave the lease to expire so another worker picks the job up
+            raise
+        except JobDeferred as e:
+            await run_in_threadpool(self.store.defer, job_id, worker_id, e.delay)
+            self.deferred += 1
+            logger.info(f"Job {job_id} deferred for {e.delay:g}s")
+        except Exception as e:
+            status = getattr(e, "status_code", 500)
+            detail = getattr(e, "detail", None) or str(e)
+            await run_in_threadpool(self.store.fail, job_id, worker_id, str(detail), status)
+            self.failed += 1
+            logger.warning(f"Job {job_id} failed with {status}: {detail}")
+        finally:
+            keepalive.cancel()
+        self._updated(job_id)
+
+    async def _renew_lease(self, job_id: str, worker_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.store.lease_seconds / 3)
+            try:
+                await run_in_threadpool(self.store.renew, job_id, worker_id)
+            except Exception as e:
+                logger.error(f"Job lease renewal error: {str(e)}")
+
+    async def _maintain(self) -> None:
+        """Requeue jobs orphaned by dead workers and purge old results"""
+        while True:
+            try:
+                if await run_in_threadpool(self.store.recover_expired):
+                    self.notify()
+                await run_in_threadpool(self.store.purge_finished)
+            except Exception as e:
+                logger.error(f"Job store maintenance error: {str(e)}")
+            await asyncio.sleep(self.store.lease_seconds)
+
+    def _updated(self, job_id: str) -> None:
+        if self.on_update is not None:
+            try:
+                self.on_update(job_id)
+            except Exception as e:
+                logger.error(f"Job update callback error: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "workerPrefix": self.worker_prefix,
+            "completed": self.completed,
+            "failed": self.failed,
+            "deferred": self.deferred,
+            "jobs": self.store.stats()
+        }
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Logging Module
+Structured JSON logs written from a background thread, with per-request sampling of debug output
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Sequence
+
+from risk_metrics import LOG_RECORDS_DROPPED
+from risk_tracing import TRACE_HEADER, current_trace_id
+
+# Per-request decision whether this request's DEBUG records are kept; None outside requests
+_debug_sampled: ContextVar[Optional[bool]] = ContextVar("risk_debug_sampled", default=None)
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "trace_id"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, trace ID, extra fields and traceback"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id is not None:
+            entry["traceId"] = trace_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with the request's trace ID and drops DEBUG records of unsampled requests.
+
+    Runs in the thread that logs, before a record is queued, so dropped records cost
+    one contextvar lookup and are never formatted.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.INFO and _debug_sampled.get() is False:
+            return False
+        record.trace_id = current_trace_id()
+        return True
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that renders the message in the caller (so later mutation of the
+    arguments cannot change it) and drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue: "queue.Queue"):
+        super().__init__(log_queue)
+        self._traceback_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+class LogSamplingMiddleware:
+    """ASGI middleware: decides once per request whether its DEBUG records are kept.
+
+    A sample_rate fraction of requests is logged verbosely, and so is every request
+    that opted into tracing, so a traced request's span tree comes with its logs.
+    """
+
+    def __init__(self, app, sample_rate: float):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        sampled = random.random() < self.sample_rate or any(
+            key == TRACE_HEADER and value.lower() in (b"1", b"true") for key, value in scope["headers"]
+        )
+        token = _debug_sampled.set(sampled)
+        try:
+            return await self.app(scope, receive, send)
+        finally:
+            _debug_sampled.reset(token)
+
+def configure_logging(level: str = "INFO", json_format: bool = True, queue_size: int = 10000,
+                      adopt: Sequence[str] = ("uvicorn", "uvicorn.error", "uvicorn.access")
+                      ) -> logging.handlers.QueueListener:
+    """Route the root logger through a bounded queue drained by a listener thread that
+    writes to stderr. Loggers in `adopt` (uvicorn's, which bring their own synchronous
+    handlers) are sent through it as well. Returns the started listener."""
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if json_format else
+                        logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(trace_id)s] %(message)s"))
+    handler = DroppingQueueHandler(queue.Queue(queue_size))
+    handler.addFilter(RequestContextFilter())
+    listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=False)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for name in adopt:
+        adopted = logging.getLogger(name)
+        adopted.handlers = []
+        adopted.propagate = True
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
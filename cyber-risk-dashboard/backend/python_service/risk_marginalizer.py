@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Marginalizer Module
+Expected risk for partially answered or uncertain questionnaires
+"""
+
+import itertools
+import numpy as np
+from typing import List, Dict, Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AnswerMarginalizer:
+    """Marginalizes the risk model over unknown or uncertain answers.
+
+    Unknown answers get a prior from new_data.csv in which every reference row is
+    weighted by how closely it agrees with the known answers (similarity_decay per
+    disagreement), plus Laplace smoothing so unseen options keep some mass. Answers
+    given as option distributions use those probabilities directly. Unknowns are
+    treated as independent: when the joint space is small it is enumerated exactly,
+    otherwise it is Monte-Carlo sampled; either way all expansions are scored in one
+    batched pass and the probability-weighted mean and spread are returned.
+    """
+
+    def __init__(self, analyzer, max_enumeration: int = 4096, samples: int = 2048,
+                 similarity_decay: float = 0.5, smoothing: float = 0.5, seed: int = 0):
+        self.analyzer = analyzer
+        self.max_enumeration = max_enumeration
+        self.samples = samples
+        self.similarity_decay = similarity_decay
+        self.smoothing = smoothing
+        self.seed = seed
+
+        self.features = list(analyzer.feature_cols)
+        self.reference = analyzer.df[self.features].astype(int).values  # [rows, F]
+        # Answer value of each option column, in block order
+        self.option_values = [
+            [int(analyzer.encoded_columns[pos].rsplit('_', 1)[1]) for pos in analyzer.feature_blocks[feature]]
+            for feature in self.features
+        ]
+
+    def marginalize(self, user_data: List[Optional[int]],
+                    distributions: Optional[Dict[str, List[float]]] = None) -> Dict[str, Any]:
+        """Expected probabilities and spread over every unknown or uncertain answer"""
+        if len(user_data) != len(self.features):
+            raise ValueError(f"Input data must have exactly {len(self.features)} answers")
+        distributions = distributions or {}
+        unknown_features = [f for f in distributions if f not in self.features]
+        if unknown_features:
+            raise ValueError(f"Unknown features in answer distributions: {unknown_features}")
+
+        # Known answers fix their option; everything else gets a distribution over options
+        fixed, uncertain = {}, {}
+        for f, (feature, value) in enumerate(zip(self.features, user_data)):
+            if feature in distributions:
+                uncertain[f] = self._explicit_distribution(f, distributions[feature])
+            elif value is None:
+                uncertain[f] = None
+            else:
+                if value not in self.option_values[f]:
+                    raise ValueError(f"Answer {value} is not a valid option for feature {feature}")
+                fixed[f] = self.option_values[f].index(value)
+
+        priors = self._conditional_priors(fixed, [f for f, dist in uncertain.items() if dist is None])
+        for f, prior in priors.items():
+            uncertain[f] = prior
+
+        base = np.zeros(len(self.analyzer.encoded_columns), dtype=np.float32)
+        for f, option in fixed.items():
+            base[self.analyzer.feature_blocks[self.features[f]][option]] = 1.0
+
+        unknown = sorted(uncertain)
+        combos, weights, method = self._expand([uncertain[f] for f in unknown])
+        rows = np.repeat(base[None, :], len(combos), axis=0)
+        for j, f in enumerate(unknown):
+            block = np.array(self.analyzer.feature_blocks[self.features[f]])
+            rows[np.arange(len(combos)), block[combos[:, j]]] = 1.0
+        self.analyzer.mask_forced_columns(rows)
+
+        probs = self.analyzer.score_encoded_batched(rows)
+        risks = self.analyzer.combined_risk(probs)
+        mean = weights @ probs
+        std = np.sqrt(np.maximum(weights @ (probs - mean) ** 2, 0.0))
+        risk_mean = float(weights @ risks)
+        risk_std = float(np.sqrt(max(weights @ (risks - risk_mean) ** 2, 0.0)))
+
+        return {
+            'probabilities': mean.tolist(),
+            'std': std.tolist(),
+            'combinedRisk': risk_mean,
+            'combinedRiskStd': risk_std,
+            'method': method,
+            'expansions': len(combos),
+            'uncertainFeatures': {
+                self.features[f]: {
+                    str(value): float(p) for value, p in zip(self.option_values[f], uncertain[f])
+                }
+                for f in unknown
+            }
+        }
+
+    def _explicit_distribution(self, f: int, probabilities: List[float]) -> np.ndarray:
+        """Validate and normalize a caller-supplied option distribution (indexed by answer value)"""
+        values = self.option_values[f]
+        if len(probabilities) != max(values) + 1:
+            raise ValueError(f"Feature {self.features[f]} expects {max(values) + 1} option probabilities, got {len(probabilities)}")
+        dist = np.array([probabilities[value] for value in values], dtype=np.float64)
+        if (dist < 0).any() or dist.sum() <= 0:
+            raise ValueError(f"Option probabilities for feature {self.features[f]} must be non-negative and not all zero")
+        return dist / dist.sum()
+
+    def _conditional_priors(self, fixed: Dict[int, int], unknown: List[int]) -> Dict[int, np.ndarray]:
+        """Similarity-weighted option frequencies for each unknown answer"""
+        if not unknown:
+            return {}
+        mismatches = np.zeros(len(self.reference))
+        for f, option in fixed.items():
+            mismatches += self.reference[:, f] != self.option_values[f][option]
+        row_weights = self.similarity_decay ** mismatches
+
+        priors = {}
+        for f in unknown:
+            values = self.option_values[f]
+            counts = np.array([row_weights[self.reference[:, f] == value].sum() for value in values])
+            counts = counts + self.smoothing
+            priors[f] = counts / counts.sum()
+        return priors
+
+    def _expand(self, distributions: List[np.ndarray]):
+        """Enumerate or sample joint option choices; returns (choices [N, U], weights [N], method)"""
+        if not distributions:
+            return np.zeros((1, 0), dtype=np.int64), np.ones(1), 'exact'
+
+        sizes = [len(dist) for dist in distributions]
+        if int(np.prod(sizes)) <= self.max_enumeration:
+            combos = np.array(list(itertools.product(*[range(size) for size in sizes])), dtype=np.int64)
+            weights = np.ones(len(combos))
+            for j, dist in enumerate(distributions):
+                weights *= dist[combos[:, j]]
+            return combos, weights / weights.sum(), 'exact'
+
+        rng = np.random.default_rng(self.seed)
+        uniform = rng.random((self.samples, len(distributions)))
+        combos = np.stack([
+            np.minimum(np.searchsorted(np.cumsum(dist), uniform[:, j]), len(dist) - 1)
+            for j, dist in enumerate(distributions)
+        ], axis=1)
+        return combos, np.full(self.samples, 1.0 / self.samples), 'monte_carlo'
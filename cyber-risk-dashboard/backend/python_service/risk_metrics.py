@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Metrics Module
+Low-overhead counters and histograms exposed in the Prometheus text format
+"""
+
+import math
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+class _Sharded:
+    """Per-thread value arrays, summed at scrape time.
+
+    Each thread only ever writes its own array, so recording needs no lock and
+    loses no updates; the lock is taken once per thread, when its array is created.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def _new_shard(self) -> List[float]:
+        shard = [0] * self._size
+        with self._lock:
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            shards = list(self._shards)
+        return [sum(values) for values in zip(*shards)] if shards else [0] * self._size
+
+class CounterChild(_Sharded):
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1) -> None:
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[0] += amount
+
+class HistogramChild(_Sharded):
+    def __init__(self, buckets: Tuple[float, ...]):
+        # One slot per bucket, one for +Inf, then the running sum
+        super().__init__(len(buckets) + 2)
+        self.buckets = buckets
+
+    def observe(self, value: float) -> None:
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+class Metric:
+    """A named metric family; labels(...) returns the child for one label combination.
+
+    Hot paths should look their children up once and keep them, since recording on
+    a child is the only part that is cheap. An unlabelled metric records directly.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], _Sharded] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self) -> _Sharded:
+        raise NotImplementedError
+
+    def _label_text(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: Tuple[str, ...], child: _Sharded) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self.inc = self.labels().inc
+
+    def _new_child(self) -> CounterChild:
+        return CounterChild()
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{self._label_text(values)} {_format(child.totals()[0])}"]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self.observe = self.labels().observe
+
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self.buckets)
+
+    def _render_child(self, values, child) -> List[str]:
+        totals = child.totals()
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (math.inf,), totals[:-1]):
+            cumulative += count
+            le = 'le="{}"'.format("+Inf" if bound == math.inf else _format(bound))
+            lines.append(f"{self.name}_bucket{self._label_text(values, le)} {_format(cumulative)}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {_format(totals[-1])}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {_format(cumulative)}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+REGISTRY = MetricsRegistry()
+
+ENCODE_SECONDS = REGISTRY.register(Histogram(
+    "risk_encode_seconds", "One-hot encoding of an answer vector", ["path"]))
+FORWARD_SECONDS = REGISTRY.register(Histogram(
+    "risk_forward_seconds", "Model forward passes (one call, any number of rows)", ["path"]))
+FORWARD_ROWS = REGISTRY.register(Histogram(
+    "risk_forward_rows", "Rows per batched forward pass", buckets=(1, 4, 16, 64, 256, 1024, 4096, 16384)))
+SHAP_SECONDS = REGISTRY.register(Histogram(
+    "risk_shap_seconds", "SHAP explainer runs"))
+MITIGATION_ROUND_SECONDS = REGISTRY.register(Histogram(
+    "risk_mitigation_round_seconds", "One mitigation round: option search and projection", ["mode"]))
+SERIALIZATION_SECONDS = REGISTRY.register(Histogram(
+    "risk_serialization_seconds", "Rendering response bodies and stream events to JSON", ["format"]))
+QUEUE_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "risk_queue_wait_seconds", "Time admitted requests waited for a scheduler slot", ["lane"]))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "risk_cache_requests_total", "Result cache lookups by outcome", ["cache", "result"]))
+PREDICT_BATCH_SIZE = REGISTRY.register(Histogram(
+    "risk_predict_batch_size", "Predictions coalesced into one forward pass", buckets=SIZE_BUCKETS))
+FALLBACKS = REGISTRY.register(Counter(
+    "risk_fallbacks_total", "Degraded paths taken: fixed feature lists, sensitivity ranking, truncated rounds",
+    ["kind"]))
+LOG_RECORDS_DROPPED = REGISTRY.register(Counter(
+    "risk_log_records_dropped_total", "Log records dropped because the log queue was full"))
@@ -8,11 +8,34 @@ import pandas as pd
 import torch
 import numpy as np
 import shap
-from typing import List, Dict, Tuple, Any
+import threading
+import time
+from typing import List, Dict, Tuple, Any, Iterator, Optional, Union
 import logging
+from risk_cancellation import check_cancelled
+from risk_cache import LRUCache
+from risk_metrics import (ENCODE_SECONDS, FALLBACKS, FORWARD_ROWS, FORWARD_SECONDS, MITIGATION_ROUND_SECONDS,
+                          SHAP_SECONDS)
+from risk_tracing import record_span, span
 
 logger = logging.getLogger(__name__)
 
+# Metric children resolved once, so recording is the only per-event cost
+ENCODE_FAST = ENCODE_SECONDS.labels('fast')
+ENCODE_PANDAS = ENCODE_SECONDS.labels('pandas')
+FORWARD_ENCODED = FORWARD_SECONDS.labels('encoded')
+FORWARD_DATAFRAME = FORWARD_SECONDS.labels('dataframe')
+ROUND_SEQUENTIAL = MITIGATION_ROUND_SECONDS.labels('sequential')
+ROUND_POOLED = MITIGATION_ROUND_SECONDS.labels('pooled')
+FALLBACK_FEATURE_LISTS = FALLBACKS.labels('fallback_feature_lists')
+FALLBACK_SENSITIVITY_RANKING = FALLBACKS.labels('sensitivity_ranking')
+FALLBACK_PARTIAL_ROUNDS = FALLBACKS.labels('partial_rounds')
+
+RISK_TYPES = ["ransomware", "phishing", "dataBreach", "insiderAttack", "supplyChain"]
+
+# Input columns the reference preprocessing (script.py) always feeds to the model as 0
+FORCED_ZERO_COLUMNS = ["1.5_4"]
+
 def set_seed(seed=0):
     """Set random seed for reproducibility"""
     import random
@@ -30,13 +53,15 @@ class ProbModel(torch.nn.Module):
         self.base_model = base_model
     
     def forward(self, x):
+        # Every SHAP batch and relaxation step passes through here
+        check_cancelled()
         logits = self.base_model(x)
         return torch.sigmoid(logits)
 
 class RiskMitigationAnalyzer:
     """Analyzes risk mitigation strategies using SHAP values and optimization"""
     
-    def __init__(self, model, df, group_info, X_train=None, threshold=0.375):
+    def __init__(self, model, df, group_info, X_train=None, threshold=0.375, ranking_cache=None):
         self.model = model
         self.df = df
         self.group_info = group_info
@@ -50,10 +75,122 @@ class RiskMitigationAnalyzer:
             self.explainer = shap.GradientExplainer(self.prob_model, background)
         else:
             self.explainer = None
+        # The explainer draws from the global RNGs, so concurrent threads take turns
+        self._shap_lock = threading.Lock()
+        
+        # SHAP round lists per encoded input (any cache with get/set, e.g. a shared TieredCache),
+        # and running stage timings used to plan within a deadline
+        self._ranking_cache = ranking_cache if ranking_cache is not None else LRUCache(maxsize=1024)
+        self.stage_seconds = {'ranking': 0.12, 'option': 0.0015, 'pooled_round': 0.01}
+        
+        # One-hot column layout, computed once so encoding skips pd.get_dummies
+        self._build_encoding_layout()
+    
+    def _build_encoding_layout(self):
+        """Cache the one-hot column layout and option lookups used by the fast encoder"""
+        self.feature_cols = list(self.df.columns[:-5])
+        reference_row = self.df.iloc[0, :-5].astype(int).tolist()
+        self.encoded_columns = list(self.preprocess_user_data(reference_row).columns)
+        self.column_positions = {col: pos for pos, col in enumerate(self.encoded_columns)}
+        self.forced_zero_positions = [self.column_positions[col] for col in FORCED_ZERO_COLUMNS]
+        
+        # feature code -> positions of its option columns, in column order
+        self.feature_blocks = {
+            feature: [pos for pos, col in enumerate(self.encoded_columns) if col[:-2] == feature]
+            for feature in self.feature_cols
+        }
+        
+        # (feature code, option label) -> column position; first match wins like the label scan did
+        self.option_positions = {}
+        for col, pos in self.column_positions.items():
+            feature_group = col.rsplit('_', 1)[0]
+            self.option_positions.setdefault((feature_group, self._get_option_label(col)), pos)
+    
+    def encode_user_data(self, user_data: List[int]) -> np.ndarray:
+        """One-hot encode user input into a float32 vector matching preprocess_user_data"""
+        if len(user_data) != len(self.feature_cols):
+            raise ValueError(f"Input data must have exactly {len(self.feature_cols)} numbers")
+        
+        started = time.perf_counter()
+        encoded = np.zeros(len(self.encoded_columns), dtype=np.float32)
+        for feature, value in zip(self.feature_cols, user_data):
+            pos = self.column_positions.get(f"{feature}_{value}")
+            if pos is None:
+                # Unseen option: defer to the pandas path so the layout matches it exactly
+                return self.preprocess_user_data(user_data).values.astype(np.float32)[0]
+            encoded[pos] = 1.0
+        self.mask_forced_columns(encoded)
+        ended = time.perf_counter()
+        ENCODE_FAST.observe(ended - started)
+        record_span('encode', started, ended)
+        return encoded
+    
+    def mask_forced_columns(self, encoded: np.ndarray) -> np.ndarray:
+        """Zero the FORCED_ZERO_COLUMNS of encoded answer rows in place, as preprocess_user_data does"""
+        encoded[..., self.forced_zero_positions] = 0.0
+        return encoded
+    
+    def current_option_position(self, encoded: np.ndarray, feature: str) -> Optional[int]:
+        """Column of the feature's answer in an encoded row.
+        
+        A forced-zero answer leaves its feature's block empty, so an empty block of a
+        feature with a forced-zero option means that option is the answer.
+        """
+        block = self.feature_blocks[feature]
+        current = next((pos for pos in block if encoded[pos] == 1.0), None)
+        if current is None:
+            current = next((pos for pos in block if pos in self.forced_zero_positions), None)
+        return current
+    
+    def score_encoded(self, encoded: np.ndarray) -> np.ndarray:
+        """Run one batched forward pass and return probabilities of shape [batch, 5]"""
+        check_cancelled()
+        x = torch.from_numpy(np.ascontiguousarray(np.atleast_2d(encoded), dtype=np.float32))
+        started = time.perf_counter()
+        with torch.no_grad():
+            pred = torch.sigmoid(self.model(x))
+        ended = time.perf_counter()
+        FORWARD_ENCODED.observe(ended - started)
+        FORWARD_ROWS.observe(x.shape[0])
+        record_span('forward', started, ended, rows=x.shape[0])
+        return pred.numpy()
+    
+    def combined_risk(self, probabilities: np.ndarray) -> np.ndarray:
+        """Vectorized combined risk score: 50% average probability + 50% threshold exceedance"""
+        probabilities = np.atleast_2d(probabilities)
+        return 0.5 * probabilities.mean(axis=1) + 0.5 * ((probabilities > self.threshold).sum(axis=1) / 5)
+    
+    def resolve_objective(self, objective: Union[str, Dict[str, float], None] = None) -> Dict[str, Any]:
+        """Normalize an objective: 'combined', a single risk type, or a {riskType: weight} mix"""
+        if objective is None or objective == 'combined':
+            return {'name': 'combined', 'weights': None}
+        if isinstance(objective, str):
+            if objective not in RISK_TYPES:
+                raise ValueError(f"Unknown objective '{objective}'; expected 'combined' or one of {RISK_TYPES}")
+            return {'name': objective, 'weights': {risk_type: float(risk_type == objective) for risk_type in RISK_TYPES}}
+        
+        unknown = [risk_type for risk_type in objective if risk_type not in RISK_TYPES]
+        if unknown:
+            raise ValueError(f"Unknown risk types in objective weights: {unknown}")
+        if any(weight < 0 for weight in objective.values()):
+            raise ValueError("Objective weights must be non-negative")
+        total = float(sum(objective.values()))
+        if total <= 0:
+            raise ValueError("Objective weights must not all be zero")
+        weights = {risk_type: float(objective.get(risk_type, 0.0)) / total for risk_type in RISK_TYPES}
+        return {'name': 'weighted', 'weights': weights}
+    
+    def objective_risk(self, probabilities: np.ndarray, objective: Dict[str, Any]) -> np.ndarray:
+        """Vectorized risk under a resolved objective (weighted probabilities, or the combined score)"""
+        if objective['weights'] is None:
+            return self.combined_risk(probabilities)
+        weights = np.array([objective['weights'][risk_type] for risk_type in RISK_TYPES])
+        return np.atleast_2d(probabilities) @ weights
     
     def preprocess_user_data(self, user_data: List[int]) -> pd.DataFrame:
         """Convert user input to one-hot encoded DataFrame"""
         try:
+            started = time.perf_counter()
             # Get feature columns (all except last 5 columns)
             feature_cols = self.df.columns[:-5]
             sample_feat = pd.DataFrame([user_data], columns=feature_cols).astype(str)
@@ -64,11 +201,16 @@ class RiskMitigationAnalyzer:
             
             # Create one-hot encoding
             df_hot = pd.get_dummies(combined)
-            df_hot["1.5_4"] = False
+            for col in FORCED_ZERO_COLUMNS:
+                df_hot[col] = False
             df_hot = df_hot.reindex(sorted(df_hot.columns), axis=1)
             
             # Return only the user's row as DataFrame
-            return df_hot.tail(1).reset_index(drop=True)
+            result = df_hot.tail(1).reset_index(drop=True)
+            ended = time.perf_counter()
+            ENCODE_PANDAS.observe(ended - started)
+            record_span('preprocess', started, ended)
+            return result
             
         except Exception as e:
             logger.error(f"Error preprocessing user data: {str(e)}")
@@ -79,8 +221,12 @@ class RiskMitigationAnalyzer:
         try:
             x = torch.tensor(df_sample.values.astype(int), dtype=torch.float)
             
+            started = time.perf_counter()
             with torch.no_grad():
                 pred = torch.sigmoid(self.model(x))
+            ended = time.perf_counter()
+            FORWARD_DATAFRAME.observe(ended - started)
+            record_span('forward', started, ended, rows=1)
             
             # Combined risk score: 50% average probability + 50% threshold exceedance
             risk = 0.5 * pred.mean() + 0.5 * ((pred > self.threshold).sum() / 5)
@@ -98,30 +244,42 @@ class RiskMitigationAnalyzer:
                 logger.warning("SHAP explainer not initialized - skipping SHAP analysis")
                 return pd.DataFrame()
             
-            # Preprocess data
-            logger.debug("Preprocessing data for SHAP...")
-            df_sample = self.preprocess_user_data(user_data)
-            logger.debug(f"Preprocessed sample shape: {df_sample.shape}")
-            test_tensor = torch.tensor(df_sample.values.astype(int), dtype=torch.float)
-            logger.debug(f"Test tensor shape: {test_tensor.shape}")
-            
-            # Get SHAP values
-            logger.debug("Computing SHAP values...")
-            shap_values = self.explainer.shap_values(test_tensor)
-            logger.debug(f"SHAP values computed, shape: {shap_values.shape}")
+            shap_values = self._compute_shap_values(user_data)
             
             # Process SHAP values
             logger.debug("Processing SHAP values...")
             result = self._process_shap_values(shap_values)
-            logger.debug(f"SHAP processing completed, result shape: {result.shape if not result.empty else 'EMPTY'}")
+            logger.debug("SHAP processing completed, result shape: %s", result.shape if not result.empty else 'EMPTY')
             return result
             
         except Exception as e:
             logger.error(f"Error in SHAP analysis: {str(e)}", exc_info=True)
             return pd.DataFrame()
     
-    def _process_shap_values(self, shap_values) -> pd.DataFrame:
-        """Process raw SHAP values into feature importance DataFrame"""
+    def _compute_shap_values(self, user_data: List[int]) -> np.ndarray:
+        """Run the SHAP explainer once; returns values for every output unit [1, columns, 5]"""
+        logger.debug("Preprocessing data for SHAP...")
+        df_sample = self.preprocess_user_data(user_data)
+        logger.debug("Preprocessed sample shape: %s", df_sample.shape)
+        test_tensor = torch.tensor(df_sample.values.astype(int), dtype=torch.float)
+        logger.debug("Test tensor shape: %s", test_tensor.shape)
+        
+        logger.debug("Computing SHAP values...")
+        with self._shap_lock:
+            started = time.perf_counter()
+            shap_values = self.explainer.shap_values(test_tensor)
+            ended = time.perf_counter()
+            SHAP_SECONDS.observe(ended - started)
+            record_span('shap', started, ended)
+        logger.debug("SHAP values computed, shape: %s", shap_values.shape)
+        return shap_values
+    
+    def _process_shap_values(self, shap_values, output_weights: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Process raw SHAP values into feature importance DataFrame.
+        
+        output_weights scales each output unit's contribution (a risk-type objective);
+        None sums all five units like the original script.
+        """
         try:
             n_samples, n_features, n_outputs = shap_values.shape
             
@@ -166,6 +324,8 @@ class RiskMitigationAnalyzer:
                 .sum()
                 .assign(shap_value=lambda d: d["shap_value"].round(4))
             )
+            if output_weights is not None:
+                grouped_by_feature["shap_value"] *= np.asarray(output_weights)[grouped_by_feature["output_unit"].values]
             
             # 2. Feature-level importance across all output_units in each group
             grouped_by_group_and_feature = (
@@ -183,8 +343,32 @@ class RiskMitigationAnalyzer:
             logger.error(f"Error processing SHAP values: {str(e)}")
             return pd.DataFrame()
     
-    def generate_mitigation_strategy(self, user_data: List[int], current_risk_override: float = None) -> Dict[str, Any]:
+    def generate_mitigation_strategy(self, user_data: List[int], current_risk_override: float = None,
+                                     locked_features: Optional[List[str]] = None,
+                                     deadline: Optional[float] = None) -> Dict[str, Any]:
         """Generate complete risk mitigation strategy matching original algorithm"""
+        strategy = None
+        for event_type, payload in self.iter_mitigation_strategy(user_data, current_risk_override=current_risk_override,
+                                                                 locked_features=locked_features, deadline=deadline):
+            if event_type == 'summary':
+                strategy = payload
+        return strategy
+    
+    def iter_mitigation_strategy(self, user_data: List[int], current_risk_override: float = None,
+                                 locked_features: Optional[List[str]] = None,
+                                 deadline: Optional[float] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Generate the mitigation strategy progressively.
+        
+        Yields ('ranking', ...) once the SHAP feature ranking is ready, one ('round', ...)
+        per round as soon as its option search finishes, and a final ('summary', ...)
+        carrying the same dictionary generate_mitigation_strategy returns.
+        Locked features are removed from the rounds before any option is scored.
+        
+        deadline is a time.monotonic() instant. When SHAP is not expected to fit, the
+        rounds come from a cached SHAP ranking or the cheap sensitivity ranking, and
+        rounds that would overrun are skipped; the summary then reports partial,
+        degraded and degradationReasons.
+        """
         try:
             logger.debug("Starting mitigation strategy generation...")
             set_seed(0)  # For reproducibility
@@ -192,172 +376,439 @@ class RiskMitigationAnalyzer:
             # Get initial setup
             logger.debug("Preprocessing user data...")
             df_sample = self.preprocess_user_data(user_data)
-            logger.debug(f"df_sample shape: {df_sample.shape}")
+            logger.debug("df_sample shape: %s", df_sample.shape)
             
             # Use current_risk_override if provided, otherwise calculate it
             if current_risk_override is not None:
                 initial_risk = current_risk_override
-                logger.debug(f"Using provided current_risk_override: {initial_risk}")
+                logger.debug("Using provided current_risk_override: %s", initial_risk)
             else:
                 logger.debug("Calculating initial risk...")
                 initial_risk = self.calculate_risk_score(df_sample)
-                logger.debug(f"Calculated initial_risk: {initial_risk}")
+                logger.debug("Calculated initial_risk: %s", initial_risk)
             
-            # Generate dynamic feature groups based on SHAP analysis (matching original algorithm)
-            logger.debug("Generating dynamic feature lists...")
-            all_feature_lists = self._generate_dynamic_feature_lists(user_data)
-            logger.debug(f"Dynamic feature lists generated: {len(all_feature_lists)} lists")
-            logger.debug(f"Feature lists content: {all_feature_lists}")
+            degradation_reasons = []
+            cache_key = self.encode_user_data(user_data).tobytes()
+            all_feature_lists = self._ranking_cache.get(cache_key)
+            ranking_source = 'shap'
+            if all_feature_lists is not None:
+                logger.debug("Using cached SHAP feature lists: %s", all_feature_lists)
+            elif self._time_left(deadline) < self._full_strategy_seconds(locked_features):
+                # SHAP plus every round would not fit the budget; finishing the rounds matters
+                # more than the ranking, so rank by single-change sensitivity instead
+                all_feature_lists = self._sensitivity_feature_lists(user_data)
+                ranking_source = 'sensitivity'
+                FALLBACK_SENSITIVITY_RANKING.inc()
+                degradation_reasons.append(
+                    f"SHAP ranking skipped: {max(self._time_left(deadline), 0) * 1000:.0f} ms left, "
+                    f"about {self._full_strategy_seconds(locked_features) * 1000:.0f} ms needed; ranked by single-change sensitivity"
+                )
+            else:
+                # Generate dynamic feature groups based on SHAP analysis (matching original algorithm)
+                logger.debug("Generating dynamic feature lists...")
+                started = time.monotonic()
+                with span('ranking', source='shap'):
+                    all_feature_lists = self._generate_dynamic_feature_lists(user_data)
+                self._record_stage('ranking', time.monotonic() - started)
+                logger.debug("Dynamic feature lists generated: %s lists", len(all_feature_lists))
+                logger.debug("Feature lists content: %s", all_feature_lists)
+                if all_feature_lists:
+                    self._ranking_cache.set(cache_key, all_feature_lists)
             
             # If SHAP analysis failed, use fallback groups
             if not all_feature_lists:
                 logger.warning("SHAP analysis failed, using fallback feature groups")
                 all_feature_lists = self._get_fallback_feature_lists()
-                logger.debug(f"Fallback feature lists: {all_feature_lists}")
+                logger.debug("Fallback feature lists: %s", all_feature_lists)
+                ranking_source = 'fallback'
+                degradation_reasons.append("SHAP analysis unavailable; used the fixed fallback feature groups")
             
-            # Initialize tracking variables (matching original algorithm)
-            updated_indexes = []  # list-of-lists of winning indices
-            current_df = df_sample.copy()
-            new_dfs = []  # snapshot after every round
-            risk_tracking = []  # track risk changes
+            if locked_features:
+                locked = set(locked_features)
+                all_feature_lists = [
+                    [feature for feature in feature_list if feature not in locked]
+                    for feature_list in all_feature_lists
+                ]
+                all_feature_lists = [feature_list for feature_list in all_feature_lists if feature_list]
+                logger.debug("Feature lists after removing locked features %s: %s", sorted(locked), all_feature_lists)
             
-            # Calculate initial risk
-            risk_tracking.append(("Initial", initial_risk))
+            yield 'ranking', {
+                'initialRisk': initial_risk,
+                'featureLists': all_feature_lists,
+                'source': ranking_source
+            }
+            
+            # Each round searches the best option per feature, reports it against the
+            # pre-round state and then applies it (matching original algorithm exactly)
+            rounds = []
+            current_df = df_sample.copy()
             
-            # Process each round (matching original algorithm exactly)
+            partial = False
             for round_num, feature_list in enumerate(all_feature_lists, 1):
-                logger.debug(f"Processing round {round_num} with features: {feature_list}")
+                check_cancelled()
+                logger.debug("Processing round %s with features: %s", round_num, feature_list)
                 if not feature_list:  # Skip empty feature lists
-                    logger.warning(f"Skipping round {round_num} - empty feature list")
+                    logger.warning("Skipping round %s - empty feature list", round_num)
                     continue
+                if self._time_left(deadline) < self._round_seconds(feature_list):
+                    partial = True
+                    FALLBACK_PARTIAL_ROUNDS.inc()
+                    degradation_reasons.append(
+                        f"Latency budget reached after {len(rounds)} of {len(all_feature_lists)} rounds"
+                    )
+                    break
                 
-                updated_index = []
-                current_risk = self.calculate_risk_score(current_df)
-                
-                # Score each feature in this round
-                for target_feature in feature_list:
-                    # Find columns for this feature (matching original algorithm)
-                    subcat_cols = [c for c in current_df.columns if c[:-2] == target_feature]
-                    if not subcat_cols:
-                        logger.warning(f"No columns match feature '{target_feature}'")
-                        continue
+                round_started = time.monotonic()
+                # Closed before the yield: a stream advances this generator from different threads
+                with span('round', number=round_num, features=len(feature_list)):
+                    current_risk = self.calculate_risk_score(current_df)
+                    with span('option_search', options=self._round_options(feature_list)):
+                        updated_index = self._search_round_options(current_df, feature_list)
+                    round_recommendations = self._build_round_recommendations(current_df, feature_list, updated_index)
                     
-                    best_idx = 0
-                    best_risk = float('inf')
+                    # Apply the winning columns
+                    for target_feature, idx in zip(feature_list, updated_index):
+                        subcat_cols = [c for c in current_df.columns if c[:-2] == target_feature]
+                        if subcat_cols:
+                            current_df[subcat_cols] = False
+                            current_df.loc[:, subcat_cols[idx]] = True
                     
-                    # Try every level for this feature
-                    for idx, subcat_col in enumerate(subcat_cols):
-                        cand = current_df.copy()
-                        cand[subcat_cols] = False
-                        cand.loc[:, subcat_col] = True
-                        
-                        x = torch.tensor(cand.values.astype(int).squeeze(), dtype=torch.float).unsqueeze(0)
-                        
-                        with torch.no_grad():
-                            pred = torch.sigmoid(self.model(x))
-                        
-                        risk = 0.5 * pred.mean() + 0.5 * ((pred > self.threshold).sum() / 5)
-                        if risk < best_risk:
-                            best_risk = risk
-                            best_idx = idx
+                    projected_risk = self.calculate_risk_score(current_df)
+                    risk_reduction = current_risk - projected_risk
+                    reduction_percentage = (risk_reduction / current_risk) * 100 if current_risk > 0 else 0
                     
-                    updated_index.append(best_idx)
+                    round_data = {
+                        'roundNumber': round_num,
+                        'features': feature_list,
+                        'currentRisk': current_risk,
+                        'projectedRisk': projected_risk,
+                        'riskReduction': risk_reduction,
+                        'reductionPercentage': reduction_percentage,
+                        'recommendations': round_recommendations
+                    }
+                    rounds.append(round_data)
+                ROUND_SEQUENTIAL.observe(time.monotonic() - round_started)
+                self._record_stage('option', (time.monotonic() - round_started) / max(1, self._round_options(feature_list)))
+                yield 'round', round_data
+            
+            final_risk = rounds[-1]['projectedRisk'] if rounds else initial_risk
+            total_reduction = initial_risk - final_risk
+            total_reduction_percentage = (total_reduction / initial_risk) * 100 if initial_risk > 0 else 0
+            
+            yield 'summary', {
+                'initialRisk': initial_risk,
+                'finalRisk': final_risk,
+                'totalReduction': total_reduction,
+                'totalReductionPercentage': total_reduction_percentage,
+                'rounds': rounds,
+                'implementationPriority': 'high' if total_reduction_percentage > 30 else 'medium' if total_reduction_percentage > 15 else 'low',
+                'partial': partial,
+                'degraded': bool(degradation_reasons),
+                'degradationReasons': degradation_reasons
+            }
+            
+        except Exception as e:
+            logger.error(f"Error generating mitigation strategy: {str(e)}", exc_info=True)
+            raise
+    
+    def _search_round_options(self, current_df: pd.DataFrame, feature_list: List[str]) -> List[int]:
+        """Find the lowest-risk option index for each feature of a round"""
+        updated_index = []
+        
+        # Score each feature in this round
+        for target_feature in feature_list:
+            check_cancelled()
+            # Find columns for this feature (matching original algorithm)
+            subcat_cols = [c for c in current_df.columns if c[:-2] == target_feature]
+            if not subcat_cols:
+                logger.warning("No columns match feature '%s'", target_feature)
+                continue
+            
+            best_idx = 0
+            best_risk = float('inf')
+            
+            # Try every level for this feature
+            for idx, subcat_col in enumerate(subcat_cols):
+                cand = current_df.copy()
+                cand[subcat_cols] = False
+                cand.loc[:, subcat_col] = True
                 
-                # Apply the winning columns
-                for target_feature, idx in zip(feature_list, updated_index):
-                    subcat_cols = [c for c in current_df.columns if c[:-2] == target_feature]
-                    if subcat_cols:
-                        current_df[subcat_cols] = False
-                        current_df.loc[:, subcat_cols[idx]] = True
+                x = torch.tensor(cand.values.astype(int).squeeze(), dtype=torch.float).unsqueeze(0)
                 
-                # Calculate risk after this round
-                round_risk = self.calculate_risk_score(current_df)
-                risk_tracking.append((f"Round {len(updated_indexes) + 1}", round_risk))
+                started = time.perf_counter()
+                with torch.no_grad():
+                    pred = torch.sigmoid(self.model(x))
+                FORWARD_DATAFRAME.observe(time.perf_counter() - started)
                 
-                updated_indexes.append(updated_index.copy())
-                new_dfs.append(current_df.copy())
+                risk = 0.5 * pred.mean() + 0.5 * ((pred > self.threshold).sum() / 5)
+                if risk < best_risk:
+                    best_risk = risk
+                    best_idx = idx
             
-            # Generate recommendations for each round
-            rounds = []
-            current_df = df_sample.copy()
+            updated_index.append(best_idx)
+        
+        return updated_index
+    
+    def _build_round_recommendations(self, current_df: pd.DataFrame, feature_list: List[str], updated_index: List[int]) -> List[Dict[str, Any]]:
+        """Describe a round's changes relative to the state before the round"""
+        round_recommendations = []
+        
+        for target_feature, best_idx in zip(feature_list, updated_index):
+            subcat_cols = [c for c in current_df.columns if c[:-2] == target_feature]
+            if not subcat_cols:
+                continue
+            
+            # Find current and recommended options
+            current_col = None
+            for col in subcat_cols:
+                if current_df[col].iloc[0]:
+                    current_col = col
+                    break
             
-            logger.debug(f"Generating recommendations for {len(updated_indexes)} processed rounds")
-            logger.debug(f"all_feature_lists length: {len(all_feature_lists)}")
-            logger.debug(f"updated_indexes length: {len(updated_indexes)}")
+            if current_col is None:
+                current_col = subcat_cols[0]
             
-            for round_num, (feature_list, updated_index) in enumerate(zip(all_feature_lists, updated_indexes), 1):
-                logger.debug(f"Generating recommendations for round {round_num}")
-                if not feature_list:
-                    logger.warning(f"Skipping round {round_num} in recommendation generation - empty feature list")
+            recommended_col = subcat_cols[best_idx]
+            
+            # Create recommendation
+            round_recommendations.append({
+                'featureGroup': target_feature,
+                'featureName': self._get_feature_name(target_feature),
+                'currentOption': self._get_option_label(current_col),
+                'recommendedOption': self._get_option_label(recommended_col),
+                'optionIndex': best_idx,
+                'description': self._get_feature_description(target_feature)
+            })
+        
+        return round_recommendations
+    
+    def generate_objective_strategies(self, user_data: List[int], objectives: List[Union[str, Dict[str, float]]],
+                                      locked_features: Optional[List[str]] = None,
+                                      deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Run the round-based strategy for several objectives in one shared pass.
+        
+        The SHAP explainer runs once and each objective ranks features by its own
+        output weighting. Every round, the candidate rows of all objectives are pooled,
+        deduplicated and scored in a single forward pass; each objective then reads its
+        own risk off the shared probabilities. Plans that agree on earlier rounds share
+        their candidate rows, so six objectives cost little more than one.
+        A deadline degrades the ranking and round count as in iter_mitigation_strategy.
+        """
+        set_seed(0)
+        specs = [self.resolve_objective(objective) for objective in objectives]
+        baseline = self.encode_user_data(user_data)
+        locked = set(locked_features or ())
+        
+        # One explainer call serves every objective's ranking
+        shap_values = None
+        degradation_reasons = []
+        # Rounds are as many as the largest feature group has features
+        expected_rounds = max(len({self.encoded_columns[i][:-2] for i in indices}) for indices in self.group_info.values())
+        needed = self.stage_seconds['ranking'] + expected_rounds * self.stage_seconds['pooled_round']
+        skip_shap = self._time_left(deadline) < needed
+        if skip_shap:
+            FALLBACK_SENSITIVITY_RANKING.inc()
+            degradation_reasons.append(
+                f"SHAP ranking skipped: {max(self._time_left(deadline), 0) * 1000:.0f} ms left, "
+                f"about {needed * 1000:.0f} ms needed; ranked by single-change sensitivity"
+            )
+        elif self.explainer is not None:
+            try:
+                started = time.monotonic()
+                shap_values = self._compute_shap_values(user_data)
+                self._record_stage('ranking', time.monotonic() - started)
+            except Exception as e:
+                logger.error(f"Error in SHAP analysis: {str(e)}", exc_info=True)
+        
+        plans = []
+        for spec in specs:
+            feature_lists, source = [], 'fallback'
+            output_weights = None if spec['weights'] is None else [spec['weights'][t] for t in RISK_TYPES]
+            if skip_shap:
+                feature_lists, source = self._sensitivity_feature_lists(user_data, output_weights), 'sensitivity'
+            elif shap_values is not None:
+                shap_df = self._process_shap_values(shap_values, output_weights=output_weights)
+                if not shap_df.empty:
+                    feature_lists, source = self._feature_lists_from_shap(shap_df), 'shap'
+            if not feature_lists:
+                feature_lists, source = self._get_fallback_feature_lists(), 'fallback'
+                if not skip_shap:
+                    degradation_reasons.append("SHAP analysis unavailable; used the fixed fallback feature groups")
+            if locked:
+                feature_lists = [[f for f in feature_list if f not in locked] for feature_list in feature_lists]
+                feature_lists = [feature_list for feature_list in feature_lists if feature_list]
+            plans.append({'spec': spec, 'featureLists': feature_lists, 'source': source,
+                          'state': baseline.copy(), 'rounds': []})
+        
+        baseline_probs = self.score_encoded(baseline)
+        for plan in plans:
+            plan['initialRisk'] = float(self.objective_risk(baseline_probs, plan['spec'])[0])
+            plan['risk'] = plan['initialRisk']
+        candidate_rows, rows_scored = 0, 1
+        
+        n_rounds = max((len(plan['featureLists']) for plan in plans), default=0)
+        partial = False
+        for round_index in range(n_rounds):
+            if self._time_left(deadline) < self.stage_seconds['pooled_round']:
+                partial = True
+                FALLBACK_PARTIAL_ROUNDS.inc()
+                degradation_reasons.append(f"Latency budget reached after {round_index} of {n_rounds} rounds")
+                break
+            round_started = time.monotonic()
+            
+            # Pool every objective's candidates for this round
+            rows, slots = [], []
+            for p, plan in enumerate(plans):
+                if round_index >= len(plan['featureLists']):
                     continue
-                
-                round_recommendations = []
-                current_risk = self.calculate_risk_score(current_df)
-                
-                for target_feature, best_idx in zip(feature_list, updated_index):
-                    subcat_cols = [c for c in current_df.columns if c[:-2] == target_feature]
-                    if not subcat_cols:
+                for feature in plan['featureLists'][round_index]:
+                    block = self.feature_blocks.get(feature)
+                    if not block:
+                        logger.warning("No columns match feature '%s'", feature)
                         continue
-                    
-                    # Find current and recommended options
-                    current_col = None
-                    for col in subcat_cols:
-                        if current_df[col].iloc[0]:
-                            current_col = col
-                            break
-                    
-                    if current_col is None:
-                        current_col = subcat_cols[0]
-                    
-                    recommended_col = subcat_cols[best_idx]
-                    
-                    # Create recommendation
-                    round_recommendations.append({
-                        'featureGroup': target_feature,
-                        'featureName': self._get_feature_name(target_feature),
-                        'currentOption': self._get_option_label(current_col),
-                        'recommendedOption': self._get_option_label(recommended_col),
+                    slots.append((p, feature, len(rows), len(block)))
+                    for position in block:
+                        row = plan['state'].copy()
+                        row[block] = 0.0
+                        row[position] = 1.0
+                        rows.append(row)
+            if not rows:
+                continue
+            
+            unique_rows, inverse = np.unique(self.mask_forced_columns(np.array(rows)), axis=0, return_inverse=True)
+            probs = self.score_encoded(unique_rows)[inverse.ravel()]
+            candidate_rows += len(rows)
+            rows_scored += len(unique_rows)
+            
+            # Each objective picks its best option per feature against its pre-round state
+            choices = {}
+            for p, feature, offset, n_options in slots:
+                risks = self.objective_risk(probs[offset:offset + n_options], plans[p]['spec'])
+                choices.setdefault(p, []).append((feature, int(np.argmin(risks))))
+            
+            updated = []
+            for p, picks in choices.items():
+                plan = plans[p]
+                recommendations = []
+                state = plan['state'].copy()
+                for feature, best_idx in picks:
+                    block = self.feature_blocks[feature]
+                    current_pos = self.current_option_position(plan['state'], feature)
+                    recommendations.append({
+                        'featureGroup': feature,
+                        'featureName': self._get_feature_name(feature),
+                        'currentOption': self._get_option_label(self.encoded_columns[current_pos]),
+                        'recommendedOption': self._get_option_label(self.encoded_columns[block[best_idx]]),
                         'optionIndex': best_idx,
-                        'description': self._get_feature_description(target_feature)
+                        'description': self._get_feature_description(feature)
                     })
-                
-                # Apply changes for next round
-                for target_feature, idx in zip(feature_list, updated_index):
-                    subcat_cols = [c for c in current_df.columns if c[:-2] == target_feature]
-                    if subcat_cols:
-                        current_df[subcat_cols] = False
-                        current_df.loc[:, subcat_cols[idx]] = True
-                
-                projected_risk = self.calculate_risk_score(current_df)
+                    state[block] = 0.0
+                    state[block[best_idx]] = 1.0
+                updated.append((p, self.mask_forced_columns(state), recommendations))
+            
+            # Projected risks for every objective's new state in one pass
+            new_states, inverse = np.unique(np.array([state for _, state, _ in updated]), axis=0, return_inverse=True)
+            new_probs = self.score_encoded(new_states)[inverse.ravel()]
+            rows_scored += len(new_states)
+            for (p, state, recommendations), state_probs in zip(updated, new_probs):
+                plan = plans[p]
+                current_risk = plan['risk']
+                projected_risk = float(self.objective_risk(state_probs, plan['spec'])[0])
                 risk_reduction = current_risk - projected_risk
-                reduction_percentage = (risk_reduction / current_risk) * 100 if current_risk > 0 else 0
-                
-                rounds.append({
-                    'roundNumber': round_num,
-                    'features': feature_list,
+                plan['rounds'].append({
+                    'roundNumber': round_index + 1,
+                    'features': plan['featureLists'][round_index],
                     'currentRisk': current_risk,
                     'projectedRisk': projected_risk,
                     'riskReduction': risk_reduction,
-                    'reductionPercentage': reduction_percentage,
-                    'recommendations': round_recommendations
+                    'reductionPercentage': (risk_reduction / current_risk) * 100 if current_risk > 0 else 0,
+                    'recommendations': recommendations
                 })
-            
-            final_risk = rounds[-1]['projectedRisk'] if rounds else initial_risk
+                plan['state'], plan['risk'] = state, projected_risk
+            ROUND_POOLED.observe(time.monotonic() - round_started)
+            self._record_stage('pooled_round', time.monotonic() - round_started)
+        
+        results = []
+        for plan in plans:
+            initial_risk, final_risk = plan['initialRisk'], plan['risk']
             total_reduction = initial_risk - final_risk
             total_reduction_percentage = (total_reduction / initial_risk) * 100 if initial_risk > 0 else 0
-            
-            return {
+            results.append({
+                'objective': plan['spec']['name'],
+                'objectiveWeights': plan['spec']['weights'],
+                'rankingSource': plan['source'],
                 'initialRisk': initial_risk,
                 'finalRisk': final_risk,
                 'totalReduction': total_reduction,
                 'totalReductionPercentage': total_reduction_percentage,
-                'rounds': rounds,
-                'implementationPriority': 'high' if total_reduction_percentage > 30 else 'medium' if total_reduction_percentage > 15 else 'low'
-            }
-            
-        except Exception as e:
-            logger.error(f"Error generating mitigation strategy: {str(e)}", exc_info=True)
-            raise
+                'rounds': plan['rounds'],
+                'implementationPriority': 'high' if total_reduction_percentage > 30 else 'medium' if total_reduction_percentage > 15 else 'low',
+                'partial': partial and len(plan['rounds']) < len(plan['featureLists']),
+                'degraded': bool(degradation_reasons),
+                'degradationReasons': list(dict.fromkeys(degradation_reasons))
+            })
+        
+        return {
+            'plans': results,
+            'candidateRows': candidate_rows,
+            'rowsScored': rows_scored
+        }
+    
+    @staticmethod
+    def _time_left(deadline: Optional[float]) -> float:
+        """Seconds until the deadline (infinite without one)"""
+        return float('inf') if deadline is None else deadline - time.monotonic()
+    
+    def _round_options(self, feature_list: List[str]) -> int:
+        return sum(len(self.feature_blocks.get(feature, ())) for feature in feature_list)
+    
+    def _round_seconds(self, feature_list: List[str]) -> float:
+        """Expected time of one greedy round, from the running per-option cost"""
+        return self._round_options(feature_list) * self.stage_seconds['option']
+    
+    def _full_strategy_seconds(self, locked_features: Optional[List[str]] = None) -> float:
+        """Expected SHAP ranking time plus rounds covering every unlocked feature once"""
+        locked = set(locked_features or ())
+        return self.stage_seconds['ranking'] + self._round_seconds([f for f in self.feature_cols if f not in locked])
+    
+    def _record_stage(self, stage: str, seconds: float) -> None:
+        """Exponential moving average of how long a strategy stage takes"""
+        self.stage_seconds[stage] = 0.8 * self.stage_seconds[stage] + 0.2 * seconds
+    
+    def _sensitivity_feature_lists(self, user_data: List[int], output_weights: Optional[List[float]] = None) -> List[List[str]]:
+        """Cheap stand-in for the SHAP ranking from one batched single-change pass.
+        
+        A feature's importance is the largest drop in the (optionally weighted) summed
+        probabilities that any of its options achieves on its own. Rounds are built
+        like _feature_lists_from_shap: round r takes every group's r-th most important
+        feature, groups in name order.
+        """
+        baseline = self.encode_user_data(user_data)
+        alternatives, changes = self._single_change_vectors(baseline)
+        probs = self.score_encoded(np.vstack([baseline[None, :], baseline + changes]))
+        weights = np.ones(probs.shape[1]) if output_weights is None else np.asarray(output_weights)
+        scores = probs @ weights
+        drops = scores[0] - scores[1:]
+        
+        importance = {feature: 0.0 for feature in self.feature_cols}
+        for (feature, _), drop in zip(alternatives, drops):
+            importance[feature] = max(importance[feature], float(drop))
+        
+        group_features = {}
+        for group_name, indices in self.group_info.items():
+            for index in indices:
+                features = group_features.setdefault(str(group_name), [])
+                feature = self.encoded_columns[index][:-2]
+                if feature not in features:
+                    features.append(feature)
+        ranked = [
+            sorted(sorted(features), key=lambda feature: -importance[feature])
+            for _, features in sorted(group_features.items())
+        ]
+        return [
+            [features[rank] for features in ranked if rank < len(features)]
+            for rank in range(max(len(features) for features in ranked))
+        ]
     
     def _generate_dynamic_feature_lists(self, user_data: List[int]) -> List[List[str]]:
         """Generate feature groups based on SHAP analysis (matching original algorithm)"""
@@ -370,12 +821,21 @@ class RiskMitigationAnalyzer:
             # Get SHAP analysis
             logger.debug("Getting SHAP analysis...")
             shap_df = self.get_shap_analysis(user_data)
-            logger.debug(f"SHAP analysis completed, result shape: {shap_df.shape if not shap_df.empty else 'EMPTY'}")
+            logger.debug("SHAP analysis completed, result shape: %s", shap_df.shape if not shap_df.empty else 'EMPTY')
             
             if shap_df.empty:
                 logger.warning("SHAP analysis returned empty results")
                 return []
             
+            return self._feature_lists_from_shap(shap_df)
+            
+        except Exception as e:
+            logger.error(f"Error in dynamic feature grouping: {str(e)}")
+            return []
+    
+    def _feature_lists_from_shap(self, shap_df: pd.DataFrame) -> List[List[str]]:
+        """Turn per-feature SHAP importance into per-round feature lists"""
+        try:
             # Process SHAP results exactly like original script
             # 1. Sort each group by shap_value (descending)
             sorted_gbf = (
@@ -413,6 +873,7 @@ class RiskMitigationAnalyzer:
     
     def _get_fallback_feature_lists(self) -> List[List[str]]:
         """Fallback feature groups when SHAP analysis is not available"""
+        FALLBACK_FEATURE_LISTS.inc()
         # Return 5 rounds to match expected output
         return [
             ['1.3', '2.1.1', '3.4', '4.3'],  # Round 1: High impact features
@@ -586,60 +1047,220 @@ class RiskMitigationAnalyzer:
                                                       current_option: str, recommended_option: str, current_risk_override: float = None) -> Dict[str, float]:
         """Calculate risk reduction for a single recommendation"""
         try:
-            # Preprocess current user data to get baseline
-            current_df = self.preprocess_user_data(user_data)
-            
-            # Use current_risk_override if provided, otherwise calculate it
-            if current_risk_override is not None:
-                current_risk = current_risk_override
-                logger.debug(f"Using provided current_risk_override: {current_risk}")
-            else:
-                current_risk = self.calculate_risk_score(current_df)
-                logger.debug(f"Calculated current_risk: {current_risk}")
-            
-            # Apply the specific recommendation change
-            modified_df = current_df.copy()
-            
-            # Find the feature columns for this group
-            # The columns are named like "feature_group_option" (e.g., "1.3_0", "1.3_1")
-            subcat_cols = [c for c in modified_df.columns if c.startswith(f"{feature_group}_")]
-            if not subcat_cols:
-                logger.warning(f"No columns found for feature group: {feature_group}")
-                return {'riskReduction': 0.0, 'riskReductionPercentage': 0.0}
-            
-            # Find the recommended column based on the option
-            recommended_col = None
-            for col in subcat_cols:
-                if self._get_option_label(col) == recommended_option:
-                    recommended_col = col
-                    break
-            
-            if recommended_col is None:
-                logger.warning(f"Could not find column for recommended option: {recommended_option}")
-                logger.warning(f"Available columns: {subcat_cols}")
-                logger.warning(f"Available options: {[self._get_option_label(col) for col in subcat_cols]}")
-                return {'riskReduction': 0.0, 'riskReductionPercentage': 0.0}
-            
-            # Apply the change
-            modified_df[subcat_cols] = False
-            modified_df.loc[:, recommended_col] = True
-            
-            # Calculate new risk
-            new_risk = self.calculate_risk_score(modified_df)
-            risk_reduction = current_risk - new_risk
-            risk_reduction_percentage = (risk_reduction / current_risk) * 100 if current_risk > 0 else 0
+            result = self.calculate_batch_recommendation_risk_reduction(
+                user_data,
+                [{'featureGroup': feature_group, 'recommendedOption': recommended_option}],
+                current_risk_override=current_risk_override
+            )['results'][0]
             
-            logger.info(f"Risk reduction calculation: {feature_group} -> {recommended_option}")
-            logger.info(f"Current risk: {current_risk:.4f}, New risk: {new_risk:.4f}")
-            logger.info(f"Risk reduction: {risk_reduction:.4f} ({risk_reduction_percentage:.2f}%)")
+            logger.info("Risk reduction calculation: %s -> %s", feature_group, recommended_option)
+            logger.info("Risk reduction: %.4f (%.2f%%)", result['riskReduction'], result['riskReductionPercentage'])
             
             return {
-                'riskReduction': risk_reduction,
-                'riskReductionPercentage': risk_reduction_percentage
+                'riskReduction': result['riskReduction'],
+                'riskReductionPercentage': result['riskReductionPercentage']
             }
             
         except Exception as e:
             logger.error(f"Error calculating single recommendation risk reduction: {str(e)}")
             return {'riskReduction': 0.0, 'riskReductionPercentage': 0.0}
     
- 
\ No newline at end of file
+    def calculate_batch_recommendation_risk_reduction(self, user_data: List[int], changes: List[Dict[str, str]],
+                                                      current_risk_override: float = None) -> Dict[str, Any]:
+        """Calculate risk reduction for many single-feature changes in one forward pass.
+        
+        Each change is a dict with 'featureGroup' and 'recommendedOption' (the option
+        label). The baseline is encoded once; the baseline row and every modified row
+        are scored together. Unknown groups or options yield a zero reduction.
+        """
+        baseline = self.encode_user_data(user_data)
+        
+        rows = [baseline]
+        row_for_change = []
+        for change in changes:
+            feature_group = change['featureGroup']
+            block = self.feature_blocks.get(feature_group)
+            pos = self.option_positions.get((feature_group, change['recommendedOption']))
+            if not block or pos is None:
+                logger.warning("Could not resolve option '%s' for feature group: %s", change['recommendedOption'], feature_group)
+                row_for_change.append(None)
+                continue
+            
+            modified = baseline.copy()
+            modified[block] = 0.0
+            modified[pos] = 1.0
+            self.mask_forced_columns(modified)
+            row_for_change.append(len(rows))
+            rows.append(modified)
+        
+        risks = self.combined_risk(self.score_encoded(np.stack(rows)))
+        current_risk = current_risk_override if current_risk_override is not None else float(risks[0])
+        
+        results = []
+        for change, row in zip(changes, row_for_change):
+            if row is None:
+                results.append({'riskReduction': 0.0, 'riskReductionPercentage': 0.0})
+                continue
+            risk_reduction = current_risk - float(risks[row])
+            results.append({
+                'riskReduction': risk_reduction,
+                'riskReductionPercentage': (risk_reduction / current_risk) * 100 if current_risk > 0 else 0
+            })
+        
+        return {'currentRisk': current_risk, 'results': results}
+    
+    def _single_change_vectors(self, baseline: np.ndarray) -> Tuple[List[Tuple[str, int]], np.ndarray]:
+        """List every one-feature alternative and its additive change vector.
+        
+        Adding a change vector to the baseline moves that feature's one-hot bit from
+        the current option to the alternative, so changes to different features can
+        be combined by summing their vectors. Forced-zero columns stay zero, so a
+        change to a forced-zero option empties the feature's block as /predict does.
+        """
+        alternatives = []
+        for feature, block in self.feature_blocks.items():
+            current = self.current_option_position(baseline, feature)
+            for pos in block:
+                if pos != current:
+                    alternatives.append((feature, pos))
+        
+        changes = np.zeros((len(alternatives), baseline.shape[0]), dtype=np.float32)
+        for row, (feature, pos) in enumerate(alternatives):
+            changes[row, self.feature_blocks[feature]] = -baseline[self.feature_blocks[feature]]
+            changes[row, pos] = 1.0
+        return alternatives, self.mask_forced_columns(changes)
+    
+    def score_encoded_batched(self, encoded: np.ndarray, batch_size: int = 4096) -> np.ndarray:
+        """Score a large candidate matrix in fixed-size forward batches"""
+        if encoded.shape[0] <= batch_size:
+            return self.score_encoded(encoded)
+        return np.concatenate([
+            self.score_encoded(encoded[start:start + batch_size])
+            for start in range(0, encoded.shape[0], batch_size)
+        ])
+    
+    def compute_sensitivity_matrix(self, user_data: List[int]) -> Dict[str, Any]:
+        """Score every single-answer change and return per-option deltas.
+        
+        All one-feature alternatives are stacked with the baseline row and scored in
+        one forward pass. Each option's delta row holds the change in the five risk
+        probabilities followed by the change in the combined risk (option minus
+        baseline); the current option's row is all zeros.
+        """
+        baseline = self.encode_user_data(user_data)
+        alternatives, changes = self._single_change_vectors(baseline)
+        row_index = {pos: row + 1 for row, (feature, pos) in enumerate(alternatives)}
+        
+        probabilities = self.score_encoded(np.vstack([baseline[None, :], baseline + changes]))
+        scores = np.concatenate([probabilities, self.combined_risk(probabilities)[:, None]], axis=1)
+        deltas = scores - scores[0]
+        
+        features = []
+        for feature, block in self.feature_blocks.items():
+            current = self.current_option_position(baseline, feature)
+            current_index = block.index(current) if current is not None else None
+            features.append({
+                'featureGroup': feature,
+                'featureName': self._get_feature_name(feature),
+                'currentOptionIndex': current_index,
+                'options': [self._get_option_label(self.encoded_columns[pos]) for pos in block],
+                'deltas': [
+                    deltas[row_index[pos]].tolist() if pos in row_index else [0.0] * deltas.shape[1]
+                    for pos in block
+                ]
+            })
+        
+        return {
+            'riskTypes': RISK_TYPES + ['combined'],
+            'baseline': scores[0].tolist(),
+            'alternativesScored': len(alternatives),
+            'features': features
+        }
+    
+    def compute_pairwise_interactions(self, user_data: List[int], batch_size: int = 4096) -> Dict[str, Any]:
+        """Evaluate all two-feature option changes and measure their interaction.
+        
+        For each feature pair the surplus of an option pair is its joint delta minus
+        the sum of the two single deltas. The pair's best joint reduction is compared
+        with applying each feature's best single option independently, which is what
+        one greedy round does; the gap is reported as missedReduction.
+        """
+        baseline = self.encode_user_data(user_data)
+        alternatives, changes = self._single_change_vectors(baseline)
+        features = list(self.feature_blocks)
+        alt_feature = np.array([features.index(feature) for feature, _ in alternatives])
+        
+        # Index pairs of alternatives belonging to two different features (i < j)
+        first, second = np.triu_indices(len(alternatives), k=1)
+        keep = alt_feature[first] != alt_feature[second]
+        first, second = first[keep], second[keep]
+        
+        singles = self.score_encoded(np.vstack([baseline[None, :], baseline + changes]))
+        pairs = self.score_encoded_batched(baseline + changes[first] + changes[second], batch_size=batch_size)
+        
+        single_scores = np.concatenate([singles, self.combined_risk(singles)[:, None]], axis=1)
+        pair_scores = np.concatenate([pairs, self.combined_risk(pairs)[:, None]], axis=1)
+        base_scores = single_scores[0]
+        single_deltas = single_scores[1:] - base_scores
+        pair_deltas = pair_scores - base_scores
+        surplus = pair_deltas - (single_deltas[first] + single_deltas[second])
+        
+        # Best single option per feature as a greedy round picks it; None keeps the current answer
+        best_single = {}
+        for alt, (feature, pos) in enumerate(alternatives):
+            incumbent = best_single.get(feature)
+            incumbent_delta = 0.0 if incumbent is None else single_deltas[incumbent, -1]
+            if single_deltas[alt, -1] < incumbent_delta:
+                best_single[feature] = alt
+        pair_lookup = {(a, b): row for row, (a, b) in enumerate(zip(first.tolist(), second.tolist()))}
+        
+        results = []
+        pair_keys = alt_feature[first] * len(features) + alt_feature[second]
+        order = np.argsort(pair_keys, kind='stable')
+        boundaries = np.flatnonzero(np.diff(pair_keys[order])) + 1
+        for rows in np.split(order, boundaries):
+            feature_a = alternatives[first[rows[0]]][0]
+            feature_b = alternatives[second[rows[0]]][0]
+            best_row = rows[np.argmin(pair_deltas[rows, -1])]
+            
+            best_a, best_b = best_single.get(feature_a), best_single.get(feature_b)
+            if best_a is not None and best_b is not None:
+                independent_delta = pair_deltas[pair_lookup[(best_a, best_b)], -1]
+            elif best_a is not None or best_b is not None:
+                independent_delta = single_deltas[best_a if best_a is not None else best_b, -1]
+            else:
+                independent_delta = 0.0
+            best_joint_delta = pair_deltas[best_row, -1]
+            
+            # Keeping either current answer is also allowed, so the best plan may be a single change
+            feature_a_rows = [alt for alt, (feature, _) in enumerate(alternatives) if feature == feature_a]
+            feature_b_rows = [alt for alt, (feature, _) in enumerate(alternatives) if feature == feature_b]
+            best_available = min(best_joint_delta, single_deltas[feature_a_rows + feature_b_rows, -1].min(), 0.0)
+            
+            results.append({
+                'features': [feature_a, feature_b],
+                'featureNames': [self._get_feature_name(feature_a), self._get_feature_name(feature_b)],
+                'maxSurplus': float(surplus[rows, -1].max()),
+                'minSurplus': float(surplus[rows, -1].min()),
+                'maxAbsSurplusByRiskType': np.abs(surplus[rows, :-1]).max(axis=0).tolist(),
+                'bestJointOptions': [
+                    self._get_option_label(self.encoded_columns[alternatives[first[best_row]][1]]),
+                    self._get_option_label(self.encoded_columns[alternatives[second[best_row]][1]])
+                ],
+                'bestJointReduction': float(-best_joint_delta),
+                'independentOptions': [
+                    self._get_option_label(self.encoded_columns[alternatives[best][1]]) if best is not None else None
+                    for best in (best_a, best_b)
+                ],
+                'independentReduction': float(-independent_delta),
+                'missedReduction': float(max(0.0, independent_delta - best_available))
+            })
+        
+        results.sort(key=lambda r: r['missedReduction'], reverse=True)
+        return {
+            'baselineRisk': float(base_scores[-1]),
+            'riskTypes': RISK_TYPES,
+            'pairsEvaluated': len(results),
+            'rowsScored': int(len(first) + len(alternatives) + 1),
+            'pairs': results
+        }
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Model Pool Module
+Lazily loaded per-tenant model bundles under a memory budget, with per-model request batching
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from risk_metrics import PREDICT_BATCH_SIZE
+from risk_model_registry import ModelBundle
+
+logger = logging.getLogger(__name__)
+
+def model_memory_bytes(model) -> int:
+    """Bytes held by a model's parameters and buffers"""
+    return sum(tensor.numel() * tensor.element_size() for tensor in model.state_dict().values())
+
+class PredictionBatcher:
+    """Coalesces concurrent single-row predictions for one model into batched forward passes.
+
+    The first row to arrive opens a batch; it is scored once max_batch rows have
+    joined or max_delay seconds have passed, whichever comes first, in one call to
+    score (an [n, columns] -> [n, outputs] function run in the threadpool).
+    """
+
+    def __init__(self, score: Callable[[np.ndarray], np.ndarray], max_batch: int = 32, max_delay: float = 0.002):
+        self.score = score
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending: List = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.rows = 0
+
+    async def predict(self, encoded: np.ndarray) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((encoded, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List) -> None:
+        self.batches += 1
+        self.rows += len(batch)
+        PREDICT_BATCH_SIZE.observe(len(batch))
+        try:
+            probabilities = await run_in_threadpool(self.score, np.stack([encoded for encoded, _ in batch]))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), row in zip(batch, probabilities):
+            if not future.done():  # the waiting request may have been cancelled
+                future.set_result(row)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "meanBatchSize": round(self.rows / self.batches, 2) if self.batches else None
+        }
+
+class ModelPool:
+    """LRU of per-tenant model bundles, loaded on first use and evicted under a memory budget.
+
+    load(model_id) builds a bundle in the threadpool; concurrent requests for a model
+    that is still loading wait for the same load. Each bundle is charged its weights
+    plus bundle_overhead_bytes (analyzer, explainer and memory-tier caches). When the
+    total exceeds max_bytes the least recently used bundles are evicted, idle ones
+    first; an evicted bundle that still has requests in flight finishes them and is
+    freed with its last reference.
+    """
+
+    def __init__(self, load: Callable[[str], ModelBundle], max_bytes: int = 256 * 1024 * 1024,
+                 bundle_overhead_bytes: int = 8 * 1024 * 1024):
+        self.load = load
+        self.max_bytes = max_bytes
+        self.bundle_overhead_bytes = bundle_overhead_bytes
+        self._bundles: "OrderedDict[str, ModelBundle]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_failures = 0
+        self.load_seconds = 0.0
+
+    async def get(self, model_id: str) -> ModelBundle:
+        """The bundle for model_id, loading it (once, however many callers wait) if needed"""
+        with self._lock:
+            bundle = self._bundles.get(model_id)
+            if bundle is not None:
+                self._bundles.move_to_end(model_id)
+                self.hits += 1
+                return bundle
+            self.misses += 1
+        task = self._loading.get(model_id)
+        if task is None:
+            # A task of its own, so a caller that disconnects does not abort the load for the others
+            task = asyncio.ensure_future(self._load(model_id))
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._loading[model_id] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, model_id: str) -> ModelBundle:
+        generation = self._generation
+        started = time.monotonic()
+        try:
+            bundle = await run_in_threadpool(self.load, model_id)
+        except Exception:
+            self.load_failures += 1
+            raise
+        finally:
+            del self._loading[model_id]
+        self.load_seconds += time.monotonic() - started
+        if generation == self._generation:  # not loaded against an encoder that has since been replaced
+            self._insert(model_id, bundle)
+        return bundle
+
+    def _insert(self, model_id: str, bundle: ModelBundle) -> None:
+        size = model_memory_bytes(bundle.model) + self.bundle_overhead_bytes
+        with self._lock:
+            self._bundles[model_id] = bundle
+            self._sizes[model_id] = size
+            evicted = self._evict(keep=model_id)
+        logger.info(f"Loaded model {model_id} ({bundle.version}); pool holds {len(self._bundles)} models, "
+                    f"{self.resident_bytes() / 2**20:.1f} MB")
+        for evicted_id in evicted:
+            logger.info(f"Evicted model {evicted_id} from the pool")
+
+    def _evict(self, keep: str) -> List[str]:
+        evicted = []
+        while sum(self._sizes.values()) > self.max_bytes and len(self._bundles) > 1:
+            candidates = [model_id for model_id in self._bundles if model_id != keep]
+            idle = [model_id for model_id in candidates if self._bundles[model_id].in_flight == 0]
+            victim = (idle or candidates)[0]
+            del self._bundles[victim]
+            del self._sizes[victim]
+            self.evictions += 1
+            evicted.append(victim)
+        return evicted
+
+    def clear(self) -> None:
+        """Drop every bundle, e.g. after the shared base model (and its encoder) was swapped"""
+        with self._lock:
+            self._generation += 1
+            dropped = len(self._bundles)
+            self._bundles.clear()
+            self._sizes.clear()
+        if dropped:
+            logger.info(f"Cleared {dropped} models from the pool")
+
+    def resident_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {
+                model_id: {"version": bundle.version, "bytes": self._sizes[model_id], "inFlight": bundle.in_flight,
+                           "batching": bundle.batcher.stats() if bundle.batcher is not None else None}
+                for model_id, bundle in self._bundles.items()
+            }
+        return {
+            "models": models,
+            "loading": list(self._loading),
+            "residentBytes": self.resident_bytes(),
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "loadFailures": self.load_failures,
+            "loadSeconds": round(self.load_seconds, 3)
+        }
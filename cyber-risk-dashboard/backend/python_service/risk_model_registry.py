@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Model Registry Module
+Versioned model bundles with background loading, golden validation, atomic swap and draining
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+GOLDEN_OUTPUTS_FILE = "golden_outputs.json"
+
+class ModelValidationError(Exception):
+    """Raised when a candidate bundle does not reproduce its golden outputs"""
+    pass
+
+class ModelRegistryBusyError(Exception):
+    """Raised when a bundle load is requested while another one is still in progress"""
+    pass
+
+class ModelBundle:
+    """One model version and everything derived from it: encoder data, analyzers and caches.
+
+    Requests take a lease on the bundle that is active when they arrive and use it
+    throughout, so a swap never mixes two versions within one response.
+    """
+
+    def __init__(self, version: str, source: str, model, df, group_info, X_train,
+                 analyzer=None, plan_search=None, relaxed_planner=None, marginalizer=None,
+                 caches: Optional[Dict[str, Any]] = None):
+        self.version = version
+        self.source = source
+        self.model = model
+        self.df = df
+        self.group_info = group_info
+        self.X_train = X_train
+        self.analyzer = analyzer
+        self.plan_search = plan_search
+        self.relaxed_planner = relaxed_planner
+        self.marginalizer = marginalizer
+        self.caches = caches or {}
+        self.batcher = None  # coalesces concurrent predictions into one forward pass
+        self.loaded_at = time.time()
+        self.activated_at: Optional[float] = None
+        self.retired_at: Optional[float] = None
+        self.in_flight = 0
+        self.validation: Dict[str, Any] = {}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "source": self.source,
+            "loadedAt": self.loaded_at,
+            "activatedAt": self.activated_at,
+            "inFlight": self.in_flight,
+            "validation": self.validation
+        }
+
+def golden_inputs(df, count: int = 12) -> List[List[int]]:
+    """Reference rows used as golden inputs: the first count rows of the bundle's data"""
+    return df.iloc[:count, :-5].astype(int).values.tolist()
+
+def write_golden_outputs(bundle: ModelBundle, predict: Callable[[ModelBundle, List[int]], List[float]],
+                         path: str, count: int = 12, atol: float = 1e-5) -> Dict[str, Any]:
+    """Record a bundle's predictions on its reference rows as the golden outputs shipped with it"""
+    inputs = golden_inputs(bundle.df, count)
+    golden = {
+        "version": bundle.version,
+        "atol": atol,
+        "inputs": inputs,
+        "probabilities": [[round(float(p), 8) for p in predict(bundle, user_data)] for user_data in inputs]
+    }
+    with open(path, "w") as handle:
+        json.dump(golden, handle)
+    return golden
+
+def validate_bundle(bundle: ModelBundle, predict: Callable[[ModelBundle, List[int]], List[float]],
+                    smoke_test: Optional[Callable[[ModelBundle, List[int]], Any]] = None,
+                    reference: Optional[ModelBundle] = None) -> Dict[str, Any]:
+    """Check a candidate bundle before it may serve traffic; raises ModelValidationError.
+
+    Predictions must be finite probabilities. If the bundle directory ships
+    golden_outputs.json, every golden input must reproduce its recorded probabilities
+    within the file's atol, which catches a mismatched model definition, group info or
+    reference data. The smoke test (e.g. one mitigation strategy) must run, and the
+    drift against the reference (currently active) bundle is reported.
+    """
+    report: Dict[str, Any] = {"golden": None, "maxDriftFromActive": None}
+    inputs = golden_inputs(bundle.df, 4)
+    probabilities = np.array([predict(bundle, user_data) for user_data in inputs])
+    if not np.all(np.isfinite(probabilities)) or probabilities.min() < 0 or probabilities.max() > 1:
+        raise ModelValidationError("Model produced probabilities outside [0, 1]")
+
+    golden_path = os.path.join(bundle.source, GOLDEN_OUTPUTS_FILE)
+    if os.path.exists(golden_path):
+        with open(golden_path) as handle:
+            golden = json.load(handle)
+        actual = np.array([predict(bundle, user_data) for user_data in golden["inputs"]])
+        error = float(np.abs(actual - np.array(golden["probabilities"])).max())
+        report["golden"] = {"inputs": len(golden["inputs"]), "maxAbsError": error, "atol": golden["atol"]}
+        if error > golden["atol"]:
+            raise ModelValidationError(
+                f"Golden outputs not reproduced: max abs error {error:.2e} exceeds atol {golden['atol']:.1e}"
+            )
+    else:
+        logger.warning(f"No {GOLDEN_OUTPUTS_FILE} in {bundle.source}; validating output ranges only")
+
+    if smoke_test is not None:
+        try:
+            smoke_test(bundle, inputs[0])
+        except Exception as e:
+            raise ModelValidationError(f"Smoke test failed: {str(e)}")
+
+    if reference is not None:
+        previous = np.array([predict(reference, user_data) for user_data in inputs])
+        if previous.shape == probabilities.shape:
+            report["maxDriftFromActive"] = float(np.abs(previous - probabilities).max())
+    return report
+
+class ModelRegistry:
+    """Holds the active ModelBundle and swaps in new ones without a restart.
+
+    load() builds and validates a candidate in a worker thread while the active
+    bundle keeps serving. Only a validated candidate is swapped in, by a single
+    reference assignment, so every request sees either the old or the new bundle.
+    Requests already holding a lease on the old bundle finish on it; the old bundle
+    is released once its last lease ends (it is "draining" until then). on_swap is
+    called on the event loop after each swap, e.g. to rebind long-lived sessions.
+    """
+
+    def __init__(self, on_swap: Optional[Callable[[ModelBundle, Optional[ModelBundle]], None]] = None,
+                 history_size: int = 20):
+        self.on_swap = on_swap
+        self._active: Optional[ModelBundle] = None
+        self._draining: List[ModelBundle] = []
+        self._lock = threading.Lock()
+        self._loading: Optional[str] = None
+        self.history: List[Dict[str, Any]] = []
+        self.history_size = history_size
+
+    def active(self) -> Optional[ModelBundle]:
+        return self._active
+
+    @contextmanager
+    def lease(self, bundle: Optional[ModelBundle] = None):
+        """Pin a bundle (by default the active one) for the duration of the block"""
+        with self._lock:
+            if bundle is None:
+                bundle = self._active
+            if bundle is not None:
+                bundle.in_flight += 1
+        try:
+            yield bundle
+        finally:
+            if bundle is not None:
+                with self._lock:
+                    bundle.in_flight -= 1
+                    drained = bundle.in_flight == 0 and bundle in self._draining
+                    if drained:
+                        self._draining.remove(bundle)
+                if drained:
+                    self._retired(bundle)
+
+    def activate(self, bundle: ModelBundle) -> Optional[ModelBundle]:
+        """Make a bundle active; returns the previous one, which drains its in-flight requests"""
+        with self._lock:
+            previous = self._active
+            bundle.activated_at = time.time()
+            self._active = bundle
+            drained = previous is not None and previous.in_flight == 0
+            if previous is not None and not drained:
+                self._draining.append(previous)
+        logger.info(f"Model bundle {bundle.version} from {bundle.source} is active"
+                    + (f" (replacing {previous.version})" if previous is not None else ""))
+        self._record("activated", bundle.version, bundle.source, previous=previous.version if previous else None)
+        if drained:
+            self._retired(previous)
+        if self.on_swap is not None:
+            self.on_swap(bundle, previous)
+        return previous
+
+    async def load(self, source: str, build: Callable[[str], ModelBundle],
+                   validate: Callable[[ModelBundle, Optional[ModelBundle]], Dict[str, Any]]) -> ModelBundle:
+        """Build and validate a bundle off the event loop, then swap it in"""
+        with self._lock:
+            if self._loading is not None:
+                raise ModelRegistryBusyError(f"Bundle {self._loading} is still loading")
+            self._loading = source
+        try:
+            started = time.monotonic()
+            bundle = await run_in_threadpool(build, source)
+            if self._active is not None and bundle.version == self._active.version:
+                self._record("unchanged", bundle.version, source)
+                logger.info(f"Bundle from {source} is already active as {bundle.version}")
+                return self._active
+            bundle.validation = await run_in_threadpool(validate, bundle, self._active)
+            bundle.validation["loadSeconds"] = round(time.monotonic() - started, 3)
+            self.activate(bundle)
+            return bundle
+        except Exception as e:
+            self._record("rejected", None, source, error=str(e))
+            logger.error(f"Model bundle from {source} rejected: {str(e)}")
+            raise
+        finally:
+            with self._lock:
+                self._loading = None
+
+    def _retired(self, bundle: ModelBundle) -> None:
+        bundle.retired_at = time.time()
+        self._record("retired", bundle.version, bundle.source)
+        logger.info(f"Model bundle {bundle.version} drained and released")
+
+    def _record(self, event: str, version: Optional[str], source: str, **details) -> None:
+        self.history.append({"event": event, "version": version, "source": source, "at": time.time(), **details})
+        del self.history[:-self.history_size]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": self._active.stats() if self._active is not None else None,
+                "draining": [bundle.stats() for bundle in self._draining],
+                "loading": self._loading,
+                "history": list(self.history)
+            }
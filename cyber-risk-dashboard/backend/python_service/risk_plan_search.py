@@ -0,0 +1,557 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Plan Search Module
+Exact budgeted mitigation search using branch-and-bound over batched model evaluations
+"""
+
+import heapq
+import itertools
+import time
+import numpy as np
+import torch
+from typing import List, Dict, Any, Optional, Callable, Tuple, Union
+import logging
+from risk_cancellation import check_cancelled
+
+logger = logging.getLogger(__name__)
+
+# Answers describing the project itself rather than its security posture
+DEFAULT_LOCKED_FEATURES = ('1.1', '1.2', '1.5')  # Project Duration, Project Type, Project Phase
+
+class MitigationPlanSearch:
+    """Finds provably best answer changes for the Mixture-of-Experts risk model.
+
+    The search decides one movable feature per tree level (keep the answer or switch
+    to one of its affordable options) in order of single-change impact; locked
+    features never enter the tree. Each change spends its cost from the budget
+    (unit costs give the classic "at most k changes" problem). Nodes are expanded in batches:
+    the completions of all new children are scored in one forward pass and their
+    lower bounds are computed together. The bound is admissible for the MoE because
+    each expert only sees its own feature group (so its best reachable logits can be
+    read from a precomputed table) and the gating logits are linear in the one-hot
+    input (so the worst-case expert mixture lies on a corner of their reachable box).
+    """
+
+    def __init__(self, analyzer, node_batch_size: int = 256, max_expansions: int = 200000,
+                 time_limit: Optional[float] = None, tolerance: float = 0.0, bound_chunk_size: int = 64):
+        self.analyzer = analyzer
+        self.model = analyzer.model
+        self.node_batch_size = node_batch_size
+        self.bound_chunk_size = bound_chunk_size  # child nodes bounded per vectorized pass
+        self.max_expansions = max_expansions
+        self.time_limit = time_limit  # seconds per query; the best plan so far is returned with optimal=False
+        self.tolerance = tolerance  # absolute risk gap accepted when pruning (0 = exact)
+
+        self.features = list(analyzer.feature_blocks)
+        self.n_options = np.array([len(analyzer.feature_blocks[f]) for f in self.features])
+        self.n_columns = len(analyzer.encoded_columns)
+
+        # option_positions[f, i] -> encoded column of option i of feature f (-1 padded)
+        self.option_positions = np.full((len(self.features), self.n_options.max()), -1, dtype=np.int64)
+        for f, feature in enumerate(self.features):
+            self.option_positions[f, :self.n_options[f]] = analyzer.feature_blocks[feature]
+
+        self.expert_tables, self.gating_contrib, self.gating_bias = self._build_bound_tables()
+        if self.expert_tables is None:
+            logger.warning("Model structure not recognised; plan search will run without pruning bounds")
+
+    def _build_bound_tables(self):
+        """Precompute per-expert output tables and per-feature gating contributions"""
+        model = self.model
+        if not all(hasattr(model, attr) for attr in ('group_names', 'group_info', 'experts', 'gating')):
+            return None, None, None
+
+        tables = []
+        covered = set()
+        for group in model.group_names:
+            cols = [int(c) for c in model.group_info[group]]
+            col_index = {c: i for i, c in enumerate(cols)}
+            group_features = [
+                f for f in range(len(self.features))
+                if all(int(p) in col_index for p in self.option_positions[f, :self.n_options[f]])
+            ]
+            if sum(self.n_options[f] for f in group_features) != len(cols):
+                return None, None, None
+            covered.update(group_features)
+
+            assignments = np.array(list(itertools.product(*[range(self.n_options[f]) for f in group_features])))
+            if len(assignments) > 100000:
+                return None, None, None
+
+            x = np.zeros((len(assignments), len(cols)), dtype=np.float32)
+            rows = np.arange(len(assignments))
+            for j, f in enumerate(group_features):
+                local = np.array([col_index[int(p)] for p in self.option_positions[f, :self.n_options[f]]])
+                x[rows, local[assignments[:, j]]] = 1.0
+            # Forced-zero columns are never set in a served input
+            x[:, [col_index[p] for p in self.analyzer.forced_zero_positions if p in col_index]] = 0.0
+            with torch.no_grad():
+                outputs = model.experts[group](torch.from_numpy(x)).numpy()
+
+            tables.append({
+                'features': np.array(group_features),
+                'assignments': assignments,
+                'outputs': outputs
+            })
+
+        if len(covered) != len(self.features):
+            return None, None, None
+
+        # Linear gating: each feature adds W[:, option column] to the gating logits
+        gating_net = getattr(model.gating, 'net', None)
+        if not isinstance(gating_net, torch.nn.Linear):
+            return tables, None, None
+        weight = gating_net.weight.detach().numpy()
+        contrib = np.zeros((len(self.features), self.n_options.max(), weight.shape[0]), dtype=np.float64)
+        for f in range(len(self.features)):
+            contrib[f, :self.n_options[f]] = weight[:, self.option_positions[f, :self.n_options[f]]].T
+        contrib[np.isin(self.option_positions, self.analyzer.forced_zero_positions)] = 0.0
+        return tables, contrib, gating_net.bias.detach().numpy().astype(np.float64)
+
+    # ----- public queries -------------------------------------------------
+
+    def best_plan_with_k_changes(self, user_data: List[int], max_changes: int,
+                                 locked_features: Optional[List[str]] = None,
+                                 risk_fn: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> Dict[str, Any]:
+        """Lowest achievable risk using at most max_changes changed answers"""
+        start = time.perf_counter()
+        context = self._make_context(user_data, risk_fn, locked_features=locked_features)
+        result = self._best_plan(context, max_changes, start)
+        return self._format_result(context, result, start, mode='best_k', maxChanges=max_changes)
+
+    def best_plan_within_budget(self, user_data: List[int], budget: float,
+                                change_costs: Optional[Dict[str, Union[float, List[float]]]] = None,
+                                locked_features: Optional[List[str]] = None,
+                                risk_fn: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> Dict[str, Any]:
+        """Lowest achievable risk whose changes cost at most the budget.
+
+        change_costs maps a feature code to one cost for any change of that answer, or
+        to a list with the cost of switching to each option; unlisted changes cost 1.
+        """
+        if budget < 0:
+            raise ValueError("budget must be non-negative")
+
+        start = time.perf_counter()
+        context = self._make_context(user_data, risk_fn, change_costs=change_costs, locked_features=locked_features)
+        result = self._best_plan(context, budget, start)
+        return self._format_result(context, result, start, mode='budget', budget=budget)
+
+    def fewest_changes_to_target(self, user_data: List[int], target: float, target_mode: str = 'combined',
+                                 max_changes: Optional[int] = None, locked_features: Optional[List[str]] = None,
+                                 risk_fn: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> Dict[str, Any]:
+        """Fewest changed answers bringing the combined risk (or every probability) to the target.
+
+        A batched greedy forward pass gives an upper bound on the number of changes;
+        iterative deepening below it proves (or improves) that count, and at the first
+        feasible depth the lowest-risk feasible plan is returned.
+        """
+        if target_mode not in ('combined', 'all'):
+            raise ValueError("target_mode must be 'combined' or 'all'")
+
+        start = time.perf_counter()
+        context = self._make_context(user_data, risk_fn, locked_features=locked_features)
+        movable = len(context['order'])
+        limit = movable if max_changes is None else min(max_changes, movable)
+
+        if target_mode == 'combined':
+            accept = lambda probs, risks: risks <= target
+            reject_bound = lambda prob_bounds, risk_bounds: risk_bounds > target + 1e-7
+        else:
+            accept = lambda probs, risks: (probs <= target).all(axis=1)
+            reject_bound = lambda prob_bounds, risk_bounds: (prob_bounds > target + 1e-7).any(axis=1)
+
+        steps = self._greedy_forward(context, limit)
+        totals = {'nodesExpanded': 0, 'rowsScored': sum(step['rowsScored'] for step in steps)}
+        greedy_hit = next((k for k, step in enumerate(steps)
+                           if accept(step['probs'][None, :], np.array([step['risk']]))[0]), None)
+        upper = limit if greedy_hit is None else greedy_hit
+
+        result = None
+        for k in range(upper + 1):
+            seed = steps[k] if k == greedy_hit else None
+            result = self._branch_and_bound(context, k, accept=accept, reject_bound=reject_bound, seed=seed, start=start)
+            totals['nodesExpanded'] += result['nodesExpanded']
+            totals['rowsScored'] += result['rowsScored']
+            if result['assignment'] is not None:
+                break
+            if not result['optimal']:
+                # Out of time before proving a smaller count: fall back to the greedy plan
+                if greedy_hit is not None:
+                    result.update(assignment=steps[greedy_hit]['assignment'], risk=steps[greedy_hit]['risk'],
+                                  probs=steps[greedy_hit]['probs'])
+                break
+        result.update(totals)
+        return self._format_result(context, result, start, mode='fewest_changes', maxChanges=limit,
+                                   target=target, targetMode=target_mode)
+
+    # ----- search internals -----------------------------------------------
+
+    def _best_plan(self, context: Dict[str, Any], budget: float, start: float) -> Dict[str, Any]:
+        """Seed with the greedy forward plan, then prove or improve it"""
+        steps = self._greedy_forward(context, budget)
+        seed = min(steps, key=lambda step: step['risk'])
+        result = self._branch_and_bound(context, budget, seed=seed, start=start)
+        result['rowsScored'] += sum(step['rowsScored'] for step in steps)
+        return result
+
+    def _cost_matrix(self, current: np.ndarray, change_costs, locked_features) -> np.ndarray:
+        """Cost of switching each feature to each option [F, max options]; inf marks disallowed"""
+        valid = np.arange(self.n_options.max())[None, :] < self.n_options[:, None]
+        costs = np.where(valid, 1.0, np.inf)
+        feature_index = {feature: f for f, feature in enumerate(self.features)}
+
+        for feature, cost in (change_costs or {}).items():
+            if feature not in feature_index:
+                raise ValueError(f"Unknown feature in change_costs: {feature}")
+            f = feature_index[feature]
+            if isinstance(cost, (list, tuple)):
+                if len(cost) != self.n_options[f]:
+                    raise ValueError(f"Feature {feature} has {self.n_options[f]} options but {len(cost)} costs were given")
+                option_costs = np.array([np.inf if c is None else float(c) for c in cost])
+            else:
+                option_costs = np.full(self.n_options[f], float(cost))
+            if (option_costs < 0).any() or np.isnan(option_costs).any():
+                raise ValueError(f"Costs for feature {feature} must be non-negative")
+            costs[f, :self.n_options[f]] = option_costs
+
+        for feature in locked_features or ():
+            if feature not in feature_index:
+                raise ValueError(f"Unknown locked feature: {feature}")
+            costs[feature_index[feature]] = np.inf
+
+        # Keeping the current answer is always free
+        costs[np.arange(len(self.features)), current] = 0.0
+        return costs
+
+    def _make_context(self, user_data: List[int], risk_fn, change_costs=None, locked_features=None) -> Dict[str, Any]:
+        """Encode the baseline and derive the per-query search state"""
+        baseline = self.analyzer.encode_user_data(user_data)
+        if baseline.shape[0] != self.n_columns:
+            raise ValueError("Input contains options the model was not trained on")
+
+        current = np.array([
+            self.analyzer.feature_blocks[feature].index(self.analyzer.current_option_position(baseline, feature))
+            for feature in self.features
+        ])
+        risk_fn = risk_fn or self.analyzer.combined_risk
+        costs = self._cost_matrix(current, change_costs, locked_features)
+        allowed = np.isfinite(costs)
+        change_costs_only = np.where(allowed, costs, np.inf)
+        change_costs_only[np.arange(len(self.features)), current] = np.inf
+        min_change_cost = change_costs_only.min(axis=1)  # [F], inf when the answer cannot move
+        movable = np.isfinite(min_change_cost)
+
+        # Order movable features by their best single-change improvement so good plans
+        # appear early; locked options are dropped before anything is scored
+        feature_index = {feature: f for f, feature in enumerate(self.features)}
+        alternatives, changes = self.analyzer._single_change_vectors(baseline)
+        keep = [
+            allowed[feature_index[feature], self.analyzer.feature_blocks[feature].index(position)]
+            for feature, position in alternatives
+        ]
+        alternatives = [alt for alt, ok in zip(alternatives, keep) if ok]
+        probs = self.analyzer.score_encoded(np.vstack([baseline[None, :], baseline + changes[np.array(keep, dtype=bool)]]))
+        risks = risk_fn(probs)
+        best_gain = {feature: 0.0 for feature in self.features}
+        for (feature, _), risk in zip(alternatives, risks[1:]):
+            best_gain[feature] = max(best_gain[feature], float(risks[0] - risk))
+        order = sorted(np.flatnonzero(movable).tolist(), key=lambda f: -best_gain[self.features[f]])
+        rank = np.full(len(self.features), -1, dtype=np.int64)  # -1: fixed at the current answer
+        rank[order] = np.arange(len(order))
+
+        context = {
+            'current': current,
+            'order': order,
+            'rank': rank,
+            'risk_fn': risk_fn,
+            'initial_probs': probs[0],
+            'initial_risk': float(risks[0]),
+            'costs': costs,
+            'allowed': allowed,
+            'min_change_cost': min_change_cost,
+            'cheapest_change': float(min_change_cost.min()),
+            'locked': [self.features[f] for f in np.flatnonzero(~movable)]
+        }
+        if self.expert_tables is not None:
+            context['table_costs'] = [
+                np.where(allowed[table['features'][None, :], table['assignments']],
+                         costs[table['features'][None, :], table['assignments']], 0.0)
+                for table in self.expert_tables
+            ]
+        if self.gating_contrib is not None:
+            current_contrib = self.gating_contrib[np.arange(len(self.features)), current]  # [F, G]
+            delta = self.gating_contrib - current_contrib[:, None, :]
+            delta = np.where(context['allowed'][:, :, None], delta, 0.0)
+            context['gating_delta_lo'] = delta.min(axis=1)  # [F, G], <= 0
+            context['gating_delta_hi'] = delta.max(axis=1)  # [F, G], >= 0
+        return context
+
+    def _score_assignments(self, assignments: np.ndarray, risk_fn) -> Tuple[np.ndarray, np.ndarray]:
+        """Score full option assignments [N, F] in one forward pass"""
+        x = np.zeros((len(assignments), self.n_columns), dtype=np.float32)
+        positions = self.option_positions[np.arange(len(self.features))[None, :], assignments]
+        x[np.arange(len(assignments))[:, None], positions] = 1.0
+        probs = self.analyzer.score_encoded(self.analyzer.mask_forced_columns(x))
+        return probs, risk_fn(probs)
+
+    def _greedy_forward(self, context: Dict[str, Any], budget: float) -> List[Dict[str, Any]]:
+        """Batched forward selection: repeatedly apply the best affordable single change.
+
+        Returns the plan after 0, 1, ... changes (stopping when nothing improves); each
+        step scores all remaining single changes in one forward pass.
+        """
+        risk_fn = context['risk_fn']
+        assignment = context['current'].copy()
+        steps = [{
+            'assignment': assignment.copy(),
+            'risk': context['initial_risk'],
+            'probs': context['initial_probs'],
+            'cost': 0.0,
+            'rowsScored': 0
+        }]
+        changed = np.zeros(len(self.features), dtype=bool)
+        spent = 0.0
+
+        while True:
+            candidates, candidate_costs = [], []
+            for f in context['order']:
+                if changed[f]:
+                    continue
+                for option in np.flatnonzero(context['allowed'][f]):
+                    cost = context['costs'][f, option]
+                    if option != assignment[f] and spent + cost <= budget + 1e-9:
+                        candidate = assignment.copy()
+                        candidate[f] = option
+                        candidates.append(candidate)
+                        candidate_costs.append(cost)
+            if not candidates:
+                break
+
+            candidates = np.array(candidates)
+            probs, risks = self._score_assignments(candidates, risk_fn)
+            best = int(np.argmin(risks))
+            if risks[best] >= steps[-1]['risk']:
+                break
+
+            assignment = candidates[best]
+            changed = assignment != context['current']
+            spent += candidate_costs[best]
+            steps.append({
+                'assignment': assignment.copy(),
+                'risk': float(risks[best]),
+                'probs': probs[best],
+                'cost': spent,
+                'rowsScored': len(candidates)
+            })
+        return steps
+
+    def _lower_bounds(self, context: Dict[str, Any], assignments: np.ndarray, depths: np.ndarray,
+                      remaining: np.ndarray) -> np.ndarray:
+        """Admissible lower bounds on the five logits reachable within each node's remaining budget"""
+        n_nodes = len(assignments)
+        if self.expert_tables is None:
+            return np.full((n_nodes, 5), -np.inf)
+        if n_nodes > self.bound_chunk_size:
+            # Bounded temporaries, and a cancellation checkpoint per chunk
+            return np.concatenate([
+                self._lower_bounds(context, assignments[i:i + self.bound_chunk_size],
+                                   depths[i:i + self.bound_chunk_size], remaining[i:i + self.bound_chunk_size])
+                for i in range(0, n_nodes, self.bound_chunk_size)
+            ])
+        check_cancelled()
+
+        decided = context['rank'][None, :] < depths[:, None]  # [N, F]
+        expert_bounds = []
+        for table, table_costs in zip(self.expert_tables, context['table_costs']):
+            feats = table['features']
+            node_decided = decided[:, feats][:, None, :]               # [N, 1, m]
+            mismatch = table['assignments'][None, :, :] != assignments[:, feats][:, None, :]
+            consistent = ~(node_decided & mismatch).any(axis=2)         # [N, n]
+            spend = np.where(node_decided, 0.0, table_costs[None, :, :]).sum(axis=2)  # [N, n]
+            reachable = consistent & (spend <= remaining[:, None] + 1e-9)
+            allowed = context['allowed'][feats[None, :], table['assignments']].all(axis=1)
+            reachable &= allowed[None, :]
+            outputs = np.where(reachable[:, :, None], table['outputs'][None, :, :], np.inf)
+            expert_bounds.append(outputs.min(axis=1))                  # [N, 5]
+        expert_bounds = np.stack(expert_bounds, axis=1)                 # [N, G, 5]
+
+        if self.gating_contrib is None:
+            # Softmax weights are a convex combination, so no logit can drop below the smallest expert
+            return expert_bounds.min(axis=1)
+
+        features = np.arange(len(self.features))
+        z_current = self.gating_bias + self.gating_contrib[features[None, :], assignments].sum(axis=1)  # [N, G]
+        undecided = ~decided
+        delta_lo = np.where(undecided[:, :, None], context['gating_delta_lo'][None], 0.0)
+        delta_hi = np.where(undecided[:, :, None], context['gating_delta_hi'][None], 0.0)
+        # Knapsack relaxation: no plan changes more answers than the cheapest changes the budget covers
+        cheapest = np.sort(np.where(undecided, context['min_change_cost'][None, :], np.inf), axis=1)
+        max_moves = (np.cumsum(cheapest, axis=1) <= remaining[:, None] + 1e-9).sum(axis=1)
+        z_lo = z_current + self._sum_extreme(np.sort(delta_lo, axis=1), max_moves)
+        z_hi = z_current + self._sum_extreme(-np.sort(-delta_hi, axis=1), max_moves)
+
+        # min over the gating box of sum_g w_g * l_g is attained at a corner of the box
+        n_groups = z_current.shape[1]
+        corners = np.array(list(itertools.product([False, True], repeat=n_groups)))
+        z = np.where(corners[None, :, :], z_hi[:, None, :], z_lo[:, None, :])        # [N, C, G]
+        z = z - z.max(axis=2, keepdims=True)
+        weights = np.exp(z)
+        weights /= weights.sum(axis=2, keepdims=True)
+        mixed = np.einsum('ncg,ngk->nck', weights, expert_bounds)
+        return mixed.min(axis=1)
+
+    @staticmethod
+    def _sum_extreme(sorted_deltas: np.ndarray, remaining: np.ndarray) -> np.ndarray:
+        """Sum of the first `remaining` entries of pre-sorted per-feature deltas [N, F, G]"""
+        cumulative = np.concatenate([
+            np.zeros((sorted_deltas.shape[0], 1, sorted_deltas.shape[2])),
+            np.cumsum(sorted_deltas, axis=1)
+        ], axis=1)
+        take = np.minimum(remaining, sorted_deltas.shape[1])
+        return cumulative[np.arange(len(remaining)), take]
+
+    def _branch_and_bound(self, context: Dict[str, Any], budget: float, accept=None, reject_bound=None,
+                          seed: Optional[Dict[str, Any]] = None, start: Optional[float] = None) -> Dict[str, Any]:
+        """Best-first branch-and-bound over per-feature decisions with batched expansion"""
+        deadline = None
+        if self.time_limit is not None:
+            deadline = (start if start is not None else time.perf_counter()) + self.time_limit
+        risk_fn = context['risk_fn']
+        current = context['current']
+        order = context['order']
+        costs = context['costs']
+        n_levels = len(order)
+        eps = max(1e-7, self.tolerance)
+
+        best = {'risk': np.inf, 'assignment': None, 'probs': None}
+        if seed is not None:
+            # A known feasible plan (e.g. from greedy forward selection) tightens pruning from the start
+            best.update(risk=seed['risk'], assignment=seed['assignment'].copy(), probs=seed['probs'])
+
+        def consider(assignments, probs, risks):
+            ok = np.ones(len(risks), dtype=bool) if accept is None else accept(probs, risks)
+            if ok.any():
+                idx = np.flatnonzero(ok)[np.argmin(risks[ok])]
+                if risks[idx] < best['risk']:
+                    best.update(risk=float(risks[idx]), assignment=assignments[idx].copy(), probs=probs[idx])
+
+        root = current[None, :].copy()
+        probs, risks = self._score_assignments(root, risk_fn)
+        consider(root, probs, risks)
+        rows_scored = 1
+        expansions = 0
+        optimal = True
+
+        heap = []
+        counter = itertools.count()
+        if n_levels > 0 and budget >= context['cheapest_change'] - 1e-9:
+            heapq.heappush(heap, (-np.inf, next(counter), 0, root[0], float(budget)))
+
+        while heap:
+            check_cancelled()
+            if heap[0][0] >= best['risk'] - eps:
+                break
+            if expansions >= self.max_expansions or (deadline is not None and time.perf_counter() > deadline):
+                optimal = False
+                break
+
+            batch = []
+            while heap and len(batch) < self.node_batch_size and heap[0][0] < best['risk'] - eps:
+                batch.append(heapq.heappop(heap))
+            expansions += len(batch)
+
+            # Children: keep the answer at this level, or switch to any other affordable option
+            child_assign, child_depth, child_remaining, needs_score = [], [], [], []
+            for _, _, depth, assignment, remaining in batch:
+                f = order[depth]
+                child_assign.append(assignment)
+                child_depth.append(depth + 1)
+                child_remaining.append(remaining)
+                needs_score.append(False)
+                for option in np.flatnonzero(context['allowed'][f]):
+                    if option == current[f] or costs[f, option] > remaining + 1e-9:
+                        continue
+                    changed = assignment.copy()
+                    changed[f] = option
+                    child_assign.append(changed)
+                    child_depth.append(depth + 1)
+                    child_remaining.append(remaining - costs[f, option])
+                    needs_score.append(True)
+
+            check_cancelled()
+            child_assign = np.array(child_assign)
+            child_depth = np.array(child_depth)
+            child_remaining = np.array(child_remaining)
+            needs_score = np.array(needs_score)
+
+            # Each changed child's completion (later answers unchanged) is a feasible plan
+            if needs_score.any():
+                probs, risks = self._score_assignments(child_assign[needs_score], risk_fn)
+                consider(child_assign[needs_score], probs, risks)
+                rows_scored += int(needs_score.sum())
+
+            expandable = (child_depth < n_levels) & (child_remaining >= context['cheapest_change'] - 1e-9)
+            if not expandable.any():
+                continue
+            child_assign = child_assign[expandable]
+            child_depth = child_depth[expandable]
+            child_remaining = child_remaining[expandable]
+
+            logit_bounds = self._lower_bounds(context, child_assign, child_depth, child_remaining)
+            prob_bounds = 1.0 / (1.0 + np.exp(-logit_bounds))
+            risk_bounds = risk_fn(prob_bounds)
+            keep = risk_bounds < best['risk'] - eps
+            if reject_bound is not None:
+                keep &= ~reject_bound(prob_bounds, risk_bounds)
+            for i in np.flatnonzero(keep):
+                heapq.heappush(heap, (float(risk_bounds[i]), next(counter), int(child_depth[i]),
+                                      child_assign[i], float(child_remaining[i])))
+
+        return {
+            'assignment': best['assignment'],
+            'risk': best['risk'],
+            'probs': best['probs'],
+            'optimal': optimal,
+            'nodesExpanded': expansions,
+            'rowsScored': rows_scored
+        }
+
+    def _format_result(self, context: Dict[str, Any], result: Dict[str, Any], start: float, **query) -> Dict[str, Any]:
+        """Turn a raw search result into the API response dictionary"""
+        analyzer = self.analyzer
+        assignment = result['assignment']
+        changes = []
+        total_cost = 0.0
+        if assignment is not None:
+            for f in np.flatnonzero(assignment != context['current']):
+                cost = float(context['costs'][f, assignment[f]])
+                total_cost += cost
+                feature = self.features[f]
+                changes.append({
+                    'featureGroup': feature,
+                    'featureName': analyzer._get_feature_name(feature),
+                    'currentOption': analyzer._get_option_label(analyzer.encoded_columns[self.option_positions[f, context['current'][f]]]),
+                    'recommendedOption': analyzer._get_option_label(analyzer.encoded_columns[self.option_positions[f, assignment[f]]]),
+                    'optionIndex': int(assignment[f]),
+                    'description': analyzer._get_feature_description(feature),
+                    'cost': cost
+                })
+
+        final_risk = result['risk'] if assignment is not None else context['initial_risk']
+        probs = result['probs'] if assignment is not None else context['initial_probs']
+        return {
+            **query,
+            'initialRisk': context['initial_risk'],
+            'finalRisk': float(final_risk),
+            'probabilities': [float(p) for p in probs],
+            'totalReduction': context['initial_risk'] - float(final_risk),
+            'numChanges': len(changes),
+            'totalCost': total_cost,
+            'changes': changes,
+            'lockedFeatures': context['locked'],
+            'feasible': assignment is not None,
+            'optimal': result['optimal'],
+            'nodesExpanded': result['nodesExpanded'],
+            'rowsScored': result['rowsScored'],
+            'elapsedMs': (time.perf_counter() - start) * 1000
+        }
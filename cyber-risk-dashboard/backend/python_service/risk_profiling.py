@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Profiling Module
+On-demand sampling CPU profiles, tracemalloc snapshots and model-call captures of the live worker
+"""
+
+import asyncio
+import html
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+import logging
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Leaf frames of threads that are parked: threadpool workers waiting for work, the idle event loop
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker")
+}
+
+class ProfilerBusyError(Exception):
+    """Raised when a capture is requested while another one is still running"""
+
+class ProfilerRateLimitedError(Exception):
+    """Raised when a capture is requested sooner than min_interval after the previous one"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Profiling is rate limited; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class ProfilerGuard:
+    """Admits one capture at a time, and at most one every min_interval seconds.
+
+    Profiling costs the worker real CPU while it serves traffic, so captures are
+    serialised and spaced out regardless of how many admins ask for them.
+    """
+
+    def __init__(self, min_interval: float = 30.0):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last_started: Optional[float] = None
+        self.active: Optional[str] = None
+        self.captures = 0
+        self.refused = 0
+
+    @contextmanager
+    def capture(self, kind: str):
+        if not self._lock.acquire(blocking=False):
+            self.refused += 1
+            raise ProfilerBusyError(f"A {self.active} capture is already running")
+        try:
+            now = time.monotonic()
+            if self._last_started is not None and now - self._last_started < self.min_interval:
+                self.refused += 1
+                raise ProfilerRateLimitedError(int(self.min_interval - (now - self._last_started)) + 1)
+            self._last_started = now
+            self.active = kind
+            self.captures += 1
+            logger.info(f"Starting {kind} profile capture")
+            yield
+        finally:
+            self.active = None
+            self._lock.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"active": self.active, "captures": self.captures, "refused": self.refused,
+                "minIntervalSeconds": self.min_interval}
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})".replace(";", ":")
+
+def sample_stacks(seconds: float, interval: float = 0.005, include_idle: bool = False) -> Dict[str, int]:
+    """Sample every thread's stack for seconds; returns collapsed stacks ("thread;outer;...;leaf") -> samples.
+
+    Runs in the calling thread, which leaves itself out. Stacks of parked threads
+    are dropped unless include_idle is set.
+    """
+    own = threading.get_ident()
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            if not include_idle and (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_LEAVES:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, f"thread-{ident}").replace(";", ":"))
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+    return dict(stacks)
+
+def collapsed_text(stacks: Dict[str, int]) -> str:
+    """The collapsed-stack format read by flamegraph.pl and speedscope"""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+def flamegraph_svg(stacks: Dict[str, int], title: str = "CPU profile", width: int = 1200) -> str:
+    """A self-contained SVG flame graph of collapsed stacks (roots at the bottom, hover for details)"""
+    root: Dict[str, Any] = {"count": 0, "children": OrderedDict()}
+    depth = 0
+    for stack, count in sorted(stacks.items()):
+        node = root
+        node["count"] += count
+        frames = stack.split(";")
+        depth = max(depth, len(frames))
+        for name in frames:
+            node = node["children"].setdefault(name, {"count": 0, "children": OrderedDict()})
+            node["count"] += count
+    row, top = 16, 32
+    height = top + (depth + 1) * row
+    total = root["count"] or 1
+    scale = (width - 20) / total
+    rects = []
+
+    def draw(node: Dict[str, Any], x: float, level: int) -> None:
+        for name, child in node["children"].items():
+            w = child["count"] * scale
+            if w >= 0.5:
+                y = height - (level + 2) * row
+                hue = zlib.crc32(name.encode("utf-8")) % 55
+                label = html.escape(name)
+                text = html.escape(name[:int(w / 7) - 1] + "…" if len(name) > w / 7 - 1 else name) if w > 28 else ""
+                rects.append(
+                    f'<g><title>{label} ({child["count"]} samples, {100.0 * child["count"] / total:.2f}%)</title>'
+                    f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row - 1}" fill="hsl({hue},85%,60%)"/>'
+                    f'<text x="{x + 3:.1f}" y="{y + row - 4}">{text}</text></g>'
+                )
+                draw(child, x, level + 1)
+            x += w
+
+    draw(root, 10.0, 0)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">'
+        f'<rect width="100%" height="100%" fill="#fafafa"/>'
+        f'<text x="10" y="20" font-size="14">{html.escape(title)} ({root["count"]} samples)</text>'
+        + "".join(rects) + "</svg>"
+    )
+
+class MemoryProfiler:
+    """tracemalloc snapshots of the worker; each snapshot is also diffed against the previous one"""
+
+    def __init__(self):
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    def start(self, frames: int = 25) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._previous = None
+            logger.info(f"tracemalloc started ({frames} frames)")
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("tracemalloc stopped")
+        self._previous = None
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {"tracing": tracing, "frames": tracemalloc.get_traceback_limit() if tracing else None,
+                "tracedBytes": current, "peakBytes": peak}
+
+    def snapshot(self, key_type: str = "lineno", limit: int = 25) -> Dict[str, Any]:
+        """Top allocation sites now, and the sites that grew most since the previous snapshot"""
+        if key_type not in ("lineno", "filename", "traceback"):
+            raise ValueError("key_type must be one of lineno, filename, traceback")
+        if not tracemalloc.is_tracing():
+            raise ValueError("tracemalloc is not running; start it first")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>")
+        ))
+        with self._lock:
+            previous, self._previous = self._previous, snapshot
+        result = {
+            **self.status(),
+            "top": [self._stat(stat, key_type) for stat in snapshot.statistics(key_type)[:limit]],
+            "diff": None
+        }
+        if previous is not None:
+            result["diff"] = [self._stat(stat, key_type) for stat in snapshot.compare_to(previous, key_type)[:limit]]
+        return result
+
+    @staticmethod
+    def _stat(stat, key_type: str) -> Dict[str, Any]:
+        frames = stat.traceback if key_type == "traceback" else stat.traceback[:1]
+        entry = {
+            "location": [f"{frame.filename}:{frame.lineno}" for frame in frames],
+            "bytes": stat.size,
+            "count": stat.count
+        }
+        if hasattr(stat, "size_diff"):
+            entry["bytesDiff"] = stat.size_diff
+            entry["countDiff"] = stat.count_diff
+        return entry
+
+class ModelCallProfiler:
+    """Captures the next `calls` forward passes of a model with the torch autograd profiler.
+
+    The autograd profiler only records the thread that enabled it and cannot run
+    twice at once, so calls are captured one at a time: a forward pass that starts
+    while another is being captured runs unprofiled and is not counted.
+    """
+
+    def __init__(self, model, calls: int):
+        self.model = model
+        self.calls = calls
+        self.captured: List[Dict[str, Any]] = []
+        self._ops: Dict[str, List[float]] = {}
+        self._active = None
+        self._active_thread: Optional[int] = None
+        self._started = 0.0
+        self._lock = threading.Lock()
+        self._handles = []
+        self._done: Optional[asyncio.Future] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def run(self, timeout: float) -> Dict[str, Any]:
+        """Install the hooks, wait for the calls (or the timeout) and return the aggregated profile"""
+        self._loop = asyncio.get_running_loop()
+        self._done = self._loop.create_future()
+        self._handles = [self.model.register_forward_pre_hook(self._before),
+                         self.model.register_forward_hook(self._after)]
+        try:
+            await asyncio.wait_for(asyncio.shield(self._done), timeout=timeout)
+            timed_out = False
+        except asyncio.TimeoutError:
+            timed_out = True
+        finally:
+            for handle in self._handles:
+                handle.remove()
+        with self._lock:
+            self._discard_active()
+            ops = sorted(self._ops.items(), key=lambda item: item[1][2], reverse=True)
+            calls = list(self.captured)
+        return {
+            "requestedCalls": self.calls,
+            "capturedCalls": len(calls),
+            "timedOut": timed_out,
+            "calls": calls,
+            "ops": [{"name": name, "count": int(count), "cpuTimeTotalUs": round(total, 1),
+                     "selfCpuTimeTotalUs": round(self_total, 1)}
+                    for name, (count, total, self_total) in ops[:40]]
+        }
+
+    def _before(self, module, inputs) -> None:
+        with self._lock:
+            if self._active is not None and self._active_thread == threading.get_ident():
+                self._discard_active()  # the captured call on this thread raised before its hook ran
+            if self._active is not None or len(self.captured) >= self.calls:
+                return
+            self._active = torch.autograd.profiler.profile(record_shapes=True)
+            self._active_thread = threading.get_ident()
+            self._active.__enter__()
+            self._started = time.perf_counter()
+
+    def _after(self, module, inputs, output) -> None:
+        with self._lock:
+            if self._active is None or self._active_thread != threading.get_ident():
+                return
+            wall = time.perf_counter() - self._started
+            profile, self._active = self._active, None
+            profile.__exit__(None, None, None)
+            for event in profile.key_averages():
+                entry = self._ops.setdefault(event.key, [0, 0.0, 0.0])
+                entry[0] += event.count
+                entry[1] += event.cpu_time_total
+                entry[2] += event.self_cpu_time_total
+            rows = inputs[0].shape[0] if inputs and hasattr(inputs[0], "shape") else None
+            self.captured.append({"wallMs": round(wall * 1000, 3), "rows": rows})
+            if len(self.captured) >= self.calls:
+                self._loop.call_soon_threadsafe(lambda: self._done.done() or self._done.set_result(True))
+
+    def _discard_active(self) -> None:
+        if self._active is None:
+            return
+        try:
+            self._active.__exit__(None, None, None)
+        except Exception as e:
+            logger.warning(f"Could not stop an abandoned model-call profile: {str(e)}")
+        self._active = None
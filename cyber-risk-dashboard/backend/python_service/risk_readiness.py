@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Readiness Module
+Warm-up passes that gate the readiness probe on measured latencies
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+class WarmupPass:
+    """One warm-up stage: a blocking call over representative inputs and its latency limit"""
+
+    def __init__(self, name: str, func: Callable[[List[int]], Any], limit_ms: float):
+        self.name = name
+        self.func = func
+        self.limit_ms = limit_ms
+        self.cold_ms: Optional[float] = None
+        self.p50_ms: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.p50_ms is not None and self.p50_ms <= self.limit_ms
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ok": self.ok,
+            "coldMs": self.cold_ms,
+            "p50Ms": self.p50_ms,
+            "limitMs": self.limit_ms,
+            "error": self.error
+        }
+
+class ReadinessProbe:
+    """Runs warm-up passes until every one of them is under its latency limit.
+
+    Each pass is called once cold (torch lazy initialization, allocator growth, SHAP
+    explainer setup), then once per representative input; the median of those warm
+    calls must be within the pass's limit. Passes that fail or are too slow are
+    retried every retry_interval seconds, so a replica that starts on a busy host
+    becomes ready once it settles. Missing components keep it not ready for good.
+    """
+
+    def __init__(self, passes: List[WarmupPass], inputs: List[List[int]],
+                 missing_components: Optional[List[str]] = None, retry_interval: float = 15.0):
+        self.passes = passes
+        self.inputs = inputs
+        self.missing_components = missing_components or []
+        self.retry_interval = retry_interval
+        self.state = "starting"
+        self.attempts = 0
+        self.ready_at: Optional[float] = None
+        self._started = time.monotonic()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    async def run(self) -> bool:
+        """Warm up until ready; returns False at once if a component failed to load"""
+        if self.missing_components:
+            self.state = "failed"
+            logger.error(f"Service cannot become ready, components not loaded: {self.missing_components}")
+            return False
+        while True:
+            self.state = "warming"
+            self.attempts += 1
+            for warmup in self.passes:
+                await self._measure(warmup)
+            if all(warmup.ok for warmup in self.passes):
+                self.state = "ready"
+                self.ready_at = time.monotonic() - self._started
+                logger.info(f"Service ready after {self.ready_at:.1f}s: " + ", ".join(
+                    f"{warmup.name} {warmup.p50_ms:.1f}ms" for warmup in self.passes))
+                return True
+            self.state = "not_ready"
+            failing = {warmup.name: warmup.stats() for warmup in self.passes if not warmup.ok}
+            logger.warning(f"Warm-up attempt {self.attempts} not within limits, "
+                           f"retrying in {self.retry_interval:g}s: {failing}")
+            await asyncio.sleep(self.retry_interval)
+
+    async def _measure(self, warmup: WarmupPass) -> None:
+        warmup.error = None
+        try:
+            started = time.perf_counter()
+            await run_in_threadpool(warmup.func, self.inputs[0])
+            warmup.cold_ms = (time.perf_counter() - started) * 1000
+            timings = []
+            for user_data in self.inputs:
+                started = time.perf_counter()
+                await run_in_threadpool(warmup.func, user_data)
+                timings.append((time.perf_counter() - started) * 1000)
+            warmup.p50_ms = float(np.median(timings))
+        except Exception as e:
+            warmup.error = str(e)
+            logger.error(f"Warm-up pass '{warmup.name}' failed: {str(e)}", exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "status": self.state,
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "readyAfterSeconds": round(self.ready_at, 3) if self.ready_at is not None else None,
+            "missingComponents": self.missing_components,
+            "passes": {warmup.name: warmup.stats() for warmup in self.passes}
+        }
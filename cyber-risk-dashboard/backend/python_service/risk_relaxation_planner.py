@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Relaxation Planner Module
+Gradient-based mitigation planning over a softmax relaxation of the questionnaire answers
+"""
+
+import time
+import numpy as np
+import torch
+from typing import List, Dict, Any, Optional, Tuple, Union
+import logging
+from risk_mitigation_strategy_new import RISK_TYPES
+
+logger = logging.getLogger(__name__)
+
+class RelaxedMitigationPlanner:
+    """Near-optimal multi-feature plans from a continuous relaxation of the one-hot input.
+
+    Every feature's one-hot block is replaced by a softmax over its allowed options, so
+    the model's probabilities become differentiable in the answers. Many random restarts
+    are optimized together as one batch with Adam on a smoothed risk objective (the
+    threshold count becomes a sigmoid that sharpens over the run, the softmax temperature
+    cools towards one-hot, and plans over budget pay a hinge penalty on their expected
+    cost). The restarts are then rounded to discrete answers, repaired to fit the budget
+    and verified with the exact combined risk, so the reported risk is always a real
+    model score. Shares encoding, locks, costs and result format with MitigationPlanSearch.
+
+    A run costs roughly the same at any size (about 0.6 s warm), while the exact search
+    is far faster on small plans and proves them optimal, so queries where fewer than
+    min_changes answers can change (given k, or the budget and the cheapest changes)
+    are handed to the exact search; the result's solver field says which one ran.
+    """
+
+    def __init__(self, plan_search, restarts: int = 64, steps: int = 120, learning_rate: float = 0.2,
+                 init_scale: float = 1.0, penalty: float = 1.0, snapshots: int = 6, polish_starts: int = 4,
+                 polish_steps: int = 10, seed: int = 0, min_changes: int = 6):
+        self.search = plan_search
+        self.analyzer = plan_search.analyzer
+        self.restarts = restarts
+        self.steps = steps
+        self.learning_rate = learning_rate
+        self.init_scale = init_scale
+        self.penalty = penalty  # risk charged per unit of expected cost over the budget
+        self.snapshots = snapshots  # rounded checkpoints kept per restart, spread over the second half of the run
+        self.polish_starts = polish_starts  # distinct roundings refined by local search
+        self.polish_steps = polish_steps
+        self.seed = seed
+        self.min_changes = min_changes  # smaller plans go to the exact search
+
+        valid = self.search.option_positions >= 0
+        self.valid_flat = torch.from_numpy(np.flatnonzero(valid.ravel()))
+        self.valid_positions = torch.from_numpy(self.search.option_positions[valid])
+        self.forced_zero_positions = torch.tensor(self.analyzer.forced_zero_positions, dtype=torch.long)
+
+    # ----- public queries -------------------------------------------------
+
+    def best_plan_with_k_changes(self, user_data: List[int], max_changes: int,
+                                 locked_features: Optional[List[str]] = None,
+                                 objective: Union[str, Dict[str, float], None] = None) -> Dict[str, Any]:
+        """Relaxed search for the lowest risk using at most max_changes changed answers"""
+        start = time.perf_counter()
+        spec = self.analyzer.resolve_objective(objective)
+        context = self.search._make_context(user_data, self._risk_fn(spec), locked_features=locked_features)
+        result, solver = self._solve(context, max_changes, spec, start)
+        return self.search._format_result(context, result, start, mode='best_k', maxChanges=max_changes,
+                                          solver=solver, objective=spec['name'])
+
+    def best_plan_within_budget(self, user_data: List[int], budget: float,
+                                change_costs: Optional[Dict[str, Union[float, List[float]]]] = None,
+                                locked_features: Optional[List[str]] = None,
+                                objective: Union[str, Dict[str, float], None] = None) -> Dict[str, Any]:
+        """Relaxed search for the lowest risk whose changes cost at most the budget"""
+        if budget < 0:
+            raise ValueError("budget must be non-negative")
+
+        start = time.perf_counter()
+        spec = self.analyzer.resolve_objective(objective)
+        context = self.search._make_context(user_data, self._risk_fn(spec), change_costs=change_costs,
+                                            locked_features=locked_features)
+        result, solver = self._solve(context, budget, spec, start)
+        return self.search._format_result(context, result, start, mode='budget', budget=budget,
+                                          solver=solver, objective=spec['name'])
+
+    # ----- optimization ---------------------------------------------------
+
+    def _solve(self, context: Dict[str, Any], budget: float, spec: Dict[str, Any],
+               start: float) -> Tuple[Dict[str, Any], str]:
+        """Exact search below min_changes affordable changes, the relaxation above it"""
+        if self._affordable_changes(context, budget) < self.min_changes:
+            return self.search._best_plan(context, budget, start), 'exact'
+        return self._optimize(context, budget, spec), 'relaxed'
+
+    @staticmethod
+    def _affordable_changes(context: Dict[str, Any], budget: float) -> int:
+        """Most answers a plan can change within the budget, taking the cheapest changes first"""
+        cheapest = np.sort(context['min_change_cost'][np.isfinite(context['min_change_cost'])])
+        return int(np.searchsorted(np.cumsum(cheapest), budget, side='right'))
+
+    def _risk_fn(self, spec: Dict[str, Any]):
+        """Exact numpy risk for a resolved objective"""
+        return lambda probs: self.analyzer.objective_risk(probs, spec)
+
+    def _soft_risk(self, probs: torch.Tensor, sharpness: float, spec: Dict[str, Any]) -> torch.Tensor:
+        """Differentiable objective; the combined score's threshold count becomes a sigmoid of the given sharpness"""
+        if spec['weights'] is not None:
+            weights = probs.new_tensor([spec['weights'][risk_type] for risk_type in RISK_TYPES])
+            return probs @ weights
+        exceed = torch.sigmoid((probs - self.analyzer.threshold) * sharpness)
+        return 0.5 * probs.mean(dim=1) + 0.5 * exceed.mean(dim=1)
+
+    def _relaxed_input(self, weights: torch.Tensor) -> torch.Tensor:
+        """Scatter per-feature option weights [R, F, M] into model inputs [R, columns].
+
+        Forced-zero columns are cleared as /predict clears them: weight on such an
+        option keeps its share of the softmax but reaches the model as nothing.
+        """
+        flat = weights.reshape(weights.shape[0], -1)[:, self.valid_flat]
+        relaxed = flat.new_zeros(weights.shape[0], self.search.n_columns).index_copy(1, self.valid_positions, flat)
+        return relaxed.index_fill(1, self.forced_zero_positions, 0.0)
+
+    def _optimize(self, context: Dict[str, Any], budget: float, spec: Dict[str, Any]) -> Dict[str, Any]:
+        """Optimize all restarts in one batch, then round, repair and verify them exactly"""
+        current = context['current']
+        allowed = torch.from_numpy(context['allowed'])
+        costs = torch.from_numpy(np.where(context['allowed'], context['costs'], 0.0)).float()
+        n_features, n_max = allowed.shape
+
+        generator = torch.Generator().manual_seed(self.seed)
+        logits = torch.randn(self.restarts, n_features, n_max, generator=generator) * self.init_scale
+        # The first restart starts at the current answers; the rest explore
+        logits[0] = 0.0
+        logits[0, torch.arange(n_features), torch.from_numpy(current)] = 3.0
+        logits.requires_grad_(True)
+        optimizer = torch.optim.Adam([logits], lr=self.learning_rate)
+
+        snapshot_steps = set(np.linspace(self.steps // 2, self.steps - 1, self.snapshots).astype(int).tolist())
+        rounded, confidence = [], []
+        for step in range(self.steps):
+            progress = step / max(1, self.steps - 1)
+            temperature = 1.0 * (0.05 ** progress)   # 1.0 -> 0.05
+            sharpness = 10.0 * (20.0 ** progress)    # 10 -> 200
+
+            weights = torch.softmax(logits.masked_fill(~allowed, -1e9) / temperature, dim=2)
+            probs = self.analyzer.prob_model(self._relaxed_input(weights))
+            expected_cost = (weights * costs).sum(dim=(1, 2))
+            loss = self._soft_risk(probs, sharpness, spec) + self.penalty * torch.relu(expected_cost - budget)
+
+            # Differentiate with respect to the logits only: backward() would also accumulate
+            # into the shared model's parameter grads, racing SHAP explanations in other threads
+            logits.grad, = torch.autograd.grad(loss.sum(), [logits])
+            optimizer.step()
+
+            if step in snapshot_steps:
+                snapshot = weights.detach()
+                rounded.append(snapshot.argmax(dim=2).numpy())
+                confidence.append(snapshot.max(dim=2).values.numpy())
+
+        candidates = np.vstack([
+            self._repair(context, assignment, conf, budget)
+            for assignments, confs in zip(rounded, confidence)
+            for assignment, conf in zip(assignments, confs)
+        ])
+        candidates = np.unique(np.vstack([current[None, :], candidates]), axis=0)
+
+        probs, risks = self.search._score_assignments(candidates, context['risk_fn'])
+        rows_scored = len(candidates)
+
+        # Polish the best few distinct roundings with a batched local search
+        best = {'risk': np.inf}
+        for i in np.argsort(risks)[:self.polish_starts]:
+            polished = self._polish(context, candidates[i], float(risks[i]), probs[i], budget)
+            rows_scored += polished['rowsScored']
+            if polished['risk'] < best['risk']:
+                best = polished
+
+        return {
+            'assignment': best['assignment'],
+            'risk': best['risk'],
+            'probs': best['probs'],
+            'optimal': False,
+            'nodesExpanded': 0,
+            'rowsScored': rows_scored + self.restarts * self.steps
+        }
+
+    def _polish(self, context: Dict[str, Any], assignment: np.ndarray, risk: float, probs: np.ndarray,
+                budget: float) -> Dict[str, Any]:
+        """Best-improvement local search over single-answer moves and swaps, one batch per step.
+
+        Moves set any movable answer to another allowed option (including back to the
+        current answer); swaps revert one changed answer while changing another. Only
+        neighbours within the budget are scored.
+        """
+        current = context['current']
+        costs = np.where(context['allowed'], context['costs'], np.inf)
+        rows_scored = 0
+        for _ in range(self.polish_steps):
+            changed = np.flatnonzero(assignment != current)
+            bases = [assignment] + [self._with(assignment, f, current[f]) for f in changed]
+            neighbours = []
+            for base in bases:
+                spent = costs[np.arange(len(current)), base].sum()
+                for f in context['order']:
+                    for option in np.flatnonzero(context['allowed'][f]):
+                        if option != base[f] and spent - costs[f, base[f]] + costs[f, option] <= budget + 1e-9:
+                            neighbours.append(self._with(base, f, option))
+            neighbours += bases[1:]
+            if not neighbours:
+                break
+
+            neighbours = np.unique(np.array(neighbours), axis=0)
+            n_probs, n_risks = self.search._score_assignments(neighbours, context['risk_fn'])
+            rows_scored += len(neighbours)
+            i = int(np.argmin(n_risks))
+            if n_risks[i] >= risk - 1e-12:
+                break
+            assignment, risk, probs = neighbours[i], float(n_risks[i]), n_probs[i]
+
+        return {'assignment': assignment, 'risk': risk, 'probs': probs, 'rowsScored': rows_scored}
+
+    @staticmethod
+    def _with(assignment: np.ndarray, feature: int, option: int) -> np.ndarray:
+        """Copy of an assignment with one answer replaced"""
+        changed = assignment.copy()
+        changed[feature] = option
+        return changed
+
+    @staticmethod
+    def _repair(context: Dict[str, Any], assignment: np.ndarray, confidence: np.ndarray, budget: float) -> np.ndarray:
+        """Keep the most confident changes that fit the budget; revert the rest"""
+        current = context['current']
+        repaired = current.copy()
+        spent = 0.0
+        for f in np.argsort(-confidence):
+            if assignment[f] == current[f]:
+                continue
+            cost = context['costs'][f, assignment[f]]
+            if spent + cost <= budget + 1e-9:
+                repaired[f] = assignment[f]
+                spent += cost
+        return repaired
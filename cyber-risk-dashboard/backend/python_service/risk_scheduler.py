@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Scheduler Module
+Admission control and priority scheduling for cheap and expensive endpoints
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+import logging
+import numpy as np
+
+from risk_metrics import QUEUE_WAIT_SECONDS
+from risk_tracing import span
+
+logger = logging.getLogger(__name__)
+
+class SchedulerOverloadedError(Exception):
+    """Raised when a request is shed because its lane's queue is full or it waited too long"""
+
+    def __init__(self, lane: str, reason: str, retry_after: int):
+        super().__init__(f"Lane '{lane}' is overloaded: {reason}")
+        self.lane = lane
+        self.retry_after = retry_after
+
+class SchedulerLane:
+    """Concurrency limit, bounded FIFO queue and timing samples for one priority class"""
+
+    def __init__(self, name: str, priority: int, max_concurrency: int, max_queue: int,
+                 max_wait: Optional[float] = None, samples: int = 1024):
+        self.name = name
+        self.priority = priority  # lower runs first when slots free up
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.running = 0
+        self.waiters: "deque[asyncio.Future]" = deque()
+        self.queue_waits: "deque[float]" = deque(maxlen=samples)
+        self.service_times: "deque[float]" = deque(maxlen=samples)
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._wait_metric = QUEUE_WAIT_SECONDS.labels(name)
+
+    def record_wait(self, seconds: float) -> None:
+        self.queue_waits.append(seconds)
+        self._wait_metric.observe(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = np.array(self.queue_waits) * 1000 if self.queue_waits else np.zeros(1)
+        service = np.array(self.service_times) * 1000 if self.service_times else np.zeros(1)
+        return {
+            "priority": self.priority,
+            "maxConcurrency": self.max_concurrency,
+            "maxQueue": self.max_queue,
+            "running": self.running,
+            "queued": len(self.waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timedOut": self.timed_out,
+            "queueWaitMs": {
+                "p50": float(np.percentile(waits, 50)),
+                "p95": float(np.percentile(waits, 95)),
+                "p99": float(np.percentile(waits, 99)),
+                "max": float(waits.max())
+            },
+            "serviceMs": {
+                "p50": float(np.percentile(service, 50)),
+                "p99": float(np.percentile(service, 99))
+            }
+        }
+
+class PriorityScheduler:
+    """Admits work into named lanes under per-lane and total concurrency limits.
+
+    A request takes a slot immediately when its lane and the shared pool both have
+    room and nobody of equal or higher priority is queued; otherwise it waits in its
+    lane's bounded FIFO queue. Whenever a slot frees up, queued requests are granted
+    in priority order, so heavy analyses never delay an interactive prediction for
+    longer than one slot release. A full queue, or a wait beyond the lane's max_wait,
+    sheds the request with SchedulerOverloadedError carrying a Retry-After estimate.
+    All bookkeeping runs on the event loop, so no locks are needed.
+    """
+
+    def __init__(self, lanes: List[SchedulerLane], total_concurrency: int):
+        self.lanes = {lane.name: lane for lane in lanes}
+        self.by_priority = sorted(lanes, key=lambda lane: lane.priority)
+        self.total_concurrency = total_concurrency
+        self.running = 0
+
+    @asynccontextmanager
+    async def slot(self, lane_name: str):
+        """Hold one slot of the lane for the duration of the block"""
+        with span("queue_wait", lane=lane_name):
+            lane = await self.acquire(lane_name)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            lane.service_times.append(time.monotonic() - start)
+            self.release(lane)
+
+    async def acquire(self, lane_name: str) -> SchedulerLane:
+        """Wait for a slot in the lane; raises SchedulerOverloadedError when shed"""
+        lane = self.lanes[lane_name]
+        enqueued = time.monotonic()
+        if self._can_start(lane) and not self._queued_ahead(lane):
+            self._start(lane, enqueued)
+            return lane
+
+        if len(lane.waiters) >= lane.max_queue:
+            lane.rejected += 1
+            raise SchedulerOverloadedError(lane.name, "queue is full", self._retry_after(lane))
+
+        waiter = asyncio.get_running_loop().create_future()
+        lane.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=lane.max_wait)
+        except asyncio.TimeoutError:
+            if self._abandon(lane, waiter, keep_granted=True):
+                lane.timed_out += 1
+                raise SchedulerOverloadedError(lane.name, f"queued longer than {lane.max_wait:g}s",
+                                               self._retry_after(lane))
+        except BaseException:
+            # Cancelled while queued: give back a slot that was granted in the meantime
+            self._abandon(lane, waiter, keep_granted=False)
+            raise
+        lane.record_wait(time.monotonic() - enqueued)
+        return lane
+
+    def release(self, lane: SchedulerLane) -> None:
+        """Return a slot and hand freed capacity to queued requests, highest priority first"""
+        lane.running -= 1
+        self.running -= 1
+        self._dispatch()
+
+    def _abandon(self, lane: SchedulerLane, waiter: "asyncio.Future", keep_granted: bool) -> bool:
+        """Drop a waiter; returns False if it was granted a slot just before leaving and keeps it"""
+        if waiter.done():
+            # Granted in the same tick the wait ended
+            if keep_granted:
+                return False
+            self.release(lane)
+            return True
+        waiter.cancel()
+        lane.waiters.remove(waiter)
+        return True
+
+    def _can_start(self, lane: SchedulerLane) -> bool:
+        return lane.running < lane.max_concurrency and self.running < self.total_concurrency
+
+    def _queued_ahead(self, lane: SchedulerLane) -> bool:
+        return any(other.waiters for other in self.by_priority if other.priority <= lane.priority)
+
+    def _start(self, lane: SchedulerLane, enqueued: float) -> None:
+        lane.running += 1
+        self.running += 1
+        lane.admitted += 1
+        if enqueued is not None:
+            lane.record_wait(time.monotonic() - enqueued)
+
+    def _dispatch(self) -> None:
+        for lane in self.by_priority:
+            while lane.waiters and self._can_start(lane):
+                waiter = lane.waiters.popleft()
+                if waiter.done():
+                    continue
+                self._start(lane, None)
+                waiter.set_result(True)
+            if self.running >= self.total_concurrency:
+                return
+
+    def _retry_after(self, lane: SchedulerLane) -> int:
+        """Seconds until the current queue should have drained, from recent service times"""
+        service = float(np.mean(lane.service_times)) if lane.service_times else 1.0
+        return int(min(60, max(1, math.ceil((len(lane.waiters) + 1) * service / lane.max_concurrency))))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "totalConcurrency": self.total_concurrency,
+            "running": self.running,
+            "lanes": {lane.name: lane.stats() for lane in self.by_priority}
+        }
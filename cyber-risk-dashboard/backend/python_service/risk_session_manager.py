@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Session Manager Module
+Server-side questionnaire sessions with incremental re-scoring for live WebSocket editing
+"""
+
+import time
+import uuid
+import numpy as np
+import torch
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SessionCapacityError(Exception):
+    """Raised when the worker cannot hold another questionnaire session"""
+    pass
+
+class IncrementalScorer:
+    """Re-scores one answer change by re-running only the affected expert.
+
+    Each expert of the Mixture-of-Experts sees only its own feature group and the
+    gating logits are linear in the one-hot input, so a change moves the gating logits
+    by two weight columns and invalidates a single expert output. Models with another
+    structure fall back to a full forward pass.
+    """
+
+    def __init__(self, analyzer, refresh_every: int = 64):
+        self.analyzer = analyzer
+        self.model = analyzer.model
+        self.refresh_every = refresh_every  # full recompute interval, bounds float drift in the gating logits
+
+        gating_net = getattr(getattr(self.model, 'gating', None), 'net', None)
+        self.enabled = all(hasattr(self.model, attr) for attr in ('group_names', 'group_info', 'experts')) \
+            and isinstance(gating_net, torch.nn.Linear)
+        if not self.enabled:
+            logger.warning("Model structure not recognised; session updates will use full forward passes")
+            return
+
+        self.group_names = list(self.model.group_names)
+        self.group_columns = [np.array([int(c) for c in self.model.group_info[g]]) for g in self.group_names]
+        self.column_group = {}
+        for g, cols in enumerate(self.group_columns):
+            for c in cols:
+                self.column_group[int(c)] = g
+        self.gating_weight = gating_net.weight.detach().numpy().astype(np.float64)  # [G, columns]
+        self.gating_bias = gating_net.bias.detach().numpy().astype(np.float64)
+
+    def full_state(self, encoded: np.ndarray) -> Dict[str, Any]:
+        """Expert outputs and gating logits for a complete encoded answer vector"""
+        if not self.enabled:
+            return {'updates': 0}
+        x = torch.from_numpy(encoded[None, :].astype(np.float32))
+        with torch.no_grad():
+            expert_outputs = np.stack([
+                self.model.experts[g](x[:, cols]).numpy()[0]
+                for g, cols in zip(self.group_names, self.group_columns)
+            ]).astype(np.float64)
+        return {
+            'expert_outputs': expert_outputs,                               # [G, 5]
+            'gating_logits': self.gating_bias + self.gating_weight @ encoded,  # [G]
+            'updates': 0
+        }
+
+    def apply_change(self, state: Dict[str, Any], encoded: np.ndarray, old_column: int, new_column: int) -> Dict[str, Any]:
+        """Update a cached state after one answer moved from old_column to new_column (encoded already updated)"""
+        if not self.enabled or state['updates'] + 1 >= self.refresh_every:
+            return self.full_state(encoded)
+        state['gating_logits'] = state['gating_logits'] + self.gating_weight[:, new_column] - self.gating_weight[:, old_column]
+        g = self.column_group[new_column]
+        x = torch.from_numpy(encoded[self.group_columns[g]][None, :].astype(np.float32))
+        with torch.no_grad():
+            state['expert_outputs'][g] = self.model.experts[self.group_names[g]](x).numpy()[0]
+        state['updates'] += 1
+        return state
+
+    def probabilities(self, state: Dict[str, Any], encoded: np.ndarray) -> np.ndarray:
+        """Risk probabilities [5] from a cached state"""
+        if not self.enabled:
+            return self.analyzer.score_encoded(encoded)[0]
+        z = state['gating_logits'] - state['gating_logits'].max()
+        weights = np.exp(z) / np.exp(z).sum()
+        logits = weights @ state['expert_outputs']
+        return 1.0 / (1.0 + np.exp(-logits))
+
+class QuestionnaireSession:
+    """Answers and cached model state for one live questionnaire"""
+
+    __slots__ = ("session_id", "answers", "distributions", "encoded", "score_state",
+                 "recommendations", "version", "created", "last_active", "connection")
+
+    def __init__(self, session_id: str, n_features: int, n_columns: int):
+        self.session_id = session_id
+        self.answers: List[Optional[int]] = [None] * n_features
+        self.distributions: Dict[str, List[float]] = {}
+        self.encoded = np.zeros(n_columns, dtype=np.float32)
+        self.score_state: Optional[Dict[str, Any]] = None
+        self.recommendations = 0  # top-N recommendations pushed after each change
+        self.version = 0
+        self.created = time.monotonic()
+        self.last_active = self.created
+        self.connection = None  # the WebSocket currently attached, if any
+
+    def is_complete(self) -> bool:
+        return not self.distributions and all(value is not None for value in self.answers)
+
+class QuestionnaireSessionManager:
+    """Holds questionnaire sessions for one worker with idle eviction and bounded size.
+
+    Session state is fixed-size (answers, one encoded row and the cached expert
+    outputs), inbound messages are capped at max_message_bytes, and distributions
+    are limited to one probability per option, so a session's memory cannot grow
+    with client input. Sessions survive reconnects until they have been idle for
+    idle_timeout seconds.
+    """
+
+    def __init__(self, analyzer, marginalizer=None, max_sessions: int = 2000, idle_timeout: float = 900.0,
+                 max_message_bytes: int = 4096, max_recommendations: int = 10):
+        self.analyzer = analyzer
+        self.marginalizer = marginalizer
+        self.scorer = IncrementalScorer(analyzer)
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_message_bytes = max_message_bytes
+        self.max_recommendations = max_recommendations
+
+        self.features = list(analyzer.feature_cols)
+        self.feature_index = {feature: f for f, feature in enumerate(self.features)}
+        self.n_columns = len(analyzer.encoded_columns)
+        self._sessions: "OrderedDict[str, QuestionnaireSession]" = OrderedDict()
+        self._evicted = 0
+        self._updates = 0
+        self._incremental_updates = 0
+
+    # ----- lifecycle ------------------------------------------------------
+
+    def open(self, session_id: Optional[str] = None) -> Tuple[QuestionnaireSession, bool]:
+        """Resume a session by id or create a new one; returns (session, resumed)"""
+        if session_id and len(session_id) > 128:
+            raise ValueError("session_id must be at most 128 characters")
+        if session_id and session_id in self._sessions:
+            session = self._sessions[session_id]
+            self.touch(session)
+            return session, True
+
+        if len(self._sessions) >= self.max_sessions:
+            self.evict_idle()
+            if len(self._sessions) >= self.max_sessions:
+                raise SessionCapacityError(f"Questionnaire session limit reached ({self.max_sessions})")
+
+        session = QuestionnaireSession(session_id or uuid.uuid4().hex, len(self.features), self.n_columns)
+        self._sessions[session.session_id] = session
+        logger.debug(f"Questionnaire session {session.session_id} opened ({len(self._sessions)} active)")
+        return session, False
+
+    def touch(self, session: QuestionnaireSession) -> None:
+        """Mark a session active, re-admitting it if it was evicted while still connected"""
+        session.last_active = time.monotonic()
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+
+    def close(self, session_id: str) -> None:
+        """Drop a session and its cached state"""
+        self._sessions.pop(session_id, None)
+
+    def evict_idle(self) -> List[QuestionnaireSession]:
+        """Remove sessions idle for longer than idle_timeout; returns the evicted sessions"""
+        cutoff = time.monotonic() - self.idle_timeout
+        evicted = []
+        # Sessions are kept in last-active order, so the stale ones are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_active > cutoff:
+                break
+            self._sessions.popitem(last=False)
+            evicted.append(session)
+        self._evicted += len(evicted)
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} idle questionnaire sessions ({len(self._sessions)} active)")
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        """Return session counters for diagnostics"""
+        per_session = self.n_columns * 4 + len(self.features) * 8 + 2 * 5 * 8 * len(getattr(self.scorer, 'group_names', []))
+        return {
+            "sessions": len(self._sessions),
+            "connected": sum(1 for s in self._sessions.values() if s.connection is not None),
+            "maxSessions": self.max_sessions,
+            "evicted": self._evicted,
+            "updates": self._updates,
+            "incrementalUpdates": self._incremental_updates,
+            "approxStateBytesPerSession": per_session
+        }
+
+    def rebind(self, analyzer, marginalizer=None) -> None:
+        """Move every session onto a new model version (after a hot swap).
+
+        Answers are kept and re-encoded in the new model's column layout; an answer
+        that is no longer a valid option is cleared. Cached expert state belongs to
+        the old model, so it is dropped and rebuilt on the next score.
+        """
+        self.analyzer = analyzer
+        self.marginalizer = marginalizer
+        self.scorer = IncrementalScorer(analyzer)
+        self.features = list(analyzer.feature_cols)
+        self.feature_index = {feature: f for f, feature in enumerate(self.features)}
+        self.n_columns = len(analyzer.encoded_columns)
+        for session in self._sessions.values():
+            answers = list(session.answers[:len(self.features)])
+            answers += [None] * (len(self.features) - len(answers))
+            session.encoded = np.zeros(self.n_columns, dtype=np.float32)
+            for f, (feature, value) in enumerate(zip(self.features, answers)):
+                position = analyzer.column_positions.get(f"{feature}_{value}") if value is not None else None
+                if position is None:
+                    answers[f] = None
+                else:
+                    session.encoded[position] = 1.0
+            analyzer.mask_forced_columns(session.encoded)
+            session.answers = answers
+            session.distributions = {feature: distribution for feature, distribution in session.distributions.items()
+                                     if feature in self.feature_index}
+            session.score_state = None
+        logger.info(f"Rebound {len(self._sessions)} questionnaire sessions to the new model")
+
+    # ----- answer updates -------------------------------------------------
+
+    def set_answer(self, session: QuestionnaireSession, feature: str, value: Optional[int] = None,
+                   distribution: Optional[List[float]] = None) -> bool:
+        """Apply one field change; returns True when it could be scored incrementally"""
+        if feature not in self.feature_index:
+            raise ValueError(f"Unknown feature: {feature}")
+        if value is not None and not isinstance(value, int):
+            raise ValueError(f"Answer for feature {feature} must be an integer or null")
+        f = self.feature_index[feature]
+        block = self.analyzer.feature_blocks[feature]
+
+        if distribution is not None:
+            if len(distribution) > len(block) + 1:
+                raise ValueError(f"Too many option probabilities for feature {feature}")
+            session.distributions[feature] = [float(p) for p in distribution]
+        else:
+            session.distributions.pop(feature, None)
+
+        new_column = None
+        if value is not None:
+            new_column = self.analyzer.column_positions.get(f"{feature}_{value}")
+            if new_column is None:
+                raise ValueError(f"Answer {value} is not a valid option for feature {feature}")
+        old_column = next((pos for pos in block if session.encoded[pos] == 1.0), None)
+
+        was_complete = session.is_complete()
+        session.answers[f] = value
+        session.encoded[block] = 0.0
+        if new_column is not None:
+            session.encoded[new_column] = 1.0
+            self.analyzer.mask_forced_columns(session.encoded)
+        session.version += 1
+        self._updates += 1
+
+        if not session.is_complete():
+            session.score_state = None
+            return False
+        if (was_complete and session.score_state is not None and old_column is not None
+                and session.encoded[new_column] == 1.0):  # forced-zero answers are rescored in full
+            session.score_state = self.scorer.apply_change(session.score_state, session.encoded, old_column, new_column)
+            self._incremental_updates += 1
+            return self.scorer.enabled
+        session.score_state = self.scorer.full_state(session.encoded)
+        return False
+
+    def set_all_answers(self, session: QuestionnaireSession, user_data: List[Optional[int]]) -> None:
+        """Replace every answer at once (initial load or form reset)"""
+        if len(user_data) != len(self.features):
+            raise ValueError(f"Input data must have exactly {len(self.features)} answers")
+        for feature, value in zip(self.features, user_data):
+            if value is not None and f"{feature}_{value}" not in self.analyzer.column_positions:
+                raise ValueError(f"Answer {value} is not a valid option for feature {feature}")
+
+        session.answers = list(user_data)
+        session.distributions = {}
+        session.encoded[:] = 0.0
+        for feature, value in zip(self.features, user_data):
+            if value is not None:
+                session.encoded[self.analyzer.column_positions[f"{feature}_{value}"]] = 1.0
+        self.analyzer.mask_forced_columns(session.encoded)
+        session.version += 1
+        self._updates += 1
+        session.score_state = self.scorer.full_state(session.encoded) if session.is_complete() else None
+
+    # ----- scoring --------------------------------------------------------
+
+    def score(self, session: QuestionnaireSession) -> Dict[str, Any]:
+        """Current probabilities; partial or uncertain answers are marginalized"""
+        if session.is_complete():
+            if session.score_state is None:
+                session.score_state = self.scorer.full_state(session.encoded)  # dropped by a model swap
+            probs = self.scorer.probabilities(session.score_state, session.encoded)
+            return {
+                'probabilities': [float(p) for p in probs],
+                'combinedRisk': float(self.analyzer.combined_risk(probs)[0]),
+                'complete': True,
+                'uncertainty': None
+            }
+        if self.marginalizer is None:
+            raise ValueError("Answer marginalizer not available for incomplete questionnaires")
+        result = self.marginalizer.marginalize(session.answers, session.distributions)
+        probs = result.pop('probabilities')
+        return {
+            'probabilities': probs,
+            'combinedRisk': result['combinedRisk'],
+            'complete': False,
+            'uncertainty': result
+        }
+
+    def top_recommendations(self, session: QuestionnaireSession, limit: int) -> List[Dict[str, Any]]:
+        """Best single-answer changes by combined risk reduction (complete sessions only)"""
+        if not session.is_complete() or limit <= 0:
+            return []
+        matrix = self.analyzer.compute_sensitivity_matrix(session.answers)
+        candidates = []
+        for feature in matrix['features']:
+            current = feature['currentOptionIndex']
+            for index, deltas in enumerate(feature['deltas']):
+                if index != current and deltas[-1] < 0:
+                    candidates.append((deltas[-1], feature, index))
+        candidates.sort(key=lambda item: item[0])
+        return [
+            {
+                'featureGroup': feature['featureGroup'],
+                'featureName': feature['featureName'],
+                'currentOption': feature['options'][feature['currentOptionIndex']] if feature['currentOptionIndex'] is not None else None,
+                'recommendedOption': feature['options'][index],
+                'optionIndex': index,
+                'riskReduction': -delta
+            }
+            for delta, feature, index in candidates[:min(limit, self.max_recommendations)]
+        ]
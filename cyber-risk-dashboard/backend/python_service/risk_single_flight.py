@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Single Flight Module
+Collapses concurrent identical requests onto one shared computation
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import logging
+
+logger = logging.getLogger(__name__)
+
+class _Flight:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: "asyncio.Future"):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Shares one in-flight computation between all concurrent callers with the same key.
+
+    The first caller for a key starts the computation as a task; later callers with
+    the same key await that task instead of starting their own. Each caller awaits it
+    through asyncio.shield, so a caller that disconnects or is cancelled only stops
+    waiting. The shared task itself is cancelled once its last waiter has left. The
+    entry is dropped as soon as the task finishes, so this deduplicates concurrent
+    work only; finished results belong in a cache.
+    """
+
+    def __init__(self, name: str = "single-flight"):
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.executions = 0
+        self.shared = 0
+        self.cancelled = 0
+        self.failures = 0
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Await the shared result for key, starting func() if no identical call is in flight"""
+        flight = self._flights.get(key)
+        with self._lock:
+            self.requests += 1
+            if flight is None:
+                self.executions += 1
+            else:
+                self.shared += 1
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(func()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task, key=key: self._finished(key, task))
+        else:
+            logger.debug("%s: joined in-flight computation (%s waiting)", self.name, flight.waiters)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                logger.debug("%s: last waiter left, cancelling shared computation", self.name)
+                flight.task.cancel()
+
+    def _finished(self, key: Hashable, task: "asyncio.Future") -> None:
+        if self._flights.get(key) is not None and self._flights[key].task is task:
+            del self._flights[key]
+        with self._lock:
+            if task.cancelled():
+                self.cancelled += 1
+            elif task.exception() is not None:
+                self.failures += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "inFlight": len(self._flights),
+                "requests": self.requests,
+                "executions": self.executions,
+                "shared": self.shared,
+                "dedupRatio": self.shared / self.requests if self.requests else 0.0,
+                "cancelled": self.cancelled,
+                "failures": self.failures
+            }
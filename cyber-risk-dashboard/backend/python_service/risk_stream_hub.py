@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Stream Hub Module
+Fans out freshly produced risk predictions to Server-Sent Event subscribers
+"""
+
+import asyncio
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class StreamSubscriber:
+    """A single SSE connection listening on one channel"""
+
+    __slots__ = ("channel", "queue", "dropped")
+
+    def __init__(self, channel: str, queue_size: int):
+        self.channel = channel
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, payload: str) -> bool:
+        """Enqueue a payload, dropping the oldest pending one when the queue is full"""
+        if self.queue.full():
+            # Slow consumer: only the most recent prediction matters, so keep the newest
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            self.dropped += 1
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+class StreamCapacityError(Exception):
+    """Raised when the hub cannot accept another subscriber"""
+    pass
+
+class RiskStreamHub:
+    """Broadcast hub keyed by session/project channel with bounded per-subscriber queues.
+
+    Subscribers block on their own queue, so idle connections cost no CPU; publishing
+    serializes the payload once per channel and never waits on slow consumers.
+    All methods must be called from the event loop thread.
+    """
+
+    def __init__(self, queue_size: int = 4, max_subscribers: int = 10000, max_cached_channels: int = 4096):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.max_cached_channels = max_cached_channels
+        self._channels: Dict[str, set] = {}
+        self._last_payloads: "OrderedDict[str, str]" = OrderedDict()
+        self._subscriber_count = 0
+        self._published = 0
+        self._delivered = 0
+
+    def check_capacity(self) -> None:
+        """Raise StreamCapacityError if another subscriber would exceed the limit"""
+        if self._subscriber_count >= self.max_subscribers:
+            raise StreamCapacityError(f"Stream subscriber limit reached ({self.max_subscribers})")
+
+    def subscribe(self, channel: str) -> StreamSubscriber:
+        """Register a new subscriber and replay the channel's latest payload, if any"""
+        self.check_capacity()
+
+        subscriber = StreamSubscriber(channel, self.queue_size)
+        self._channels.setdefault(channel, set()).add(subscriber)
+        self._subscriber_count += 1
+
+        last_payload = self._last_payloads.get(channel)
+        if last_payload is not None:
+            subscriber.offer(last_payload)
+
+        logger.debug(f"Stream subscriber added to channel '{channel}' ({self._subscriber_count} total)")
+        return subscriber
+
+    def unsubscribe(self, subscriber: StreamSubscriber) -> None:
+        """Remove a subscriber; safe to call more than once"""
+        subscribers = self._channels.get(subscriber.channel)
+        if not subscribers or subscriber not in subscribers:
+            return
+
+        subscribers.discard(subscriber)
+        self._subscriber_count -= 1
+        if not subscribers:
+            del self._channels[subscriber.channel]
+
+        if subscriber.dropped:
+            logger.debug(f"Stream subscriber on '{subscriber.channel}' dropped {subscriber.dropped} stale events")
+
+    def publish(self, channel: str, data: Any) -> int:
+        """Push a new payload to every subscriber of a channel; returns the number reached"""
+        payload = data if isinstance(data, str) else json.dumps(data)
+
+        # Remember the latest payload so late subscribers start from current state
+        self._last_payloads[channel] = payload
+        self._last_payloads.move_to_end(channel)
+        while len(self._last_payloads) > self.max_cached_channels:
+            self._last_payloads.popitem(last=False)
+
+        self._published += 1
+        delivered = 0
+        for subscriber in self._channels.get(channel, ()):
+            if subscriber.offer(payload):
+                delivered += 1
+        self._delivered += delivered
+        return delivered
+
+    async def events(self, channel: str):
+        """Subscribe to a channel and yield its SSE events until the connection goes away.
+
+        The subscription lives inside the generator, so a response that is never
+        started (client gone before streaming began) never registers a subscriber.
+        """
+        subscriber = self.subscribe(channel)
+        try:
+            while True:
+                payload = await subscriber.queue.get()
+                yield {
+                    "event": "message",
+                    "data": payload
+                }
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hub counters for diagnostics"""
+        return {
+            "channels": len(self._channels),
+            "subscribers": self._subscriber_count,
+            "published": self._published,
+            "delivered": self._delivered
+        }
+
+def resolve_stream_channel(session_id: Optional[str] = None, project_id: Optional[str] = None) -> Optional[str]:
+    """Build the hub channel key from a session or project identifier"""
+    if session_id:
+        return f"session:{session_id}"
+    if project_id:
+        return f"project:{project_id}"
+    return None
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Risk Tracing Module
+Opt-in per-request span trees with Server-Timing output and trace-ID propagation
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = b"x-trace"  # "1" or "true" opts a request in
+TRACE_ID_HEADER = b"x-trace-id"  # propagated from the caller (the Node backend), generated if absent
+TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+_active_span: ContextVar[Optional["Span"]] = ContextVar("risk_active_span", default=None)
+_trace_id: ContextVar[Optional[str]] = ContextVar("risk_trace_id", default=None)
+
+def current_trace_id() -> Optional[str]:
+    """Trace ID of the request being served, if the caller sent or opted into one"""
+    return _trace_id.get()
+
+class Span:
+    """One timed stage of a traced request; entering it makes it the parent of nested spans.
+
+    A span must be exited in the thread and context it was entered in, so code that
+    yields (generators advanced from the threadpool) closes its spans before yielding.
+    """
+
+    __slots__ = ("name", "attrs", "start", "end", "children", "_token")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: List["Span"] = []
+        self._token = None
+
+    def __enter__(self) -> "Span":
+        parent = _active_span.get()
+        if parent is not None:
+            parent.children.append(self)
+        self._token = _active_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _active_span.reset(self._token)
+        return False
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end if self.end is not None else time.perf_counter()) - self.start) * 1000
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "startMs": round((self.start - origin) * 1000, 3),
+            "durationMs": round(self.duration_ms, 3),
+            **({"attrs": self.attrs} if self.attrs else {}),
+            **({"children": [child.to_dict(origin) for child in list(self.children)]} if self.children else {})
+        }
+
+class _NullSpan:
+    """Shared stand-in returned when the request is not traced; entering it does nothing"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+NULL_SPAN = _NullSpan()
+
+def span(name: str, **attrs):
+    """A child span of the active trace, or the shared no-op span when the request is not traced"""
+    if _active_span.get() is None:
+        return NULL_SPAN
+    return Span(name, attrs)
+
+def record_span(name: str, started: float, ended: float, **attrs) -> None:
+    """Attach an already timed leaf stage (perf_counter start and end) to the active trace, if any"""
+    parent = _active_span.get()
+    if parent is not None:
+        leaf = Span(name, attrs)
+        leaf.start, leaf.end = started, ended
+        parent.children.append(leaf)
+
+def server_timing(root: Span) -> str:
+    """Server-Timing header value: total time per stage name over the whole tree, plus the total"""
+    totals: "OrderedDict[str, List[float]]" = OrderedDict()
+    pending = list(root.children)
+    while pending:
+        node = pending.pop(0)
+        entry = totals.setdefault(node.name, [0.0, 0])
+        entry[0] += node.duration_ms
+        entry[1] += 1
+        pending.extend(node.children)
+    metrics = [f'{name};dur={duration:.3f};desc="{count}x"' for name, (duration, count) in totals.items()]
+    metrics.append(f"total;dur={root.duration_ms:.3f}")
+    return ", ".join(metrics)
+
+class TraceLog:
+    """Recent traces kept in memory for GET /traces/{id} and appended to a local JSONL file.
+
+    The file is rotated to a single ".1" backup past max_bytes, like the assessment log.
+    """
+
+    def __init__(self, path: Optional[str], keep: int = 200, max_bytes: int = 16 * 1024 * 1024):
+        self.path = path
+        self.keep = keep
+        self.max_bytes = max_bytes
+        self._recent: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def append(self, trace: Dict[str, Any]) -> None:
+        with self._lock:
+            self._recent[trace["traceId"]] = trace
+            while len(self._recent) > self.keep:
+                self._recent.popitem(last=False)
+            if not self.path:
+                return
+            try:
+                with open(self.path, "a", encoding="utf-8") as handle:
+                    handle.write(json.dumps(trace, default=str) + "\n")
+                    size = handle.tell()
+                if size > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+            except OSError as e:
+                logger.warning(f"Could not append to trace log {self.path}: {str(e)}")
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._recent.get(trace_id)
+
+class TraceMiddleware:
+    """ASGI middleware: traces the requests that opt in with the X-Trace header.
+
+    Every request's X-Trace-Id (when sent) is bound for the request so logs can carry
+    it; nothing else happens unless the request opted in. A traced request gets a root
+    span; when its response starts, the span tree goes to sink and the response
+    carries X-Trace-Id and a Server-Timing header summarising the stages.
+    """
+
+    def __init__(self, app, sink: Callable[[Dict[str, Any]], None]):
+        self.app = app
+        self.sink = sink
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        trace_id, opted_in = None, False
+        for key, value in scope["headers"]:
+            if key == TRACE_ID_HEADER:
+                candidate = value.decode("latin-1")
+                trace_id = candidate if TRACE_ID_PATTERN.match(candidate) else None
+            elif key == TRACE_HEADER:
+                opted_in = value.lower() in (b"1", b"true")
+        if not opted_in:
+            if trace_id is None:
+                return await self.app(scope, receive, send)
+            token = _trace_id.set(trace_id)
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                _trace_id.reset(token)
+
+        trace_id = trace_id or uuid.uuid4().hex
+        root = Span("request", {"method": scope["method"], "path": scope["path"]})
+        id_token = _trace_id.set(trace_id)
+        span_token = _active_span.set(root)
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start" and root.end is None:
+                root.end = time.perf_counter()
+                root.attrs["status"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", trace_id.encode("latin-1")))
+                headers.append((b"server-timing", server_timing(root).encode("latin-1")))
+                message = {**message, "headers": headers}
+                try:
+                    self.sink({"traceId": trace_id, "at": time.time(), **root.to_dict(root.start)})
+                except Exception as e:
+                    logger.warning(f"Could not record trace {trace_id}: {str(e)}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            _active_span.reset(span_token)
+            _trace_id.reset(id_token)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Shared fixtures: the service app, loaded once per session with its on-disk state in a temp directory
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+# Must be set before app is imported: it opens its stores at import time
+_STATE_DIR = tempfile.mkdtemp(prefix="risk-service-tests-")
+for _name, _file in [("RESULT_CACHE_PATH", "results.sqlite3"), ("JOB_STORE_PATH", "jobs.sqlite3"),
+                     ("ASSESSMENT_LOG_PATH", "assessments.jsonl"), ("TRACE_LOG_PATH", "traces.jsonl")]:
+    os.environ.setdefault(_name, os.path.join(_STATE_DIR, _file))
+
+@pytest.fixture(scope="session")
+def service():
+    import app
+    return app
+
+@pytest.fixture(scope="session")
+def client(service):
+    from fastapi.testclient import TestClient
+    with TestClient(service.app) as test_client:
+        yield test_client
+
+@pytest.fixture(scope="session")
+def bundle(client, service):
+    """The active model bundle, once startup has finished"""
+    return service.model_registry.active()
+
+@pytest.fixture(scope="session")
+def sample_rows(bundle):
+    """Answer vectors of the reference projects"""
+    return bundle.df.iloc[:, :16].astype(int).values.tolist()
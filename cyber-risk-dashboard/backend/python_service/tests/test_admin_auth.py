@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Profiling endpoints: off without ADMIN_TOKEN, and closed to requests without the matching X-Admin-Token
+"""
+
+import pytest
+
+PROFILING_ENDPOINTS = [
+    ("post", "/admin/profile/cpu"),
+    ("post", "/admin/profile/memory/start"),
+    ("post", "/admin/profile/memory/stop"),
+    ("get", "/admin/profile/memory/snapshot"),
+    ("post", "/admin/profile/model"),
+    ("get", "/admin/profile/stats")
+]
+
+def call(client, method, path, token=None):
+    headers = {"X-Admin-Token": token} if token is not None else {}
+    return getattr(client, method)(path, headers=headers)
+
+def test_every_profiling_route_requires_admin(service):
+    guarded = {
+        (method.lower(), route.path)
+        for route in service.app.routes if route.path.startswith("/admin/profile")
+        for method in route.methods
+        if any(dependency.call is service.require_admin for dependency in route.dependant.dependencies)
+    }
+    assert guarded == set(PROFILING_ENDPOINTS)
+
+@pytest.mark.parametrize("method,path", PROFILING_ENDPOINTS)
+def test_disabled_without_admin_token(client, service, monkeypatch, method, path):
+    monkeypatch.setattr(service, "ADMIN_TOKEN", None)
+    response = call(client, method, path, token="anything")
+    assert response.status_code == 403
+    assert "ADMIN_TOKEN" in response.json()["detail"]
+
+@pytest.mark.parametrize("method,path", PROFILING_ENDPOINTS)
+@pytest.mark.parametrize("token", [None, "", "wrong-token", "s3cret-token-"])
+def test_rejects_missing_or_wrong_token(client, service, monkeypatch, method, path, token):
+    monkeypatch.setattr(service, "ADMIN_TOKEN", "s3cret-token")
+    assert call(client, method, path, token=token).status_code == 401
+
+def test_accepts_the_admin_token(client, service, monkeypatch):
+    monkeypatch.setattr(service, "ADMIN_TOKEN", "s3cret-token")
+    response = call(client, "get", "/admin/profile/stats", token="s3cret-token")
+    assert response.status_code == 200, response.text
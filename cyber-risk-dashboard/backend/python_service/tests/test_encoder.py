@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+The fast one-hot encoder against the pandas preprocessing it replaces
+"""
+
+import numpy as np
+import torch
+
+def every_single_answer_change(analyzer, base_row):
+    """base_row with each question set to each of its options in turn"""
+    for f, feature in enumerate(analyzer.feature_cols):
+        for pos in analyzer.feature_blocks[feature]:
+            row = list(base_row)
+            row[f] = int(analyzer.encoded_columns[pos].rsplit('_', 1)[1])
+            yield feature, row
+
+def test_encoder_matches_preprocessing_for_every_option(bundle, sample_rows):
+    analyzer = bundle.analyzer
+    checked = 0
+    for feature, row in every_single_answer_change(analyzer, sample_rows[0]):
+        fast = analyzer.encode_user_data(row)
+        reference = analyzer.preprocess_user_data(row).values.astype(np.float32)[0]
+        assert np.array_equal(fast, reference), f"{feature}: {row}"
+        checked += 1
+    assert checked == len(analyzer.encoded_columns)
+
+def test_forced_zero_column_is_not_fed_to_the_model(service, bundle, sample_rows):
+    analyzer = bundle.analyzer
+    row = list(sample_rows[0])
+    row[analyzer.feature_cols.index("1.5")] = 4
+    encoded = analyzer.encode_user_data(row)
+    assert encoded[analyzer.column_positions["1.5_4"]] == 0.0
+    with torch.no_grad():
+        reference = torch.sigmoid(bundle.model(service.preprocess_input(row, bundle.df))).numpy()[0]
+    np.testing.assert_allclose(analyzer.score_encoded(encoded)[0], reference, atol=1e-6)
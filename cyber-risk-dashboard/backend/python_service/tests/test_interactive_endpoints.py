@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Interactive analysis endpoints run their sweeps in the threadpool and return what the analyzer computes
+"""
+
+import numpy as np
+import pytest
+
+def test_sensitivity_matches_the_analyzer(client, bundle, sample_rows):
+    user_data = sample_rows[2]
+    response = client.post("/sensitivity", json={"user_data": user_data})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    expected = bundle.analyzer.compute_sensitivity_matrix(user_data)
+    np.testing.assert_allclose(body["baseline"], expected["baseline"], atol=1e-6)
+    assert body["alternativesScored"] == expected["alternativesScored"]
+    assert body["modelVersion"] == bundle.version
+
+def test_single_and_batch_recommendations_agree(client, bundle, sample_rows):
+    user_data = sample_rows[2]
+    changes = [{"featureGroup": group, "recommendedOption": option}
+               for group, option in list(bundle.analyzer.option_positions)[:6]]
+    batch = client.post("/recommendation-risk-reduction/batch", json={"user_data": user_data, "changes": changes})
+    assert batch.status_code == 200, batch.text
+    results = batch.json()["results"]
+    assert len(results) == len(changes)
+
+    for change, result in zip(changes, results):
+        single = client.post("/recommendation-risk-reduction", json={
+            "user_data": user_data, "featureName": change["featureGroup"], "currentOption": "", **change
+        })
+        assert single.status_code == 200, single.text
+        assert abs(single.json()["riskReduction"] - result["riskReduction"]) < 1e-6
+
+def predicted_scores(client, bundle, user_data):
+    """The five /predict probabilities followed by their combined risk"""
+    response = client.post("/predict", json={"user_data": user_data})
+    assert response.status_code == 200, response.text
+    probabilities = np.array(response.json()["probabilities"])
+    return np.append(probabilities, bundle.analyzer.combined_risk(probabilities[None, :])[0])
+
+@pytest.mark.parametrize("project_phase", [1, 4])  # 4 selects the forced-zero column 1.5_4
+def test_sensitivity_deltas_match_predict_differences(client, bundle, sample_rows, project_phase):
+    analyzer = bundle.analyzer
+    user_data = list(sample_rows[2])
+    user_data[analyzer.feature_cols.index("1.5")] = project_phase
+    response = client.post("/sensitivity", json={"user_data": user_data})
+    assert response.status_code == 200, response.text
+    matrix = response.json()
+
+    baseline = predicted_scores(client, bundle, user_data)
+    np.testing.assert_allclose(matrix["baseline"], baseline, atol=1e-6)
+    checked_forced_option = False
+    for f, feature in enumerate(matrix["features"]):
+        block = analyzer.feature_blocks[feature["featureGroup"]]
+        assert feature["currentOptionIndex"] == block.index(
+            analyzer.column_positions[f"{feature['featureGroup']}_{user_data[f]}"])
+        for pos, deltas in zip(block, feature["deltas"]):
+            changed = list(user_data)
+            changed[f] = int(analyzer.encoded_columns[pos].rsplit("_", 1)[1])
+            expected = predicted_scores(client, bundle, changed) - baseline
+            np.testing.assert_allclose(deltas, expected, atol=1e-6, err_msg=analyzer.encoded_columns[pos])
+            checked_forced_option |= pos in analyzer.forced_zero_positions
+    assert checked_forced_option
+
+def test_batch_reductions_match_predict_differences(client, bundle, sample_rows):
+    analyzer = bundle.analyzer
+    user_data = list(sample_rows[2])
+    feature = analyzer.feature_cols.index("1.5")
+    changes, changed_rows = [], []
+    for pos in analyzer.feature_blocks["1.5"]:  # includes 1.5=4, whose column is forced to zero
+        column = analyzer.encoded_columns[pos]
+        changes.append({"featureGroup": "1.5", "recommendedOption": analyzer._get_option_label(column)})
+        changed = list(user_data)
+        changed[feature] = int(column.rsplit("_", 1)[1])
+        changed_rows.append(changed)
+    response = client.post("/recommendation-risk-reduction/batch", json={"user_data": user_data, "changes": changes})
+    assert response.status_code == 200, response.text
+
+    baseline = predicted_scores(client, bundle, user_data)[-1]
+    for changed, result in zip(changed_rows, response.json()["results"]):
+        expected = baseline - predicted_scores(client, bundle, changed)[-1]
+        assert abs(result["riskReduction"] - expected) < 1e-6, changed
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Job store: accepted jobs survive a worker crash and a restart, and are retried a bounded number of times
+"""
+
+import asyncio
+import time
+
+from risk_job_store import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JobStore, JobWorkerPool
+
+PARAMS = {"user_data": [1] * 16}
+
+def test_identical_submissions_share_a_job(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job, deduplicated = store.submit("mitigation-strategy", PARAMS, "v1")
+    again, deduplicated_again = store.submit("mitigation-strategy", PARAMS, "v1")
+    other, _ = store.submit("mitigation-strategy", PARAMS, "v2")
+    assert not deduplicated and deduplicated_again
+    assert again["jobId"] == job["jobId"] != other["jobId"]
+
+def test_expired_lease_is_requeued_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    crashed = JobStore(path, lease_seconds=0.05)
+    job, _ = crashed.submit("mitigation-strategy", PARAMS, "v1")
+    assert crashed.claim("dead-worker")["jobId"] == job["jobId"]
+    crashed.close()
+
+    time.sleep(0.1)
+    restarted = JobStore(path)
+    assert restarted.get(job["jobId"])["status"] == JOB_RUNNING
+    assert restarted.recover_expired() == [job["jobId"]]
+    assert restarted.get(job["jobId"])["status"] == JOB_QUEUED
+
+    claimed = restarted.claim("new-worker")
+    assert claimed["jobId"] == job["jobId"] and claimed["attempts"] == 2
+    assert claimed["params"] == PARAMS
+    assert not restarted.complete(job["jobId"], "dead-worker", {"late": True})
+    assert restarted.complete(job["jobId"], "new-worker", {"finalRisk": 0.25})
+    restarted.close()
+
+    reopened = JobStore(path)
+    finished = reopened.get(job["jobId"], with_result=True)
+    assert finished["status"] == JOB_SUCCEEDED and finished["result"] == {"finalRisk": 0.25}
+
+def test_job_fails_once_max_attempts_are_used_up(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.01, max_attempts=2)
+    job, _ = store.submit("mitigation-strategy", PARAMS, "v1")
+    for attempt in range(2):
+        store.claim(f"worker-{attempt}")
+        time.sleep(0.02)
+        store.recover_expired()
+    failed = store.get(job["jobId"])
+    assert failed["status"] == JOB_FAILED and "abandoned" in failed["error"]
+    assert store.claim("worker-2") is None
+
+def test_worker_pool_finishes_a_job_orphaned_before_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    crashed = JobStore(path, lease_seconds=0.05)
+    job, _ = crashed.submit("mitigation-strategy", PARAMS, "v1")
+    crashed.claim("dead-worker")
+    crashed.close()
+    time.sleep(0.1)
+
+    store = JobStore(path, lease_seconds=0.05)
+    updates = []
+
+    async def handler(params):
+        return {"rows": len(params["user_data"])}
+
+    async def scenario():
+        pool = JobWorkerPool(store, {"mitigation-strategy": handler}, workers=1, poll_interval=0.01,
+                             on_update=updates.append)
+        pool.start()
+        try:
+            for _ in range(200):
+                if store.get(job["jobId"])["status"] == JOB_SUCCEEDED:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await pool.stop()
+        return pool
+
+    pool = asyncio.run(scenario())
+    finished = store.get(job["jobId"], with_result=True)
+    assert finished["status"] == JOB_SUCCEEDED and finished["attempts"] == 2
+    assert finished["result"] == {"rows": 16}
+    assert pool.completed == 1 and job["jobId"] in updates
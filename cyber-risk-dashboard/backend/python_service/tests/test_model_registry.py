@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Model registry: leases pin a bundle across a swap, and a swapped-out bundle drains before it retires
+"""
+
+from risk_model_registry import ModelBundle, ModelRegistry
+
+def make_bundle(version):
+    return ModelBundle(version, f"models/{version}", None, None, None, None)
+
+def test_lease_pins_the_active_bundle():
+    registry = ModelRegistry()
+    v1 = make_bundle("v1")
+    registry.activate(v1)
+    with registry.lease() as bundle:
+        assert bundle is v1
+        assert v1.in_flight == 1
+    assert v1.in_flight == 0
+
+def test_swap_drains_a_leased_bundle_before_retiring_it():
+    swaps = []
+    registry = ModelRegistry(on_swap=lambda new, old: swaps.append((new.version, old and old.version)))
+    v1, v2 = make_bundle("v1"), make_bundle("v2")
+    registry.activate(v1)
+
+    with registry.lease() as leased:
+        assert registry.activate(v2) is v1
+        assert registry.active() is v2
+        assert leased is v1 and v1.in_flight == 1
+        assert [b["version"] for b in registry.stats()["draining"]] == ["v1"]
+        assert v1.retired_at is None
+        with registry.lease() as fresh:
+            assert fresh is v2
+
+    assert v1.in_flight == 0 and v1.retired_at is not None
+    assert registry.stats()["draining"] == []
+    assert v2.in_flight == 0 and v2.retired_at is None
+    assert swaps == [("v1", None), ("v2", "v1")]
+    assert [entry["event"] for entry in registry.history] == ["activated", "activated", "retired"]
+
+def test_idle_bundle_retires_on_swap():
+    registry = ModelRegistry()
+    v1 = make_bundle("v1")
+    registry.activate(v1)
+    registry.activate(make_bundle("v2"))
+    assert v1.retired_at is not None
+    assert registry.stats()["draining"] == []
+
+def test_lease_without_an_active_bundle_yields_none():
+    with ModelRegistry().lease() as bundle:
+        assert bundle is None
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Plan search scores candidates exactly as /predict encodes them, including the forced-zero 1.5_4 column
+"""
+
+import numpy as np
+import pytest
+
+def predicted_risk(client, bundle, user_data):
+    response = client.post("/predict", json={"user_data": user_data})
+    assert response.status_code == 200, response.text
+    return float(bundle.analyzer.combined_risk(np.array([response.json()["probabilities"]]))[0])
+
+def applied(bundle, user_data, plan):
+    """The answers after applying a plan's changes"""
+    analyzer = bundle.analyzer
+    changed = list(user_data)
+    for change in plan["changes"]:
+        pos = analyzer.feature_blocks[change["featureGroup"]][change["optionIndex"]]
+        changed[analyzer.feature_cols.index(change["featureGroup"])] = int(analyzer.encoded_columns[pos].rsplit("_", 1)[1])
+    return changed
+
+def phase_four(bundle, user_data):
+    """A project answering 1.5=4, whose one-hot column is forced to zero"""
+    user_data = list(user_data)
+    user_data[bundle.analyzer.feature_cols.index("1.5")] = 4
+    return user_data
+
+def test_zero_change_plan_keeps_the_predicted_risk(client, bundle, sample_rows):
+    user_data = phase_four(bundle, sample_rows[3])
+    response = client.post("/mitigation-plan/optimal", json={"user_data": user_data, "mode": "best_k", "max_changes": 0})
+    assert response.status_code == 200, response.text
+    plan = response.json()
+    risk = predicted_risk(client, bundle, user_data)
+    assert plan["numChanges"] == 0
+    assert plan["initialRisk"] == pytest.approx(risk, abs=1e-6)
+    assert plan["finalRisk"] == pytest.approx(risk, abs=1e-6)
+
+@pytest.mark.parametrize("solver,max_changes", [("exact", 3), ("relaxed", 6)])
+def test_plan_risk_matches_predict_for_its_answers(client, bundle, sample_rows, solver, max_changes):
+    user_data = phase_four(bundle, sample_rows[3])
+    response = client.post("/mitigation-plan/optimal", json={
+        "user_data": user_data, "mode": "best_k", "max_changes": max_changes, "solver": solver, "locked_features": []
+    })
+    assert response.status_code == 200, response.text
+    plan = response.json()
+    assert plan["solver"] == solver
+    assert plan["finalRisk"] == pytest.approx(predicted_risk(client, bundle, applied(bundle, user_data, plan)), abs=1e-6)
+    assert plan["finalRisk"] <= plan["initialRisk"] + 1e-9
+
+def test_exact_two_change_plan_is_optimal_with_forced_zero_answers(bundle, sample_rows):
+    analyzer = bundle.analyzer
+    user_data = phase_four(bundle, sample_rows[3])
+    baseline = analyzer.encode_user_data(user_data)
+    alternatives, changes = analyzer._single_change_vectors(baseline)
+    feature_of = np.array([feature for feature, _ in alternatives])
+    first, second = np.triu_indices(len(alternatives), k=1)
+    keep = feature_of[first] != feature_of[second]
+    rows = np.vstack([baseline[None, :], baseline + changes, baseline + changes[first[keep]] + changes[second[keep]]])
+    best = float(analyzer.combined_risk(analyzer.score_encoded_batched(rows)).min())
+
+    plan = bundle.plan_search.best_plan_with_k_changes(user_data, 2, locked_features=[])
+    assert plan["finalRisk"] <= best + bundle.plan_search.tolerance + 1e-9
+    assert plan["finalRisk"] >= best - 1e-6
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+/predict through the PredictionBatcher against the unbatched pandas path it replaced
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+def unbatched_probabilities(service, bundle, user_data):
+    """The original /predict computation: preprocess_input and one forward pass, no cache"""
+    with torch.no_grad():
+        return torch.sigmoid(bundle.model(service.preprocess_input(user_data, bundle.df))).squeeze().tolist()
+
+def test_batched_predict_matches_unbatched(client, service, bundle, sample_rows):
+    analyzer = bundle.analyzer
+    rows = []
+    for f, feature in enumerate(analyzer.feature_cols):
+        for pos in analyzer.feature_blocks[feature]:
+            row = list(sample_rows[1])
+            row[f] = int(analyzer.encoded_columns[pos].rsplit('_', 1)[1])
+            rows.append(row)
+    rows = [list(row) for row in dict.fromkeys(tuple(row) for row in rows)]
+    batched_rows = bundle.batcher.rows
+
+    # Concurrent requests so the batcher actually coalesces them
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        responses = list(pool.map(lambda row: client.post("/predict", json={"user_data": row}), rows))
+
+    assert bundle.batcher.rows > batched_rows
+    for row, response in zip(rows, responses):
+        assert response.status_code == 200, response.text
+        np.testing.assert_allclose(response.json()["probabilities"], unbatched_probabilities(service, bundle, row),
+                                   atol=1e-6, err_msg=str(row))
+
+def test_partial_predict_marginalizes_off_the_event_loop(client, sample_rows):
+    row = list(sample_rows[1])
+    row[0] = None
+    response = client.post("/predict", json={"user_data": row})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["uncertainty"]["expansions"] > 1
+    assert all(0.0 <= p <= 1.0 for p in body["probabilities"])
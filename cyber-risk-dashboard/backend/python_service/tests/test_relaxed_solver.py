@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+solver="relaxed" runs the gradient planner only for large plans; small ones use the exact search
+"""
+
+import numpy as np
+import torch
+
+def optimal_plan(client, user_data, **query):
+    response = client.post("/mitigation-plan/optimal", json={"user_data": user_data, "solver": "relaxed", **query})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_small_plans_use_the_exact_search(client, service, bundle, sample_rows):
+    small = service.RELAXED_SOLVER_MIN_CHANGES - 1
+    plan = optimal_plan(client, sample_rows[0], mode="best_k", max_changes=small)
+    assert plan["solver"] == "exact"
+    exact = bundle.plan_search.best_plan_with_k_changes(
+        sample_rows[0], small, locked_features=list(service.DEFAULT_LOCKED_FEATURES))
+    assert abs(plan["finalRisk"] - exact["finalRisk"]) < 1e-9
+
+    assert optimal_plan(client, sample_rows[0], mode="budget", budget=small)["solver"] == "exact"
+    # Cheap changes let a small budget afford a large plan
+    costs = {feature: 0.1 for feature in bundle.plan_search.features}
+    assert optimal_plan(client, sample_rows[0], mode="budget", budget=small, change_costs=costs)["solver"] == "relaxed"
+
+def test_large_plans_use_the_relaxation(client, service, sample_rows):
+    plan = optimal_plan(client, sample_rows[0], mode="best_k", max_changes=service.RELAXED_SOLVER_MIN_CHANGES)
+    assert plan["solver"] == "relaxed"
+    assert plan["numChanges"] <= service.RELAXED_SOLVER_MIN_CHANGES
+
+def test_relaxed_input_clears_forced_zero_columns(bundle):
+    planner = bundle.relaxed_planner
+    search = planner.search
+    weights = torch.rand(3, len(search.features), search.n_options.max(), requires_grad=True)
+    relaxed = planner._relaxed_input(weights)
+    forced = bundle.analyzer.forced_zero_positions
+    assert torch.all(relaxed[:, forced] == 0)
+
+    # A one-hot choice of every option reproduces the encoder, 1.5=4 included
+    feature = search.features.index("1.5")
+    for option in range(search.n_options[feature]):
+        one_hot = torch.zeros_like(weights[:1])
+        one_hot[0, np.arange(len(search.features)), 0] = 1.0
+        one_hot[0, feature] = 0.0
+        one_hot[0, feature, option] = 1.0
+        user_data = [int(bundle.analyzer.encoded_columns[search.option_positions[f, 0]].rsplit("_", 1)[1])
+                     for f in range(len(search.features))]
+        user_data[bundle.analyzer.feature_cols.index("1.5")] = int(
+            bundle.analyzer.encoded_columns[search.option_positions[feature, option]].rsplit("_", 1)[1])
+        np.testing.assert_array_equal(planner._relaxed_input(one_hot)[0].detach().numpy(),
+                                      bundle.analyzer.encode_user_data(user_data))
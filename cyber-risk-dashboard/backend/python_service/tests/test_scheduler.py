@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Scheduler admission: shed requests surface as 429 with a Retry-After estimate
+"""
+
+import asyncio
+
+import pytest
+
+from risk_scheduler import PriorityScheduler, SchedulerLane, SchedulerOverloadedError
+
+def make_scheduler(**lane):
+    return PriorityScheduler([SchedulerLane("analysis", priority=1, **lane)], total_concurrency=4)
+
+def test_full_queue_is_shed_with_retry_after():
+    scheduler = make_scheduler(max_concurrency=1, max_queue=1)
+
+    async def scenario():
+        await scheduler.acquire("analysis")
+        queued = asyncio.ensure_future(scheduler.acquire("analysis"))
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerOverloadedError) as shed:
+            await scheduler.acquire("analysis")
+        scheduler.release(scheduler.lanes["analysis"])
+        await queued
+        return shed.value
+
+    error = asyncio.run(scenario())
+    assert error.lane == "analysis" and error.retry_after >= 1
+    assert scheduler.lanes["analysis"].rejected == 1
+    assert scheduler.lanes["analysis"].admitted == 2
+
+def test_wait_beyond_max_wait_is_shed():
+    scheduler = make_scheduler(max_concurrency=1, max_queue=4, max_wait=0.05)
+
+    async def scenario():
+        await scheduler.acquire("analysis")
+        with pytest.raises(SchedulerOverloadedError, match="queued longer"):
+            await scheduler.acquire("analysis")
+
+    asyncio.run(scenario())
+    lane = scheduler.lanes["analysis"]
+    assert lane.timed_out == 1 and not lane.waiters and lane.running == 1
+
+def test_retry_after_follows_service_time():
+    scheduler = make_scheduler(max_concurrency=1, max_queue=0)
+    scheduler.lanes["analysis"].service_times.extend([7.0, 9.0])
+
+    async def scenario():
+        await scheduler.acquire("analysis")
+        with pytest.raises(SchedulerOverloadedError) as shed:
+            await scheduler.acquire("analysis")
+        return shed.value.retry_after
+
+    assert asyncio.run(scenario()) == 8
+
+def test_overloaded_lane_returns_429(client, service, sample_rows, monkeypatch):
+    saturated = PriorityScheduler([SchedulerLane("interactive", priority=0, max_concurrency=1, max_queue=0)],
+                                  total_concurrency=1)
+    saturated.lanes["interactive"].running = saturated.running = 1  # the only slot is taken
+    monkeypatch.setattr(service, "scheduler", saturated)
+    response = client.post("/sensitivity", json={"user_data": sample_rows[0]})
+    assert response.status_code == 429, response.text
+    assert int(response.headers["Retry-After"]) >= 1
+    assert "overloaded" in response.json()["detail"]
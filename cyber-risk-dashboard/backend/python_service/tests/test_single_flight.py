@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Single flight: callers share one computation, which is cancelled once its last waiter leaves
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from risk_cancellation import check_cancelled
+from risk_single_flight import SingleFlight
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "plan"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.run("key", compute) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["plan"] * 5
+    assert len(calls) == 1
+    stats = flight.stats()
+    assert stats["executions"] == 1 and stats["shared"] == 4 and stats["inFlight"] == 0
+
+def test_computation_survives_while_a_waiter_remains():
+    flight = SingleFlight()
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return 42
+
+        leaving = asyncio.ensure_future(flight.run("key", compute))
+        staying = asyncio.ensure_future(flight.run("key", compute))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await staying
+
+    assert asyncio.run(scenario()) == 42
+    assert flight.stats()["cancelled"] == 0
+
+def test_last_waiter_leaving_cancels_the_computation():
+    flight = SingleFlight()
+    cancelled = []
+
+    async def scenario():
+        async def compute():
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        callers = [asyncio.ensure_future(flight.run("key", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert cancelled == [True]
+    stats = flight.stats()
+    assert stats["cancelled"] == 1 and stats["inFlight"] == 0
+
+def test_last_waiter_leaving_stops_the_worker_thread(service):
+    flight = SingleFlight()
+    started, stopped = threading.Event(), threading.Event()
+
+    def analysis():
+        started.set()
+        try:
+            while True:
+                check_cancelled()
+                started.wait(0.001)
+        finally:
+            stopped.set()
+
+    async def scenario():
+        caller = asyncio.ensure_future(flight.run("key", lambda: service.run_cancellable(analysis)))
+        while not started.is_set():
+            await asyncio.sleep(0.001)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        # The shared task waits for the thread to reach its checkpoint before finishing
+        while flight.stats()["inFlight"]:
+            await asyncio.sleep(0.001)
+
+    asyncio.run(scenario())
+    assert stopped.is_set()
+    assert flight.stats()["cancelled"] == 1
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Strategy cache keys for every objective shape
+"""
+
+import numpy as np
+import pytest
+
+from risk_mitigation_strategy_new import RISK_TYPES
+
+def test_every_objective_shape_gives_a_hashable_key(service, bundle, sample_rows):
+    objectives = [None, "combined", *RISK_TYPES, {"ransomware": 1, "phishing": 1}, {RISK_TYPES[0]: 0.5}]
+    keys = [service.strategy_cache_key(bundle.analyzer, sample_rows[0], None, None, objective)
+            for objective in objectives]
+    for key in keys:
+        hash(key)
+    # None and "combined" are the same objective; everything else is distinct
+    assert keys[0] == keys[1]
+    assert len(set(keys[1:])) == len(keys) - 1
+
+def test_equivalent_weight_mixes_share_a_key(service, bundle, sample_rows):
+    key = lambda objective: service.strategy_cache_key(bundle.analyzer, sample_rows[0], objective=objective)
+    assert key({"ransomware": 1, "phishing": 1}) == key({"phishing": 2, "ransomware": 2})
+    assert key({"ransomware": 1, "phishing": 1}) != key({"ransomware": 1, "phishing": 2})
+
+def test_invalid_objective_is_rejected(service, bundle, sample_rows):
+    with pytest.raises(ValueError):
+        service.strategy_cache_key(bundle.analyzer, sample_rows[0], objective="not-a-risk")
+    with pytest.raises(ValueError):
+        service.strategy_cache_key(bundle.analyzer, sample_rows[0], objective={"ransomware": 0})
+
+def test_mitigation_strategy_with_weighted_objective(client, sample_rows):
+    body = {"user_data": sample_rows[0], "objective": {"ransomware": 1, "phishing": 1}}
+    first = client.post("/mitigation-strategy", json=body)
+    assert first.status_code == 200, first.text
+    # The second call is served from the strategy cache
+    second = client.post("/mitigation-strategy", json=body)
+    assert second.status_code == 200
+    assert second.json() == first.json()
+
+def test_current_risk_is_rejected_for_other_objectives(client, sample_rows):
+    body = {"user_data": sample_rows[0], "current_risk": 0.5}
+    for objective in [RISK_TYPES[0], {"ransomware": 1, "phishing": 1}]:
+        response = client.post("/mitigation-strategy", json={**body, "objective": objective})
+        assert response.status_code == 400, response.text
+    response = client.post("/mitigation-strategy", json={**body, "objective": "combined"})
+    assert response.status_code == 200, response.text
+    assert response.json()["initialRisk"] == pytest.approx(0.5)
+
+def test_weighted_strategy_rounds_match_predict_with_forced_zero_answers(client, bundle, sample_rows):
+    analyzer = bundle.analyzer
+    objective = {"ransomware": 1, "phishing": 1}
+    spec = analyzer.resolve_objective(objective)
+    # A project answering 1.5=4, whose one-hot column is forced to zero
+    user_data = list(sample_rows[7])
+    user_data[analyzer.feature_cols.index("1.5")] = 4
+    phase_four_label = analyzer._get_option_label("1.5_4")
+    response = client.post("/mitigation-strategy", json={"user_data": user_data, "objective": objective})
+    assert response.status_code == 200, response.text
+    phase_changes = [rec for round_ in response.json()["rounds"] for rec in round_["recommendations"]
+                     if rec["featureGroup"] == "1.5"]
+    assert phase_changes and phase_changes[0]["currentOption"] == phase_four_label
+    for round_ in response.json()["rounds"]:
+        for rec in round_["recommendations"]:
+            pos = analyzer.feature_blocks[rec["featureGroup"]][rec["optionIndex"]]
+            user_data[analyzer.feature_cols.index(rec["featureGroup"])] = int(analyzer.encoded_columns[pos].rsplit("_", 1)[1])
+        predicted = client.post("/predict", json={"user_data": user_data})
+        assert predicted.status_code == 200, predicted.text
+        risk = float(analyzer.objective_risk(np.array([predicted.json()["probabilities"]]), spec)[0])
+        assert round_["projectedRisk"] == pytest.approx(risk, abs=1e-6)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+/stream subscriptions: channel required, and no subscriber outlives its response
+"""
+
+import asyncio
+
+from risk_stream_hub import RiskStreamHub
+
+def test_stream_requires_a_channel(client):
+    assert client.get("/stream").status_code == 400
+
+def test_response_that_never_starts_registers_no_subscriber(service):
+    before = service.stream_hub.stats()["subscribers"]
+    response = asyncio.run(service.stream_risk_probabilities(session_id="never-started", project_id=None))
+    assert response.status_code == 200
+    assert service.stream_hub.stats()["subscribers"] == before
+
+def test_subscriber_is_removed_when_the_stream_closes():
+    hub = RiskStreamHub()
+
+    async def scenario():
+        events = hub.events("session:abc")
+        pending = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0)
+        assert hub.stats()["subscribers"] == 1
+        assert hub.publish("session:abc", {"ransomware": 0.5}) == 1
+        event = await pending
+        await events.aclose()
+        return event
+
+    event = asyncio.run(scenario())
+    assert event["data"] == '{"ransomware": 0.5}'
+    assert hub.stats()["subscribers"] == 0
@@ -61,7 +61,9 @@ import {
   healthCheck, 
   generateMitigationStrategy, 
   calculateRecommendationRiskReduction,
-  streamRiskProbabilities
+  calculateBatchRecommendationRiskReduction,
+  streamRiskProbabilities,
+  streamMitigationStrategy
 } from './controllers/riskController.js';
 import { saveProject, getUserProjects, getProject, updateProject, deleteProject } from './controllers/projectController.js';
 import { 
@@ -105,7 +107,9 @@ app.get('/api/auth/init-admin', initializeAdmin);
 app.post('/api/risk/calculate', calculateRisk);
 app.get('/api/risk/health', healthCheck);
 app.post('/api/risk/mitigation-strategy', generateMitigationStrategy);
+app.post('/api/risk/mitigation-strategy/stream', streamMitigationStrategy);
 app.post('/api/risk/recommendation-risk-reduction', calculateRecommendationRiskReduction);
+app.post('/api/risk/recommendation-risk-reduction/batch', calculateBatchRecommendationRiskReduction);
 app.get('/api/risk/stream', streamRiskProbabilities);
 
 // Project routes
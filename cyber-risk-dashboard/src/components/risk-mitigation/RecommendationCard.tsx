@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import {
   Card,
   CardContent,
@@ -27,7 +27,6 @@ import {
   PriorityHigh as PriorityIcon,
 } from '@mui/icons-material';
 import type { RiskMitigationRecommendation } from '../../services/riskMitigationService';
-import { riskMitigationService } from '../../services/riskMitigationService';
 
 interface RecommendationCardProps {
   recommendation: RiskMitigationRecommendation;
@@ -40,6 +39,9 @@ interface RecommendationCardProps {
   onAskChat: (recommendation: RiskMitigationRecommendation) => void;
   isApplying: boolean;
   enhancedRecommendation?: RiskMitigationRecommendation | null;
+  // Fetched for every card of the strategy in one batch request by the parent
+  riskReductionPercentage?: number | null;
+  loadingRiskReduction?: boolean;
 }
 
 export const RecommendationCard: React.FC<RecommendationCardProps> = ({
@@ -53,40 +55,10 @@ export const RecommendationCard: React.FC<RecommendationCardProps> = ({
   onAskChat,
   isApplying,
   enhancedRecommendation,
+  riskReductionPercentage,
+  loadingRiskReduction = false,
 }) => {
   const [expanded, setExpanded] = useState(false);
-  const [riskReduction, setRiskReduction] = useState<number | null>(null);
-  const [riskReductionPercentage, setRiskReductionPercentage] = useState<number | null>(null);
-  const [loadingRiskReduction, setLoadingRiskReduction] = useState(false);
-
-  useEffect(() => {
-    // Load risk reduction data if not already available
-    if (!recommendation.riskReduction && !loadingRiskReduction) {
-      loadRiskReduction();
-    } else if (recommendation.riskReduction) {
-      setRiskReduction(recommendation.riskReduction);
-      setRiskReductionPercentage(recommendation.riskReductionPercentage || 0);
-    }
-  }, [recommendation]);
-
-  const loadRiskReduction = async () => {
-    setLoadingRiskReduction(true);
-    try {
-      const response = await riskMitigationService.calculateRecommendationRiskReduction({
-        featureGroup: recommendation.featureGroup,
-        featureName: recommendation.featureName,
-        currentOption: recommendation.currentOption,
-        recommendedOption: recommendation.recommendedOption,
-      });
-      
-      setRiskReduction(response.riskReduction);
-      setRiskReductionPercentage(response.riskReductionPercentage);
-    } catch (error) {
-      console.error('Failed to load risk reduction:', error);
-    } finally {
-      setLoadingRiskReduction(false);
-    }
-  };
 
   const getCostDisplay = (costLevel?: number) => {
     if (!costLevel) return 'N/A';
@@ -225,7 +197,7 @@ export const RecommendationCard: React.FC<RecommendationCardProps> = ({
             {/* Risk Reduction Ring */}
             <Box sx={{ mt: 2, display: 'flex', flexDirection: 'column', alignItems: 'center' }}>
               {(() => {
-                const percent = enhancedRecommendation?.riskReductionPercentage ?? recommendation.riskReductionPercentage ?? 0;
+                const percent = riskReductionPercentage ?? enhancedRecommendation?.riskReductionPercentage ?? recommendation.riskReductionPercentage ?? 0;
                 let color = '#4caf50'; // green
                 if (percent < 10) color = '#f44336'; // red
                 else if (percent < 20) color = '#ff9800'; // orange
@@ -273,6 +245,7 @@ export const RecommendationCard: React.FC<RecommendationCardProps> = ({
               <Typography variant="caption" color="text.secondary" sx={{ fontWeight: 500 }}>
                 Risk Reduction
               </Typography>
+              {loadingRiskReduction && <LinearProgress sx={{ width: 54, mt: 0.5 }} />}
             </Box>
           </Box>
         </Box>
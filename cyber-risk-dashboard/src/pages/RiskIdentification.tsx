@@ -24,6 +24,7 @@ import AddIcon from '@mui/icons-material/Add';
 import HistoryIcon from '@mui/icons-material/History';
 import DownloadIcon from '@mui/icons-material/Download';
 import { jsPDF } from 'jspdf';
+import { getRiskStreamSessionId } from '../services/riskStreamSession';
 
 interface Message {
   id: number;
@@ -68,7 +69,9 @@ const RiskIdentification = () => {
 
   // Subscribe to risk probability updates
   useEffect(() => {
-          const eventSource = new EventSource('/api/risk/stream');
+    const eventSource = new EventSource(
+      `/api/risk/stream?sessionId=${encodeURIComponent(getRiskStreamSessionId())}`
+    );
     
     eventSource.onmessage = (event) => {
       const data = JSON.parse(event.data);
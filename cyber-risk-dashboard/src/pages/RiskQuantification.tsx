@@ -71,6 +71,7 @@ import autoTable from 'jspdf-autotable';
 import { styled } from '@mui/material/styles';
 import ChatbotService from '../services/chatbotService';
 import { projectService } from '../services/projectService';
+import { getRiskStreamSessionId } from '../services/riskStreamSession';
 import { alpha } from '@mui/material/styles';
 // Use public folder for visual image
 const visualImage = '/visual.png';
@@ -330,6 +331,7 @@ const riskApiService = {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({
+          sessionId: getRiskStreamSessionId(),
           projectDuration: projectInfo.projectDuration,
           projectType: projectInfo.projectType,
           hasCyberLegalTeam: projectInfo.hasCyberLegalTeam,
@@ -2527,179 +2529,51 @@ const RiskQuantification = () => {
   // Chatbot functions
   const currentConversation = conversations.find(conv => conv.id === currentConversationId);
 
-  // Calculate individual risk reductions for recommendations by simulating their application
+  // Calculate individual risk reductions for all recommendations of a strategy in one batch request
   const calculateIndividualRiskReductions = async (recommendations: RiskMitigationRecommendation[]) => {
     try {
-      console.log('🧮 Calculating individual risk reductions by simulation...');
+      console.log(`🧮 Calculating individual risk reductions for ${recommendations.length} recommendations...`);
       
       // Get current baseline risk
       const currentRisk = calculateAverageRisk().score; // This is the consistent risk calculation
       console.log(`📊 Current baseline risk: ${currentRisk.toFixed(1)}%`);
       
-      // Calculate risk reduction for each recommendation by simulation
-      const promises = recommendations.map(async (rec) => {
-        try {
-          console.log(`🔄 Simulating application of: ${rec.featureName}`);
-          
-          // Map feature groups to form fields (same mapping as in applyRecommendation)
-          const fieldMapping: { [key: string]: keyof ProjectInfo } = {
-            '1.1': 'projectDuration',
-            '1.2': 'projectType',
-            '1.3': 'hasCyberLegalTeam',
-            '1.4': 'companyScale',
-            '1.5': 'projectPhase',
-            '2.1.1': 'layer1Teams',
-            '2.1.2': 'layer2Teams', 
-            '2.1.3': 'layer3Teams',
-            '2.2': 'teamOverlap',
-            '3.1': 'hasITTeam',
-            '3.2': 'devicesWithFirewall',
-            '3.3': 'networkType',
-            '3.4': 'phishingFailRate',
-            '4.1': 'governanceLevel',
-            '4.2': 'allowPasswordReuse',
-            '4.3': 'usesMFA'
-          };
-
-          const fieldKey = fieldMapping[rec.featureGroup];
-          if (!fieldKey) {
-            console.warn(`No field mapping found for feature group: ${rec.featureGroup}`);
-            return;
-          }
-
-          // Convert recommended option to form value (same logic as in applyRecommendation)
-          const getFormValue = (featureGroup: string, recommendedOption: string): string => {
-            switch (featureGroup) {
-              case '1.1': // Project Duration
-                if (recommendedOption === '≤3m') return '<=3m';
-                if (recommendedOption === '3-6m') return '3-6m';
-                if (recommendedOption === '6-12m') return '6-12m';
-                if (recommendedOption === '12-24m') return '12-24m';
-                if (recommendedOption === '>24m') return '>24m';
-                return '';
-              case '1.2': // Project Type
-                if (recommendedOption === 'Transportation') return 'transportation';
-                if (recommendedOption === 'Government') return 'government';
-                if (recommendedOption === 'Healthcare') return 'healthcare';
-                if (recommendedOption === 'Commercial') return 'commercial';
-                if (recommendedOption === 'Residential') return 'residential';
-                if (recommendedOption === 'Other') return 'other';
-                return '';
-              case '1.3': // Legal Team
-                return recommendedOption === 'Yes' ? 'yes' : recommendedOption === 'No' ? 'no' : 'unsure';
-              case '1.4': // Company Scale
-                if (recommendedOption === '≤30') return '<=30';
-                if (recommendedOption === '31-60') return '31-60';
-                if (recommendedOption === '61-100') return '61-100';
-                if (recommendedOption === '101-150') return '101-150';
-                if (recommendedOption === '>150') return '>150';
-                return '';
-              case '1.5': // Project Phase
-                if (recommendedOption === 'Planning') return 'planning';
-                if (recommendedOption === 'Design') return 'design';
-                if (recommendedOption === 'Construction') return 'construction';
-                if (recommendedOption === 'Maintenance') return 'maintenance';
-                if (recommendedOption === 'Demolition') return 'demolition';
-                return '';
-              case '2.1.1': // Layer 1 Teams
-              case '2.1.2': // Layer 2 Teams  
-              case '2.1.3': // Layer 3 Teams
-                if (recommendedOption === '>40') return '>40';
-                if (recommendedOption === '31-40') return '31-40';
-                if (recommendedOption === '21-30') return '21-30';
-                if (recommendedOption === '11-20') return '11-20';
-                if (recommendedOption === '≤10') return '<=10';
-                if (recommendedOption === 'N/A') return 'na';
-                return 'na';
-              case '2.2': // Team Overlap
-                if (recommendedOption === '≤20%') return '<=20';
-                if (recommendedOption === '21-40%') return '21-40';
-                if (recommendedOption === '41-60%') return '41-60';
-                if (recommendedOption === '61-80%') return '61-80';
-                if (recommendedOption === '81-100%') return '81-100';
-                return '';
-              case '3.1': // IT Team
-                return recommendedOption === 'Yes' ? 'yes' : recommendedOption === 'No' ? 'no' : 'unsure';
-              case '3.2': // Firewall Coverage
-              case '3.4': // Phishing Failure Rate
-                if (recommendedOption === '≤20%') return '<=20';
-                if (recommendedOption === '21-40%') return '21-40';
-                if (recommendedOption === '41-60%') return '41-60';
-                if (recommendedOption === '61-80%') return '61-80';
-                if (recommendedOption === '81-100%') return '81-100';
-                return '';
-              case '3.3': // Network Type
-                if (recommendedOption === 'Private') return 'private';
-                if (recommendedOption === 'Public') return 'public';
-                if (recommendedOption === 'Both') return 'both';
-                return '';
-              case '4.1': // Governance Level
-                if (recommendedOption === 'Level 5') return 'level5';
-                if (recommendedOption === 'Level 4') return 'level4';
-                if (recommendedOption === 'Level 3') return 'level3';
-                if (recommendedOption === 'Level 2') return 'level2';
-                if (recommendedOption === 'Level 1') return 'level1';
-                return '';
-              case '4.2': // Password Reuse
-                return recommendedOption === 'Not Allowed' ? 'no' : 'yes';
-              case '4.3': // MFA
-                return recommendedOption === 'Yes' ? 'yes' : 'no';
-              default:
-                return '';
-            }
-          };
-
-          // Create simulated project info with this recommendation applied
-          const newValue = getFormValue(rec.featureGroup, rec.recommendedOption);
-          if (!newValue) {
-            console.warn(`Could not convert recommended option: ${rec.recommendedOption} for group ${rec.featureGroup}`);
-            return;
-          }
-
-          const simulatedProjectInfo = {
-            ...projectInfo,
-            [fieldKey]: newValue
-          };
-
-          // Calculate risk with the simulated change
-          let newRiskResults;
-          if (useRandomResults) {
-            // For random results, just use a slight variation
-            newRiskResults = generateRandomResults();
-          } else {
-            // Use the actual risk calculation API
-            newRiskResults = await riskApiService.calculateRisk(simulatedProjectInfo);
-          }
-
-          // Calculate the new average risk using the exact same algorithm as calculateAverageRisk()
-          const newAverageRisk = calculateAverageRiskFromResults(newRiskResults).score;
-
-          // Calculate the actual risk reduction
-          const actualRiskReduction = currentRisk - newAverageRisk;
-          const riskReductionPercentage = (actualRiskReduction / currentRisk) * 100;
-
-          console.log(`✅ ${rec.featureName}: ${currentRisk.toFixed(1)}% → ${newAverageRisk.toFixed(1)}% = -${actualRiskReduction.toFixed(1)} pts (${riskReductionPercentage.toFixed(1)}% reduction)`);
+      let reductionPercentages: number[];
+      if (useRandomResults) {
+        // For random results, just use a slight variation per recommendation
+        reductionPercentages = recommendations.map(() => {
+          const newAverageRisk = calculateAverageRiskFromResults(generateRandomResults()).score;
+          return ((currentRisk - newAverageRisk) / currentRisk) * 100;
+        });
+      } else {
+        // Score every recommendation against the same baseline with one request
+        const response = await riskMitigationService.calculateStrategyRiskReductions(
+          projectInfo,
+          recommendations,
+          currentRisk / 100 // Use consistent risk baseline, as for the mitigation strategy
+        );
+        reductionPercentages = response.results.map(result => result.riskReductionPercentage);
+      }
 
-          // Update the recommendation with calculated risk reduction
+      // Update the recommendations with their calculated risk reductions in one state update
+      setEnhancedDescriptions(prev => {
+        const next = new Map(prev);
+        recommendations.forEach((rec, i) => {
           const cacheKey = `${rec.featureGroup}-${rec.featureName}-${rec.description}`;
-          setEnhancedDescriptions(prev => {
-            const existing = prev.get(cacheKey) || rec;
-            return new Map(prev.set(cacheKey, {
-              ...existing,
-              calculatedRiskReduction: riskReductionPercentage // Store as percentage for consistency
-            }));
+          const existing = next.get(cacheKey) || rec;
+          next.set(cacheKey, {
+            ...existing,
+            calculatedRiskReduction: reductionPercentages[i] // Store as percentage for consistency
           });
-          
-        } catch (error) {
-          console.error(`Error simulating ${rec.featureName}:`, error);
-        }
+          console.log(`✅ ${rec.featureName}: ${reductionPercentages[i].toFixed(1)}% reduction`);
+        });
+        return next;
       });
 
-      await Promise.all(promises);
       console.log('🎯 Individual risk reduction calculations completed');
       
     } catch (error) {
-      console.error('Error calculating individual risk reductions by simulation:', error);
+      console.error('Error calculating individual risk reductions:', error);
     }
   };
 
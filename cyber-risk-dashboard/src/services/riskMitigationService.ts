@@ -52,6 +52,24 @@ export interface RecommendationRiskReductionResponse {
   riskReductionPercentage: number;
 }
 
+export interface RecommendationChange {
+  featureGroup: string;
+  recommendedOption: string;
+  featureName?: string;
+  currentOption?: string;
+}
+
+export interface BatchRecommendationRiskReductionRequest {
+  user_data: number[];
+  changes: RecommendationChange[];
+  current_risk?: number;  // Override for consistent risk calculation
+}
+
+export interface BatchRecommendationRiskReductionResponse {
+  currentRisk: number;
+  results: RecommendationRiskReductionResponse[];
+}
+
 class RiskMitigationService {
   private baseUrl: string;
 
@@ -107,6 +125,37 @@ class RiskMitigationService {
     });
   }
 
+  async calculateBatchRecommendationRiskReduction(
+    request: BatchRecommendationRiskReductionRequest
+  ): Promise<BatchRecommendationRiskReductionResponse> {
+    return this.makeRequest<BatchRecommendationRiskReductionResponse>('/recommendation-risk-reduction/batch', {
+      method: 'POST',
+      body: JSON.stringify(request),
+    });
+  }
+
+  async calculateStrategyRiskReductions(
+    projectInfo: ProjectInfo,
+    recommendations: RiskMitigationRecommendation[],
+    currentRisk?: number
+  ): Promise<BatchRecommendationRiskReductionResponse> {
+    // One request scores every recommendation against the same baseline
+    const request: BatchRecommendationRiskReductionRequest = {
+      user_data: this.convertProjectInfoToModelInput(projectInfo),
+      changes: recommendations.map(rec => ({
+        featureGroup: rec.featureGroup,
+        recommendedOption: rec.recommendedOption,
+        featureName: rec.featureName,
+        currentOption: rec.currentOption,
+      })),
+    };
+    if (currentRisk !== undefined) {
+      request.current_risk = currentRisk;
+    }
+
+    return this.calculateBatchRecommendationRiskReduction(request);
+  }
+
   private convertProjectInfoToModelInput(projectInfo: ProjectInfo): number[] {
     return [
       // 1.1 Project Duration (0-4 scale)
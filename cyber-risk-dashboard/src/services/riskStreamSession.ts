@@ -0,0 +1,14 @@
+const STORAGE_KEY = 'riskStreamSessionId';
+
+// Channel id shared by this tab's risk calculations and its /api/risk/stream subscription,
+// so live probability updates reach only the tab that produced them
+export const getRiskStreamSessionId = (): string => {
+  let sessionId = sessionStorage.getItem(STORAGE_KEY);
+  if (!sessionId) {
+    sessionId = typeof crypto !== 'undefined' && 'randomUUID' in crypto
+      ? crypto.randomUUID()
+      : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+    sessionStorage.setItem(STORAGE_KEY, sessionId);
+  }
+  return sessionId;
+};